@@ -51,6 +51,8 @@ export interface Agency {
     tech_stack?: string[] | null;
     headcount?: string | null;
     office_locations?: string[] | null;
+    open_roles_count?: number | null;
+    hiring_roles?: string[] | null;
     sibling_agencies?: string[] | null;
     [key: string]: any;
 }
@@ -0,0 +1,5 @@
+-- Change-detection fingerprints written by tools/store_data.py (see tools/change_detection.py)
+ALTER TABLE agencies ADD COLUMN IF NOT EXISTS content_hash text;
+ALTER TABLE agencies ADD COLUMN IF NOT EXISTS normalized_content_hash text;
+ALTER TABLE agencies ADD COLUMN IF NOT EXISTS section_hashes jsonb DEFAULT '{}'::jsonb;
+ALTER TABLE agencies ADD COLUMN IF NOT EXISTS last_scraped_at timestamptz;
@@ -0,0 +1,4 @@
+-- Careers-page fields from tools/extract_insights.py, so incremental re-extraction
+-- (tools/incremental_extract.py) can refresh them on their own when only the careers page changes.
+ALTER TABLE agencies ADD COLUMN IF NOT EXISTS open_roles_count integer DEFAULT 0;
+ALTER TABLE agencies ADD COLUMN IF NOT EXISTS hiring_roles jsonb DEFAULT '[]'::jsonb;
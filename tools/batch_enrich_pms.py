@@ -3,16 +3,20 @@ import os
 import sys
 import json
 import logging
+import argparse
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from batch_runner import add_batch_arguments, run_batch
+
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def batch_enrich():
+def batch_enrich(concurrency: int = 4, llm_concurrency: int = 8, per_domain: int = 3):
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
     
@@ -34,24 +38,17 @@ def batch_enrich():
             
     logging.info(f"Found {len(agencies_to_enrich)} agencies missing partner manager data.")
     
-    # Import orchestrate from orchestrator.py
-    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    from orchestrator import orchestrate
-    
+    websites = []
     for agency in agencies_to_enrich:
-        name = agency.get("name")
-        website = agency.get("website")
-        
-        if not website:
-            logging.warning(f"Skipping {name} - No website URL")
+        if not agency.get("website"):
+            logging.warning(f"Skipping {agency.get('name')} - No website URL")
             continue
-            
-        logging.info(f"--- Enriching {name} ({website}) ---")
-        try:
-            orchestrate(website)
-            logging.info(f"Successfully enriched {name}")
-        except Exception as e:
-            logging.error(f"Failed to enrich {name}: {e}")
+        websites.append(agency["website"])
+
+    run_batch(websites, concurrency=concurrency, llm_concurrency=llm_concurrency, per_domain=per_domain)
 
 if __name__ == "__main__":
-    batch_enrich()
+    parser = argparse.ArgumentParser(description="Re-run the pipeline for agencies missing partner managers.")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    batch_enrich(concurrency=args.concurrency, llm_concurrency=args.llm_concurrency, per_domain=args.per_domain)
@@ -0,0 +1,299 @@
+"""
+batch_runner.py — Run the B.L.A.S.T. pipeline over many agencies with a bounded worker pool.
+
+Usage:
+    python batch_runner.py --file urls.txt --concurrency 8
+    python batch_runner.py --query stale --days 30 --limit 500
+    python orchestrator.py --batch urls.txt            # same thing via the orchestrator CLI
+
+Three independent limits:
+    --concurrency       pipelines in flight at once
+    --llm-concurrency   LLM calls in flight across all pipelines (throttle.llm_slot)
+    --per-domain        concurrent requests to any one host (throttle.host_slot)
+
+All workers share one InProcessEngine, so LLM and Supabase clients are built once per batch.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from cost_manager import CostManager, get_cost_manager
+from pipeline import get_engine
+import throttle
+import page_cache
+import llm_gateway
+import extract_insights
+import incremental_extract
+import search_cache
+import tracing
+
+QUERIES = ("all", "stale", "missing-pms")
+# PostgREST caps a plain select at 1000 rows, so the queries page through the table.
+PAGE_SIZE = 1000
+
+
+def _iter_rows(supabase, columns: str, order: str, page_size: int = PAGE_SIZE):
+    """Every agencies row, `page_size` at a time via .range(); `id` breaks ties so pages don't overlap."""
+    start = 0
+    while True:
+        query = supabase.table("agencies").select(columns).order(order)
+        if order != "id":
+            query = query.order("id")
+        rows = query.range(start, start + page_size - 1).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def query_agencies(supabase, kind: str, days: int = 7, limit: Optional[int] = None) -> List[str]:
+    """Websites selected by a named Supabase query: all, stale (not analysed in `days`), missing-pms."""
+    if supabase is None:
+        logging.error("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+        return []
+
+    if kind == "all":
+        rows = _iter_rows(supabase, "website", "name")
+    elif kind == "stale":
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        rows = []
+        for row in _iter_rows(supabase, "website, last_analyzed", "id"):
+            last = row.get("last_analyzed")
+            try:
+                last_dt = datetime.fromisoformat(last.replace("Z", "+00:00")) if last else None
+                if last_dt and last_dt.tzinfo is None:
+                    last_dt = last_dt.replace(tzinfo=timezone.utc)
+            except ValueError:
+                last_dt = None
+            if last_dt is None or last_dt < cutoff:
+                rows.append(row)
+    elif kind == "missing-pms":
+        rows = [r for r in _iter_rows(supabase, "website, partner_managers", "id") if not r.get("partner_managers")]
+    else:
+        raise ValueError(f"Unknown query '{kind}'. Choose from: {', '.join(QUERIES)}")
+
+    urls = [r["website"] for r in rows if r.get("website")]
+    return urls[:limit] if limit else urls
+
+
+def read_url_file(path: str) -> List[str]:
+    """One URL per line; blank lines and #comments ignored. '-' reads stdin."""
+    handle = sys.stdin if path == "-" else open(path, "r")
+    try:
+        return [line.strip() for line in handle if line.strip() and not line.strip().startswith("#")]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+class BatchProgress:
+    """Thread-safe running totals, printed as a one-line throughput update after each agency."""
+
+    def __init__(self, total: int, cost_manager: CostManager):
+        self.total = total
+        self.cm = cost_manager
+        self.started = time.monotonic()
+        self.done = 0
+        self.cost = 0.0
+        self.statuses = {}
+        self.run_ids = []
+        self.saved_seconds = 0.0  # latency removed by running independent phases concurrently
+        self.revalidation = {"pages": 0, "cache_hits": 0, "conditional": 0, "not_modified": 0}
+        self._lock = threading.Lock()
+
+    def record(self, url: str, result: dict):
+        run_cost = self.cm.get_run_summary(result["run_id"])["total_cost"] if result.get("run_id") else 0.0
+        with self._lock:
+            self.done += 1
+            self.cost += run_cost
+            self.statuses[result["status"]] = self.statuses.get(result["status"], 0) + 1
+            if result.get("run_id"):
+                self.run_ids.append(result["run_id"])
+            if result.get("timing"):
+                self.saved_seconds += result["timing"]["saved_s"]
+            for key, count in (result.get("revalidation") or {}).items():
+                self.revalidation[key] = self.revalidation.get(key, 0) + count
+            elapsed_min = (time.monotonic() - self.started) / 60
+            rate = self.done / elapsed_min if elapsed_min > 0 else 0.0
+            logging.info(
+                f"📦 [{self.done}/{self.total}] {result['status']:<14} {url}  |  "
+                f"{rate:.1f} agencies/min  ${self.cost / self.done:.4f}/agency  ${self.cost:.4f} total"
+            )
+
+    def summary(self) -> dict:
+        """Aggregate CostManager.get_run_summary over every run in the batch."""
+        by_model = {}
+        total_cost = 0.0
+        llm_cache = {"hits": 0, "misses": 0, "saved_cost": 0.0}
+        packing_saved = 0
+        cascade = {}
+        for run_id in self.run_ids:
+            run = self.cm.get_run_summary(run_id)
+            total_cost += run["total_cost"]
+            packing_saved += self.cm.get_packing_summary(run_id)["tokens_saved"]
+            for row in self.cm.get_cache_summary(run_id):
+                for key in llm_cache:
+                    llm_cache[key] += row[key]
+            for row in self.cm.get_cascade_summary(run_id):
+                agg = cascade.setdefault((row["tier"], row["model"]), {"tier": row["tier"], "model": row["model"],
+                                                                        "calls": 0, "completed": 0})
+                agg["calls"] += row["calls"]
+                agg["completed"] += row["completed"]
+            for item in run["details"]:
+                agg = by_model.setdefault(item["model"], {"model": item["model"], "prompt_tokens": 0,
+                                                          "completion_tokens": 0, "cost": 0.0})
+                agg["prompt_tokens"] += item["prompt_tokens"]
+                agg["completion_tokens"] += item["completion_tokens"]
+                agg["cost"] += item["cost"]
+        elapsed = time.monotonic() - self.started
+        return {
+            "agencies": self.done,
+            "statuses": dict(self.statuses),
+            "elapsed_seconds": elapsed,
+            "agencies_per_minute": self.done / (elapsed / 60) if elapsed > 0 else 0.0,
+            "total_cost": total_cost,
+            "cost_per_agency": total_cost / self.done if self.done else 0.0,
+            "phase_parallelism_saved_seconds": self.saved_seconds,
+            "revalidation": dict(self.revalidation),
+            "llm_cache": llm_cache,
+            "packing_tokens_saved": packing_saved,
+            "cascade": [cascade[k] for k in sorted(cascade)],
+            "details": sorted(by_model.values(), key=lambda m: m["cost"], reverse=True),
+        }
+
+
+def run_batch(urls: Iterable[str], concurrency: int = 4, llm_concurrency: int = 8, per_domain: int = 3,
+              model: Optional[str] = None, engine=None) -> dict:
+    """Run orchestrate() for every URL on a pool of `concurrency` workers. Returns the batch summary.
+    Concurrent batches always run in-process: the throttle limits are per process, so subprocess
+    tools would each get their own and the LLM and per-domain caps wouldn't hold."""
+    from orchestrator import orchestrate
+    import monitor_growth
+
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))  # de-dupe, keep order
+    throttle.configure(llm_concurrency=llm_concurrency, host_concurrency=per_domain)
+    engine = engine or get_engine()
+    if concurrency > 1 and engine.name != "in-process":
+        logging.warning(f"--engine {engine.name} can't share the LLM and per-domain limits between "
+                        f"{concurrency} pipelines; running the batch in-process.")
+        engine = get_engine()
+    progress = BatchProgress(len(urls), get_cost_manager())
+    batching = concurrency > 1
+    own_store_batching = batching and engine.store_batching_stats() is None
+    if batching:
+        # Concurrent pipelines share growth-signal classification calls (monitor_growth.classify_batch)...
+        monitor_growth.configure_batching()
+    if own_store_batching:
+        # ...and write their agencies in multi-row upserts (store_data.upsert_payloads).
+        engine.configure_store_batching()
+
+    logging.info(f"🚚 Batch of {len(urls)} agencies — {concurrency} pipelines, "
+                 f"{llm_concurrency} LLM calls, {per_domain} request(s)/domain in flight")
+
+    def _one(url):
+        try:
+            return orchestrate(url, model=model, engine=engine)
+        except Exception as e:
+            logging.error(f"Pipeline crashed for {url}: {e}")
+            return {"run_id": None, "url": url, "status": "crashed"}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="pipeline") as pool:
+            futures = {pool.submit(_one, url): url for url in urls}
+            for future in as_completed(futures):
+                progress.record(futures[future], future.result())
+    finally:
+        # Later single runs in this process shouldn't wait in the batchers we set up.
+        classification_batching = monitor_growth.stop_batching() if batching else None
+        store_batching = engine.stop_store_batching() if own_store_batching else engine.store_batching_stats()
+
+    summary = progress.summary()
+    summary["search_cache"] = search_cache.stats()  # in-process searches only
+    if batching:
+        summary["classification_batching"] = classification_batching
+        summary["store_batching"] = store_batching
+    print_summary(summary)
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    logging.info("--- Batch Summary ---")
+    logging.info(f"Agencies: {summary['agencies']}  ({', '.join(f'{k}: {v}' for k, v in sorted(summary['statuses'].items()))})")
+    logging.info(f"Throughput: {summary['agencies_per_minute']:.1f} agencies/min over {summary['elapsed_seconds'] / 60:.1f} min")
+    logging.info(f"Phase parallelism saved {summary['phase_parallelism_saved_seconds']:.1f}s of pipeline latency")
+    reval = summary["revalidation"]
+    if reval["pages"]:
+        hit_rate = reval["not_modified"] / reval["conditional"] if reval["conditional"] else 0.0
+        logging.info(f"Pages: {reval['pages']} scraped, {reval['cache_hits']} from cache, "
+                     f"{reval['not_modified']}/{reval['conditional']} conditional requests not modified ({hit_rate:.0%}), "
+                     f"{summary['statuses'].get('unchanged', 0)} agencies skipped as unchanged")
+    logging.info(f"Total Cost: ${summary['total_cost']:.4f}  (${summary['cost_per_agency']:.4f}/agency)")
+    if summary["packing_tokens_saved"]:
+        logging.info(f"Content packing kept {summary['packing_tokens_saved']:,} prompt tokens out of extraction calls")
+    cache = summary["llm_cache"]
+    if cache["hits"] or cache["misses"]:
+        logging.info(f"LLM cache: {cache['hits']} hits, {cache['misses']} misses (saved ${cache['saved_cost']:.4f})")
+    if summary.get("search_cache"):
+        logging.info(f"Search cache hits: {search_cache.format_stats(summary['search_cache'])}")
+    batching = summary.get("classification_batching")
+    if batching and batching["items"]:
+        logging.info(f"Growth-signal classification: {batching['items']} agencies classified in {batching['batches']} batch(es)")
+    store_batching = summary.get("store_batching")
+    if store_batching and store_batching["items"]:
+        logging.info(f"Storage: {store_batching['items']} agencies written in {store_batching['batches']} upsert(s)")
+    for tier in summary["cascade"]:
+        logging.info(f"Cascade tier {tier['tier']} ({tier['model']}): reached {tier['calls']}×, "
+                     f"finished {tier['completed']} ({tier['completed'] / tier['calls']:.0%})")
+    for item in summary["details"]:
+        logging.info(f"  - {item['model']}: {item['prompt_tokens']} prompt, {item['completion_tokens']} completion tokens (${item['cost']:.4f})")
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    """Concurrency flags shared by batch_runner.py and orchestrator.py --batch."""
+    parser.add_argument("--concurrency", type=int, default=4, help="Pipelines to run at once (default 4)")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Global cap on in-flight LLM calls (default 8)")
+    parser.add_argument("--per-domain", type=int, default=3, help="Concurrent requests per host (default 3)")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run the agency pipeline over many URLs concurrently.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="File with one URL per line ('-' for stdin)")
+    source.add_argument("--query", choices=QUERIES, help="Select agencies from Supabase")
+    parser.add_argument("--days", type=int, default=7, help="For --query stale: not analysed in this many days")
+    parser.add_argument("--limit", type=int, help="Maximum number of agencies to process")
+    parser.add_argument("--model", help="Override LLM model for all pipeline steps")
+    add_batch_arguments(parser)
+    page_cache.add_cache_arguments(parser)
+    llm_gateway.add_cache_arguments(parser)
+    extract_insights.add_cascade_arguments(parser)
+    incremental_extract.add_arguments(parser)
+    tracing.add_trace_arguments(parser)
+    args = parser.parse_args()
+    page_cache.apply_cache_arguments(args)
+    llm_gateway.apply_cache_arguments(args)
+    extract_insights.apply_cascade_arguments(args)
+    incremental_extract.apply_arguments(args)
+    tracing.apply_trace_arguments(args)
+
+    engine = get_engine()
+    if args.file:
+        urls = read_url_file(args.file)
+        urls = urls[:args.limit] if args.limit else urls
+    else:
+        urls = query_agencies(engine.supabase, args.query, days=args.days, limit=args.limit)
+
+    run_batch(urls, concurrency=args.concurrency, llm_concurrency=args.llm_concurrency,
+              per_domain=args.per_domain, model=args.model, engine=engine)
+
+
+if __name__ == "__main__":
+    main()
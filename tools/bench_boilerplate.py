@@ -0,0 +1,80 @@
+"""
+bench_boilerplate.py — Prompt-token reduction from boilerplate stripping on the eval.py agencies.
+
+Usage:
+    python bench_boilerplate.py                     # every agency in eval.TEST_AGENCIES
+    python bench_boilerplate.py --agency velstar
+    python bench_boilerplate.py --url https://example.com
+
+For each agency the homepage and its About/Team subpages are fetched (through the page
+cache, so re-runs are offline) and converted twice: plain html2text, and boilerplate.py
+stripping + html2text. Tokens are counted with content_packer.count_tokens.
+"""
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from eval import TEST_AGENCIES
+from scrape_agency import fetch_html, find_team_pages, convert_html
+from content_packer import count_tokens, HAS_TIKTOKEN
+import boilerplate
+
+
+def measure(url: str, model: str) -> dict:
+    home_html, _ = fetch_html(url)
+    pages = [(url, home_html)]
+    for sub_url in find_team_pages(home_html, url):
+        try:
+            pages.append((sub_url, fetch_html(sub_url)[0]))
+        except Exception as e:
+            sys.stderr.write(f"skipping {sub_url}: {e}\n")
+
+    totals = {"pages": len(pages), "html_chars": 0, "clean_html_chars": 0, "chars_before": 0, "chars_after": 0,
+              "tokens_before": 0, "tokens_after": 0}
+    for _, html in pages:
+        before = convert_html(html, strip=False)
+        after = convert_html(html, strip=True)
+        totals["html_chars"] += len(html)
+        totals["clean_html_chars"] += boilerplate.strip_boilerplate(html).chars_out
+        totals["chars_before"] += len(before)
+        totals["chars_after"] += len(after)
+        totals["tokens_before"] += count_tokens(before, model)
+        totals["tokens_after"] += count_tokens(after, model)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prompt tokens saved by boilerplate stripping.")
+    parser.add_argument("--agency", help="Only this eval.py agency slug")
+    parser.add_argument("--url", action="append", default=[], help="Extra URL to measure (repeatable)")
+    parser.add_argument("--model", default="openai/gpt-4o-mini", help="Tokenizer to count with")
+    args = parser.parse_args()
+
+    targets = {args.agency: TEST_AGENCIES[args.agency]} if args.agency else dict(TEST_AGENCIES)
+    targets.update({u: u for u in args.url})
+
+    print(f"\nTokenizer: {'tiktoken (' + args.model + ')' if HAS_TIKTOKEN else 'estimate (4 chars/token)'}")
+    print(f"{'Agency':<16} {'pages':>5} {'chars before':>13} {'chars after':>12} {'tokens before':>14} {'tokens after':>13} {'saved':>7}")
+    print(f"{'─' * 16} {'─' * 5} {'─' * 13} {'─' * 12} {'─' * 14} {'─' * 13} {'─' * 7}")
+    grand_before = grand_after = 0
+    for name, url in targets.items():
+        try:
+            m = measure(url, args.model)
+        except Exception as e:
+            print(f"{name[:16]:<16} failed: {e}")
+            continue
+        saved = 1 - m["tokens_after"] / m["tokens_before"] if m["tokens_before"] else 0.0
+        grand_before += m["tokens_before"]
+        grand_after += m["tokens_after"]
+        print(f"{name[:16]:<16} {m['pages']:>5} {m['chars_before']:>13,} {m['chars_after']:>12,} "
+              f"{m['tokens_before']:>14,} {m['tokens_after']:>13,} {saved:>7.0%}")
+    if grand_before:
+        print(f"{'─' * 16} {'─' * 5} {'─' * 13} {'─' * 12} {'─' * 14} {'─' * 13} {'─' * 7}")
+        print(f"{'total':<16} {'':>5} {'':>13} {'':>12} {grand_before:>14,} {grand_after:>13,} "
+              f"{1 - grand_after / grand_before:>7.0%}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+bench_pipeline.py — Per-URL wall time: in-process engine vs one subprocess per phase.
+
+Usage:
+    python bench_pipeline.py --startup-only                 # Interpreter + import overhead only (no network, no cost)
+    python bench_pipeline.py --url https://www.velstar.co.uk --runs 2
+
+Full runs go through orchestrator.orchestrate, so they scrape, call the LLM and write to
+Supabase exactly like a real run (and are billed like one). Engines alternate per run so
+site/API warm-up does not favour either side.
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).parent
+sys.path.append(str(TOOLS_DIR))
+
+# The modules each subprocess phase imports before doing any work.
+PHASE_MODULES = ["scrape_agency", "extract_insights", "monitor_growth", "store_data", "score_leads"]
+
+
+def bench_startup(repeats: int) -> None:
+    """Cost of spawning a fresh interpreter and importing each phase module, i.e. what in-process saves."""
+    print(f"\n{'Phase module':<20} {'subprocess (s)':>15}")
+    print(f"{'─' * 20} {'─' * 15}")
+    total = 0.0
+    for module in PHASE_MODULES:
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import {module}"], cwd=TOOLS_DIR, capture_output=True)
+            samples.append(time.perf_counter() - start)
+        median = statistics.median(samples)
+        total += median
+        print(f"{module:<20} {median:>15.3f}")
+    print(f"{'─' * 20} {'─' * 15}")
+    print(f"{'per run overhead':<20} {total:>15.3f}\n")
+
+
+def bench_runs(urls: list, runs: int, model: str = None) -> None:
+    from orchestrator import orchestrate
+    from pipeline import InProcessEngine, SubprocessEngine
+
+    # One in-process engine for the whole benchmark, as the batch runner would use it.
+    engines = {"subprocess": SubprocessEngine(), "in-process": InProcessEngine()}
+    timings = {url: {name: [] for name in engines} for url in urls}
+
+    for url in urls:
+        for i in range(runs):
+            order = list(engines) if i % 2 == 0 else list(reversed(engines))
+            for name in order:
+                start = time.perf_counter()
+                orchestrate(url, model=model, engine=engines[name])
+                timings[url][name].append(time.perf_counter() - start)
+
+    print(f"\n{'URL':<40} {'subprocess (s)':>15} {'in-process (s)':>15} {'saved':>8}")
+    print(f"{'─' * 40} {'─' * 15} {'─' * 15} {'─' * 8}")
+    for url, per_engine in timings.items():
+        sub = statistics.median(per_engine["subprocess"])
+        inp = statistics.median(per_engine["in-process"])
+        saved = (sub - inp) / sub if sub else 0.0
+        print(f"{url:<40} {sub:>15.2f} {inp:>15.2f} {saved:>7.0%}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-process vs subprocess pipeline engines.")
+    parser.add_argument("--url", action="append", default=[], help="Agency URL to run (repeatable)")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per engine per URL (median is reported)")
+    parser.add_argument("--model", help="Override LLM model for all pipeline steps")
+    parser.add_argument("--startup-only", action="store_true", help="Only measure interpreter start + import cost")
+    parser.add_argument("--repeats", type=int, default=5, help="Samples per module for --startup-only")
+    args = parser.parse_args()
+
+    if args.startup_only:
+        bench_startup(args.repeats)
+        return
+    if not args.url:
+        parser.error("--url is required unless --startup-only is set")
+    bench_runs(args.url, args.runs, model=args.model)
+
+
+if __name__ == "__main__":
+    main()
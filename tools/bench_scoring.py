@@ -0,0 +1,174 @@
+"""
+bench_scoring.py — Whole-table lead scoring: per-row score_leads vs column-wise score_all.
+
+Usage:
+    python bench_scoring.py                    # 10k and 100k synthetic agencies
+    python bench_scoring.py --sizes 5000 --seed 7
+
+Runs both against an in-memory agencies table that counts requests and the JSON bytes it
+returns, so the numbers are about the scoring path, not the network:
+    per-row     select("*") of the whole table, calculate_score per row, one update per agency
+    score_all   keyset pages of SCORE_COLUMNS, score_columns per page, one update per distinct
+                score among the changed rows
+A second score_all pass (nothing changed) shows the write-back skipping unchanged rows.
+"""
+import sys
+import json
+import bisect
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from score_leads import calculate_score, score_all, SCORE_COLUMNS
+
+REVENUES = ["Unknown", "$500k-$1M", "$1M-$5M", "$5M-$10M", "$10M-$50M", "$50M-$100M", None]
+ROLES = ["Managing Director", "Head of Partnerships", "CTO", "Alliances Lead", "Designer", None]
+
+
+def synthetic_agencies(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        rows.append({
+            "id": f"{i:08d}-0000-0000-0000-000000000000",
+            "name": f"Agency {i}",
+            "website": f"https://agency{i}.example",
+            "description": "Full-service ecommerce agency. " * rng.randint(5, 30),
+            "case_studies": [{"title": f"Case {k}", "summary": "x" * 300} for k in range(rng.randint(0, 8))],
+            "clients": [f"Client {k}" for k in range(rng.randint(0, 20))],
+            "revenue_estimate": rng.choice(REVENUES),
+            "growth_signals": [{"type": rng.choice(["hiring", "award", "won_work"])} for _ in range(rng.randint(0, 9))],
+            "directors": [{"name": f"Person {k}", "role": rng.choice(ROLES)} for k in range(rng.randint(0, 5))],
+            "competitor_partnerships": ["Shopify"] * rng.randint(0, 4),
+            "is_group_member": rng.random() < 0.3,
+            "lead_score": 0,
+            "score_breakdown": {},
+        })
+    return rows
+
+
+class _Query:
+    def __init__(self, table, op, payload=None):
+        self.table, self.op, self.payload = table, op, payload
+        self.columns, self.filters, self._limit, self._order = None, [], None, None
+
+    def select(self, columns):
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def order(self, column):
+        self._order = column
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(("eq", column, value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(("gt", column, value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(("in", column, list(values)))
+        return self
+
+    def execute(self):
+        return self.table.run(self)
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class MemoryTable:
+    """Just enough of the supabase-py query builder for score_leads, with request/byte counters."""
+
+    def __init__(self, rows):
+        self.rows = {r["id"]: dict(r) for r in rows}
+        self.ids = sorted(self.rows)
+        self.requests = {"select": 0, "update": 0}
+        self.bytes_read = 0
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        return _Query(self, "select").select(columns)
+
+    def update(self, values):
+        return _Query(self, "update", values)
+
+    def _match(self, q):
+        # Point lookups and keyset pages on id are index scans, as they are in Postgres.
+        if q.filters and q.filters[0][:2] == ("eq", "id"):
+            row = self.rows.get(q.filters[0][2])
+            return [row] if row else []
+        if q.filters and q.filters[0][:2] == ("in", "id"):
+            return [self.rows[i] for i in q.filters[0][2] if i in self.rows]
+        ids, start = self.ids, 0
+        for op, column, value in q.filters:
+            if (op, column) == ("gt", "id"):
+                start = bisect.bisect_right(ids, value)
+        end = len(ids) if q._limit is None else start + q._limit
+        return [self.rows[i] for i in ids[start:end]]
+
+    def run(self, q):
+        self.requests[q.op] += 1
+        matched = self._match(q)
+        if q.op == "update":
+            for r in matched:
+                r.update(q.payload)
+            return _Result(matched)
+        data = [dict(r) if q.columns is None else {c: r.get(c) for c in q.columns} for r in matched]
+        self.bytes_read += len(json.dumps(data))
+        return _Result(data)
+
+
+def per_row(db: MemoryTable) -> int:
+    """The original score_leads(agency_id=None) loop."""
+    agencies = db.table("agencies").select("*").execute().data
+    for agency in agencies:
+        scoring = calculate_score(agency)
+        db.table("agencies").update({"lead_score": scoring["score"], "score_breakdown": scoring["breakdown"]}) \
+            .eq("id", agency["id"]).execute()
+    return len(agencies)
+
+
+def run(label, fn, db):
+    started = time.perf_counter()
+    out = fn(db)
+    elapsed = time.perf_counter() - started
+    req = db.requests
+    print(f"  {label:<20} {elapsed:>7.2f}s  {req['select']:>6} selects  {req['update']:>7} writes  "
+          f"{db.bytes_read / 1024 / 1024:>8.1f} MB read")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark whole-table lead scoring.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        rows = synthetic_agencies(n, args.seed)
+        print(f"{n:,} agencies")
+        run("per-row", per_row, MemoryTable(rows))
+        db = MemoryTable(rows)
+        first = run("score_all", lambda d: score_all(supabase=d), db)
+        db.requests = {k: 0 for k in db.requests}
+        db.bytes_read = 0
+        second = run("score_all (again)", lambda d: score_all(supabase=d), db)
+        print(f"    changed: {first['changed']:,} then {second['changed']:,}")
+
+        # Same scores as calculate_score, row for row.
+        expected = {r["id"]: calculate_score(r)["score"] for r in rows}
+        assert all(expected[r["id"]] == r["score"] for r in first["results"]), "column-wise scores differ"
+        assert set(SCORE_COLUMNS) <= set(rows[0])
@@ -0,0 +1,154 @@
+"""
+boilerplate.py — Remove page chrome from HTML before html2text turns it into LLM input.
+
+strip_boilerplate() drops whole DOM regions that never carry agency facts:
+    <nav>, <footer>, <aside>, <form>, <script>/<style>/<noscript>/<svg>/<iframe>/<template>
+    page-level <header> (one inside <main>/<article> is kept — that's a content title)
+    anything with role=navigation/banner/contentinfo/search/dialog
+    anything whose id/class looks like a cookie banner, menu, popup, sidebar or share bar
+<address> blocks are always kept, even inside a dropped footer — they hold office locations.
+
+dedupe_blocks() then removes paragraphs repeated within the converted markdown (the same
+link list rendered for desktop and mobile menus, repeated CTAs).
+
+Disable with ATHOS_STRIP_BOILERPLATE=0. bench_boilerplate.py measures the token reduction.
+"""
+import os
+import re
+import html
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+DROP_TAGS = {"nav", "footer", "aside", "form", "script", "style", "noscript", "svg", "iframe",
+             "template", "canvas", "dialog"}
+DROP_ROLES = {"navigation", "banner", "contentinfo", "search", "dialog", "alertdialog", "menu", "menubar"}
+# Matched against each id/class token's ending, so "site-footer" and "js-cookie-banner" drop but
+# "nav-tabs" or "menu-item" inside real content don't.
+DROP_ATTR_PATTERN = re.compile(
+    r"^(?:.*[-_])?(?:cookies?|cookie-banner|cookie-notice|consent|gdpr|onetrust|newsletter|popup|modal|"
+    r"breadcrumbs?|social-share|share-buttons|megamenu|mega-menu|menu|navbar|navigation|main-nav|site-nav|"
+    r"sidebar|offcanvas|skip-link|back-to-top|site-header|site-footer|footer)$")
+_STATE_PREFIXES = ("has-", "is-", "with-", "no-", "js-has-")
+CONTENT_TAGS = {"main", "article"}
+KEEP_TAGS = {"address"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+             "source", "track", "wbr"}
+
+
+def enabled() -> bool:
+    return os.getenv("ATHOS_STRIP_BOILERPLATE", "1") != "0"
+
+
+@dataclass
+class CleanResult:
+    html: str
+    chars_in: int
+    chars_out: int
+    regions_removed: int
+
+
+class _Stripper(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.skip = None        # [tag, nesting] of the region being dropped
+        self.keep = None        # [tag, nesting] of a kept region inside a dropped one
+        self.content_depth = 0  # inside <main>/<article>
+        self.regions_removed = 0
+
+    def _is_boilerplate(self, tag, attrs) -> bool:
+        if tag in DROP_TAGS:
+            return True
+        if tag == "header" and not self.content_depth:
+            return True
+        attrs = dict(attrs)
+        if (attrs.get("role") or "").lower() in DROP_ROLES:
+            return True
+        if tag in ("html", "body", "main", "article"):
+            return False  # some themes put "nav-open"-style state classes on <body>
+        tokens = f"{attrs.get('id') or ''} {attrs.get('class') or ''}".lower().split()
+        # State classes ("has-sidebar", "is-menu-open") sit on page wrappers, not on the chrome itself.
+        return any(DROP_ATTR_PATTERN.match(t) for t in tokens if not t.startswith(_STATE_PREFIXES))
+
+    def _emitting(self) -> bool:
+        return self.skip is None or self.keep is not None
+
+    def handle_starttag(self, tag, attrs):
+        if self.keep is not None:
+            if tag == self.keep[0]:
+                self.keep[1] += 1
+        elif self.skip is not None:
+            if tag == self.skip[0]:
+                self.skip[1] += 1
+            elif tag in KEEP_TAGS:
+                self.keep = [tag, 1]
+        elif tag not in VOID_TAGS and self._is_boilerplate(tag, attrs):
+            self.skip = [tag, 1]
+            self.regions_removed += 1
+            return
+        if tag in CONTENT_TAGS and self._emitting():
+            self.content_depth += 1
+        if self._emitting():
+            self.out.append(self.get_starttag_text())
+
+    def handle_startendtag(self, tag, attrs):
+        if self._emitting():
+            self.out.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self.keep is not None:
+            self.out.append(f"</{tag}>")
+            if tag == self.keep[0]:
+                self.keep[1] -= 1
+                if self.keep[1] == 0:
+                    self.keep = None
+            return
+        if self.skip is not None:
+            if tag == self.skip[0]:
+                self.skip[1] -= 1
+                if self.skip[1] == 0:
+                    self.skip = None
+            return
+        if tag in CONTENT_TAGS and self.content_depth:
+            self.content_depth -= 1
+        self.out.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        if self._emitting():
+            self.out.append(html.escape(data, quote=False))
+
+
+def strip_boilerplate(page_html: str) -> CleanResult:
+    """HTML with boilerplate regions removed (see module docstring)."""
+    parser = _Stripper()
+    try:
+        parser.feed(page_html)
+        parser.close()
+    except Exception:
+        # html.parser is lenient, but never let cleaning cost us the page.
+        return CleanResult(page_html, len(page_html), len(page_html), 0)
+    cleaned = "".join(parser.out)
+    # An unclosed region can swallow the rest of the page; if almost no text survived, keep the original.
+    text_in, text_out = len(_text(page_html)), len(_text(cleaned))
+    if text_in > 500 and text_out < text_in * 0.05:
+        return CleanResult(page_html, len(page_html), len(page_html), 0)
+    return CleanResult(cleaned, len(page_html), len(cleaned), parser.regions_removed)
+
+
+def _text(fragment: str) -> str:
+    fragment = re.sub(r"<(script|style)\b.*?</\1>", " ", fragment, flags=re.IGNORECASE | re.DOTALL)
+    return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", fragment)).strip()
+
+
+def dedupe_blocks(markdown: str) -> str:
+    """Drop paragraphs that already appeared earlier on the same page."""
+    seen, kept = set(), []
+    for block in re.split(r"\n\s*\n", markdown):
+        key = re.sub(r"\s+", " ", block).strip().lower()
+        if not key:
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(block.strip("\n"))
+    return "\n\n".join(kept) + "\n"
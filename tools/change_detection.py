@@ -0,0 +1,175 @@
+"""
+change_detection.py — Decide whether a re-crawled site changed enough to re-extract.
+
+A crawl's markdown is the homepage plus subpages, each introduced by a
+"--- SOURCE: HOMEPAGE (url) ---" / "--- SOURCE: SUBPAGE (url) ---" marker. We store three
+fingerprints per agency:
+    content_hash             sha256 of the raw markdown (byte-identical re-crawl)
+    normalized_content_hash  sha256 after stripping volatile content — dates/times,
+                             copyright years, cookie/consent banners, rotating testimonials
+    section_hashes           {section label: normalised sha256}, used to explain what changed
+
+If either whole-crawl hash matches the stored one the site is treated as unchanged.
+
+Usage:
+    python change_detection.py old.md new.md       # explain the differences between two crawls
+"""
+import re
+import sys
+import json
+import hashlib
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+SECTION_MARKER = re.compile(r"^--- SOURCE: (HOMEPAGE|SUBPAGE) \((.*?)\) ---$", re.MULTILINE)
+
+_DATE_PATTERNS = [
+    re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?)?\b"),
+    re.compile(r"\b\d{1,2}[/.]\d{1,2}[/.]\d{2,4}\b"),
+    re.compile(r"\b\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?,?\s+\d{4}\b", re.IGNORECASE),
+    re.compile(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b", re.IGNORECASE),
+    re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:am|pm)?\b", re.IGNORECASE),
+    re.compile(r"\b\d+\s+(?:second|minute|hour|day|week|month|year)s?\s+ago\b", re.IGNORECASE),
+]
+_COPYRIGHT = re.compile(r"(?:©|&copy;|\(c\)|copyright)\s*(?:\d{4}\s*[-–]\s*)?\d{4}", re.IGNORECASE)
+_COOKIE_LINE = re.compile(
+    r"\b(?:cookies?|cookie policy|consent|gdpr|accept all|reject all|manage preferences|privacy settings)\b",
+    re.IGNORECASE)
+# Quoted praise blocks: > blockquotes, or lines that are mostly a “quotation”.
+_TESTIMONIAL_LINE = re.compile(r"^\s*(?:>|[“\"].{20,}[”\"]\s*(?:[-–—].*)?$)")
+_TESTIMONIAL_HEADING = re.compile(r"^#+\s*.*\b(?:testimonials?|what (?:our )?clients say|reviews?|kind words)\b",
+                                  re.IGNORECASE)
+_CACHE_BUSTER = re.compile(r"([?&](?:v|ver|version|_|cb|t|ts)=)[\w.-]+", re.IGNORECASE)
+
+
+def iter_sections(markdown: str) -> List[Tuple[str, str, str]]:
+    """[(label, marker line, text)] per crawled page; the marker is "" for markdown without markers."""
+    matches = list(SECTION_MARKER.finditer(markdown or ""))
+    if not matches:
+        return [("HOMEPAGE", "", markdown or "")]
+    sections = []
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(markdown)
+        kind, url = m.group(1), m.group(2)
+        label = "HOMEPAGE" if kind == "HOMEPAGE" else f"SUBPAGE {urlparse(url).path or '/'}"
+        sections.append((label, m.group(0), markdown[m.end():end]))
+    return sections
+
+
+def split_sections(markdown: str) -> List[Tuple[str, str]]:
+    """[(label, text)] per crawled page. Labels are "HOMEPAGE" or the subpage path, e.g. "SUBPAGE /about".
+    Markdown without markers is a single "HOMEPAGE" section."""
+    return [(label, text) for label, _, text in iter_sections(markdown)]
+
+
+def normalize(text: str) -> str:
+    """Strip content that changes between crawls without the agency changing."""
+    lines, in_testimonials = [], False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("#"):
+            in_testimonials = bool(_TESTIMONIAL_HEADING.match(stripped))
+            if in_testimonials:
+                continue
+        elif in_testimonials:
+            continue  # the whole testimonials block rotates, drop it until the next heading
+        if _COOKIE_LINE.search(stripped) or _TESTIMONIAL_LINE.match(stripped):
+            continue
+        stripped = _COPYRIGHT.sub("©", stripped)
+        for pattern in _DATE_PATTERNS:
+            stripped = pattern.sub("<date>", stripped)
+        stripped = _CACHE_BUSTER.sub(r"\1", stripped)
+        lines.append(re.sub(r"\s+", " ", stripped))
+    return "\n".join(lines)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Fingerprint:
+    content_hash: str
+    normalized_content_hash: str
+    section_hashes: Dict[str, str] = field(default_factory=dict)
+
+    def as_columns(self) -> dict:
+        """The agencies columns store_data writes."""
+        return {"content_hash": self.content_hash,
+                "normalized_content_hash": self.normalized_content_hash,
+                "section_hashes": self.section_hashes}
+
+
+def fingerprint(markdown: str) -> Fingerprint:
+    sections = split_sections(markdown)
+    section_hashes = {}
+    for label, text in sections:
+        # Repeated labels (same path crawled twice) get a suffix so neither is lost.
+        key, n = label, 2
+        while key in section_hashes:
+            key, n = f"{label} #{n}", n + 1
+        section_hashes[key] = _sha256(normalize(text))
+    normalized = "\n".join(f"{label}\n{normalize(text)}" for label, text in sections)
+    return Fingerprint(_sha256(markdown or ""), _sha256(normalized), section_hashes)
+
+
+@dataclass
+class ChangeReport:
+    unchanged: bool
+    reason: str  # "identical", "volatile_only", "changed" or "new"
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+
+    def explain(self) -> str:
+        if self.reason == "identical":
+            return "identical to the last crawl"
+        if self.reason == "volatile_only":
+            return "only volatile content changed (dates, cookie banners, testimonials)"
+        if self.reason == "new":
+            return "no previous crawl stored"
+        parts = []
+        if self.changed:
+            parts.append(f"changed: {', '.join(self.changed)}")
+        if self.added:
+            parts.append(f"new pages: {', '.join(self.added)}")
+        if self.removed:
+            parts.append(f"pages gone: {', '.join(self.removed)}")
+        return "; ".join(parts) or "content changed"
+
+
+def compare(new: Fingerprint, stored: Optional[dict]) -> ChangeReport:
+    """Compare a fresh fingerprint with the stored agencies columns (or None if never stored)."""
+    if not stored or not stored.get("content_hash"):
+        return ChangeReport(False, "new")
+    if stored.get("content_hash") == new.content_hash:
+        return ChangeReport(True, "identical")
+    if stored.get("normalized_content_hash") == new.normalized_content_hash:
+        return ChangeReport(True, "volatile_only")
+    old_sections = stored.get("section_hashes") or {}
+    return ChangeReport(
+        False, "changed",
+        added=[k for k in new.section_hashes if k not in old_sections],
+        removed=[k for k in old_sections if k not in new.section_hashes],
+        changed=[k for k, h in new.section_hashes.items() if k in old_sections and old_sections[k] != h],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain what changed between two crawls.")
+    parser.add_argument("old", help="Markdown from the earlier crawl")
+    parser.add_argument("new", help="Markdown from the later crawl")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = fingerprint(f.read())
+    with open(args.new) as f:
+        new = fingerprint(f.read())
+    report = compare(new, old.as_columns())
+    print(json.dumps({"unchanged": report.unchanged, "reason": report.reason,
+                      "explanation": report.explain(), **new.as_columns()}, indent=2))
+    sys.exit(0 if report.unchanged else 1)
@@ -0,0 +1,127 @@
+"""
+completeness.py — Binary completeness checks on an extracted Agency record.
+
+Shared by eval.py, which scores extractions with run_assertions(), and extract_insights'
+cascade, which escalates a failing field to the next model tier only if has_evidence() finds
+the crawled content states it at all. A field the site never mentions fails at every tier,
+so sending it up would just pay for all of them.
+"""
+import re
+from typing import Dict
+
+JOB_TITLE_KEYWORDS = (
+    r'(?:CEO|CTO|COO|CFO|Founder|Co-Founder|Managing Director|'
+    r'Head of|Principal|President|Vice President)'
+)
+# A "named individual" is a Firstname Lastname pattern within 80 chars of a job title keyword —
+# filters out UI phrases like "Shopify Plus", "Our Team".
+PERSON_PATTERN = re.compile(
+    r'(?:'
+    r'[A-Z][a-z]+\s+[A-Z][a-z]+[^\n]{0,80}' + JOB_TITLE_KEYWORDS +
+    r'|' + JOB_TITLE_KEYWORDS + r'[^\n]{0,80}[A-Z][a-z]+\s+[A-Z][a-z]+'
+    r')',
+    re.MULTILINE,
+)
+KNOWN_COMPETITORS = [
+    "klaviyo", "yotpo", "gorgias", "recharge", "attentive",
+    "postscript", "okendo", "reviews.io", "loop returns"
+]
+
+# What the content has to show before a missing field is worth a stronger model.
+HEADCOUNT_PATTERN = re.compile(
+    r"\b\d[\d,]*\+?\s*(?:employees|staff|people|team members|strong|specialists|experts)\b"
+    r"|\bteam of (?:over |more than )?\d+", re.IGNORECASE)
+REVENUE_PATTERN = re.compile(
+    r"[£$€]\s?\d[\d.,]*\s?(?:k|m|mn|bn|million|billion)\b|\b(?:turnover|annual revenue)\b", re.IGNORECASE)
+OFFICE_PATTERN = re.compile(
+    r"\b(?:offices?|headquarter(?:s|ed)|HQ|based in|located in|studios? in)\b"
+    r"|\b[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2}\b")  # or a UK postcode
+KNOWN_TECH = ["shopify", "magento", "adobe commerce", "bigcommerce", "salesforce commerce", "woocommerce",
+              "shopware", "commercetools", "react", "next.js", "vue", "nuxt", "hydrogen", "headless", "gatsby",
+              "netlify", "vercel", "contentful", "sanity", "storyblok", "wordpress", "laravel", "klaviyo"]
+
+
+def _nonempty_list(val, min_items=1):
+    return isinstance(val, list) and len(val) >= min_items
+
+
+def _nonempty_str(val, min_len=1):
+    return isinstance(val, str) and len(val.strip()) >= min_len
+
+
+def names_in_content(raw_content: str) -> bool:
+    return bool(PERSON_PATTERN.search(raw_content))
+
+
+def competitors_in_content(raw_content: str) -> bool:
+    content_lower = raw_content.lower()
+    return any(c in content_lower for c in KNOWN_COMPETITORS)
+
+
+def run_assertions(data: dict, raw_content: str = "") -> Dict[str, bool]:
+    """Return a dict of assertion_name → bool."""
+    results = {}
+
+    # 1. Schema valid — no error key in output
+    results["schema_valid"] = "error" not in data
+
+    if "error" in data:
+        # All remaining assertions fail if schema is invalid
+        for k in ["name", "description_quality", "revenue_estimated",
+                  "headcount_found", "specializations", "office_locations",
+                  "directors", "tech_stack", "competitor_intelligence"]:
+            results[k] = False
+        return results
+
+    # 2. Name extracted
+    results["name"] = _nonempty_str(data.get("name"), min_len=2)
+
+    # 3. Description quality
+    results["description_quality"] = _nonempty_str(data.get("description"), min_len=80)
+
+    # 4. Revenue estimated
+    results["revenue_estimated"] = _nonempty_str(data.get("revenue_estimate"))
+
+    # 5. Headcount found
+    results["headcount_found"] = _nonempty_str(data.get("headcount"))
+
+    # 6. Specializations populated
+    results["specializations"] = _nonempty_list(data.get("specializations"), min_items=2)
+
+    # 7. Office locations found
+    results["office_locations"] = _nonempty_list(data.get("office_locations"), min_items=1)
+
+    # 8. Directors extracted
+    # Pass if directors populated, OR if the scraped content has no detectable
+    # named individuals (meaning enrichment is the appropriate source, not the website).
+    results["directors"] = _nonempty_list(data.get("directors"), min_items=1) or not names_in_content(raw_content)
+
+    # 9. Tech stack populated
+    results["tech_stack"] = _nonempty_list(data.get("tech_stack"), min_items=2)
+
+    # 10. Competitor intelligence checked
+    # Pass if competitor_partnerships is populated, OR if the raw scraped content
+    # contains no known competitor names (meaning absence is correct).
+    if competitors_in_content(raw_content):
+        # Content mentions competitors — we expect them to be extracted
+        results["competitor_intelligence"] = _nonempty_list(data.get("competitor_partnerships", []), min_items=1)
+    else:
+        # No competitors in source content — empty list is correct
+        results["competitor_intelligence"] = True
+
+    return results
+
+
+def has_evidence(field: str, raw_content: str) -> bool:
+    """Whether `raw_content` states the Agency `field` at all, so a stronger model could fill it.
+    directors and competitor_partnerships are already guarded inside run_assertions."""
+    if field == "headcount":
+        return bool(HEADCOUNT_PATTERN.search(raw_content))
+    if field == "revenue_estimate":
+        return bool(REVENUE_PATTERN.search(raw_content))
+    if field == "office_locations":
+        return bool(OFFICE_PATTERN.search(raw_content))
+    if field == "tech_stack":
+        content_lower = raw_content.lower()
+        return sum(t in content_lower for t in KNOWN_TECH) >= 2  # the check wants two entries
+    return True
@@ -0,0 +1,211 @@
+"""
+content_packer.py — Fit crawled markdown into a token budget before it goes to the LLM.
+
+Replaces the blind character cuts (markdown[:25000]) that dropped the Team/Careers subpages
+appended at the end of a crawl while homepage navigation used up the budget:
+
+1. Split the crawl on its "--- SOURCE: ... ---" markers and label each section
+   homepage / team / partners / careers / other (from the subpage URL).
+2. Drop blocks (runs of non-blank lines) already seen earlier in the crawl — the nav menu,
+   footer and cookie text repeated on every page — and duplicate blocks within a page.
+3. Share the token budget between sections by weight. Sections that need less than their
+   share hand the surplus on to the others, and each section is cut at a block boundary.
+
+Tokens are counted with the target model's tiktoken encoding when tiktoken is installed,
+otherwise estimated at ~4 characters per token.
+
+Usage:
+    python content_packer.py --file data/velstar.md --budget 6000
+"""
+import re
+import json
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from change_detection import SECTION_MARKER
+import link_classifier
+
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+# Relative share of the budget per section kind (normalised over the kinds present).
+SECTION_WEIGHTS = {"homepage": 0.35, "team": 0.3, "partners": 0.15, "careers": 0.1, "other": 0.1}
+_CHARS_PER_TOKEN = 4
+_encodings: Dict[str, object] = {}
+
+
+def _encoding(model: Optional[str]):
+    if not HAS_TIKTOKEN:
+        return None
+    name = (model or "gpt-4o-mini").split("/")[-1]
+    if name not in _encodings:
+        try:
+            _encodings[name] = tiktoken.encoding_for_model(name)
+        except KeyError:
+            # Non-OpenAI models (Gemini, Claude, Llama) — o200k is a close enough proxy for budgeting.
+            _encodings[name] = tiktoken.get_encoding("o200k_base")
+    return _encodings[name]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        return text[:max_tokens * _CHARS_PER_TOKEN]
+    tokens = enc.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
+
+
+@dataclass
+class PackedSection:
+    header: str
+    kind: str
+    blocks: List[str]
+    tokens_in: int = 0
+    tokens_out: int = 0
+    text: str = ""
+
+
+@dataclass
+class PackResult:
+    text: str
+    model: Optional[str]
+    budget: int
+    tokens_in: int
+    tokens_out: int
+    duplicate_tokens: int  # removed as nav/footer/repeated blocks
+    sections: List[dict] = field(default_factory=list)
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_in - self.tokens_out)
+
+
+def section_kind(header: str) -> str:
+    m = SECTION_MARKER.match(header)
+    if not m or m.group(1) == "HOMEPAGE":
+        return "homepage"
+    page_type = link_classifier.page_type_of(m.group(2))
+    if page_type is None:
+        return "other"
+    return "team" if page_type == "about" else page_type  # About pages are where the people are listed
+
+
+def _split(markdown: str) -> List[PackedSection]:
+    matches = list(SECTION_MARKER.finditer(markdown))
+    if not matches:
+        return [PackedSection("", "homepage", _blocks(markdown))]
+    sections = []
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(markdown)
+        sections.append(PackedSection(m.group(0), section_kind(m.group(0)), _blocks(markdown[m.end():end])))
+    return sections
+
+
+def _blocks(text: str) -> List[str]:
+    return [b.strip("\n") for b in re.split(r"\n\s*\n", text) if b.strip()]
+
+
+def _block_key(block: str) -> str:
+    return re.sub(r"\s+", " ", block).strip().lower()
+
+
+def _allocate(sections: List[PackedSection], budget: int) -> List[int]:
+    """Water-filling: weight-proportional shares, with unused allowance redistributed."""
+    alloc = [0] * len(sections)
+    open_idx = [i for i, s in enumerate(sections) if s.tokens_in > 0]
+    remaining = budget
+    while open_idx and remaining > 0:
+        total_weight = sum(SECTION_WEIGHTS[sections[i].kind] for i in open_idx)
+        shares = {i: remaining * SECTION_WEIGHTS[sections[i].kind] / total_weight for i in open_idx}
+        satisfied = [i for i in open_idx if sections[i].tokens_in - alloc[i] <= shares[i]]
+        if not satisfied:
+            for i in open_idx:
+                alloc[i] += int(shares[i])
+            break
+        for i in satisfied:
+            need = sections[i].tokens_in - alloc[i]
+            alloc[i] += need
+            remaining -= need
+            open_idx.remove(i)
+    return alloc
+
+
+def pack(markdown: str, budget: int, model: Optional[str] = None) -> PackResult:
+    """Dedupe and fit `markdown` into `budget` tokens, keeping every section represented."""
+    markdown = markdown or ""
+    sections = _split(markdown)
+    tokens_in = count_tokens(markdown, model)
+
+    seen = set()
+    duplicate_tokens = 0
+    for section in sections:
+        kept = []
+        for block in section.blocks:
+            key = _block_key(block)
+            if key in seen:
+                duplicate_tokens += count_tokens(block, model)
+                continue
+            seen.add(key)
+            kept.append(block)
+        section.blocks = kept
+        section.tokens_in = sum(count_tokens(b, model) for b in kept)
+
+    header_tokens = sum(count_tokens(s.header, model) + 2 for s in sections if s.header)
+    alloc = _allocate(sections, max(0, budget - header_tokens))
+
+    parts = []
+    for section, allowance in zip(sections, alloc):
+        out, used = [], 0
+        for block in section.blocks:
+            cost = count_tokens(block, model)
+            if used + cost > allowance:
+                tail = truncate_tokens(block, allowance - used, model)
+                if tail.strip():
+                    out.append(tail)
+                    used += count_tokens(tail, model)
+                break
+            out.append(block)
+            used += cost
+        section.tokens_out = used
+        section.text = "\n\n".join(out)
+        parts.append(f"{section.header}\n{section.text}" if section.header else section.text)
+
+    text = "\n\n".join(parts)
+    return PackResult(
+        text=text, model=model, budget=budget, tokens_in=tokens_in,
+        tokens_out=count_tokens(text, model), duplicate_tokens=duplicate_tokens,
+        sections=[{"header": s.header, "kind": s.kind, "tokens_in": s.tokens_in, "tokens_out": s.tokens_out}
+                  for s in sections],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show how a crawl would be packed into a token budget.")
+    parser.add_argument("--file", required=True, help="Crawled markdown file")
+    parser.add_argument("--budget", type=int, default=6000, help="Token budget (default 6000)")
+    parser.add_argument("--model", default="openai/gpt-4o-mini", help="Model whose tokenizer to use")
+    parser.add_argument("--print", action="store_true", help="Print the packed text instead of the report")
+    args = parser.parse_args()
+
+    with open(args.file) as f:
+        result = pack(f.read(), args.budget, args.model)
+    if args.print:
+        print(result.text)
+    else:
+        print(json.dumps({"tokenizer": "tiktoken" if HAS_TIKTOKEN else "estimate", "budget": result.budget,
+                          "tokens_in": result.tokens_in, "tokens_out": result.tokens_out,
+                          "tokens_saved": result.tokens_saved, "duplicate_tokens": result.duplicate_tokens,
+                          "sections": result.sections}, indent=2))
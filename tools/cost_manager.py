@@ -1,9 +1,11 @@
 import sqlite3
 import os
+import sys
 import json
-import time
-from datetime import datetime
-import tracing
+import atexit
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
 
 # ANSI color codes
 _R = "\033[0m"       # reset
@@ -196,15 +198,145 @@ class CostManager:
         print(f"           python scrape_agency.py --url <url> --model google/gemini-flash-1.5")
         print(f"{_BOLD}{'─'*72}{_R}\n")
 
+    # Inserts are buffered and written in one transaction once FLUSH_ROWS are waiting or
+    # FLUSH_INTERVAL seconds after the first; reads flush first, so they always see this
+    # process's own rows. Other processes see them after the flush. A flush that finds the
+    # database locked is retried up to FLUSH_RETRIES times, with at most MAX_PENDING_ROWS kept
+    # waiting; rows that can't be written (or outlast that) go to the dead-letter file.
+    FLUSH_ROWS = 64
+    FLUSH_INTERVAL = 1.0
+    FLUSH_RETRIES = 5
+    MAX_PENDING_ROWS = 10_000
+
     def __init__(self, db_path=None):
+        """Prefer get_cost_manager(), which shares one instance (and connection) per database."""
         if db_path is None:
             db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "costs.db")
         self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._pid = None
+        self._pending = []  # [[(sql, params), ...]], one group per record_* call
+        self._pending_rows = 0
+        self._failed_flushes = 0
+        self._timer = None
+        self.dead_letter_path = db_path + ".deadletter.jsonl"
         self._init_db()
+        atexit.register(self.flush)
+
+    def _connection(self):
+        # Called with self._lock held. A forked child gets its own connection.
+        if self._conn is None or self._pid != os.getpid():
+            # isolation_level=None: transactions are explicit (see _flush_locked).
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def _insert(self, sql, params):
+        self._insert_all([(sql, params)])
+
+    def _insert_all(self, statements):
+        """Queue [(sql, params)]; they are always flushed in the same transaction."""
+        with self._lock:
+            self._pending.append(list(statements))
+            self._pending_rows += len(statements)
+            if self._pending_rows >= self.FLUSH_ROWS and not self._failed_flushes:
+                self._flush_locked()
+            else:
+                self._schedule_flush_locked()
+
+    def _schedule_flush_locked(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write buffered rows now."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, rows = self._pending, [], self._pending_rows
+        self._pending_rows = 0
+        conn = self._connection()
+        try:
+            self._write(conn, batch)
+            self._failed_flushes = 0
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                self._write_each(conn, batch)
+                return
+            self._failed_flushes += 1
+            if self._failed_flushes >= self.FLUSH_RETRIES:
+                self._failed_flushes = 0
+                self._dead_letter(batch, e)
+                return
+            # Database busy: keep the rows for the next flush, oldest dropped beyond MAX_PENDING_ROWS.
+            self._pending, self._pending_rows = batch + self._pending, rows + self._pending_rows
+            while self._pending_rows > self.MAX_PENDING_ROWS:
+                group = self._pending.pop(0)
+                self._pending_rows -= len(group)
+                self._dead_letter([group], e)
+            sys.stderr.write(f"[cost_manager] flush of {rows} rows failed "
+                             f"({self._failed_flushes}/{self.FLUSH_RETRIES}), will retry: {e}\n")
+            self._schedule_flush_locked()
+        except sqlite3.Error:
+            self._write_each(conn, batch)
+
+    def _write(self, conn, groups):
+        try:
+            # IMMEDIATE takes the write lock up front, so concurrent processes queue on the busy
+            # timeout instead of failing mid-transaction.
+            conn.execute("BEGIN IMMEDIATE")
+            # Rows for different tables are independent, so each statement runs once over all its rows.
+            by_sql = OrderedDict()
+            for group in groups:
+                for sql, params in group:
+                    by_sql.setdefault(sql, []).append(params)
+            for sql, rows in by_sql.items():
+                conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _write_each(self, conn, groups):
+        """Some row can never be written: write group by group, dead-lettering the ones that fail."""
+        for group in groups:
+            try:
+                self._write(conn, [group])
+            except sqlite3.Error as e:
+                self._dead_letter([group], e)
+
+    def _dead_letter(self, groups, error):
+        rows = [{"error": str(error), "sql": " ".join(sql.split()), "params": list(params)}
+                for group in groups for sql, params in group]
+        sys.stderr.write(f"[cost_manager] dropped {len(rows)} unwritable rows ({error}), "
+                         f"kept in {self.dead_letter_path}\n")
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + "\n")
+        except OSError:
+            pass
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            self._flush_locked()
+            return self._connection().execute(sql, params).fetchall()
 
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
+        with self._lock:
+            self._connection().executescript("""
                 CREATE TABLE IF NOT EXISTS llm_usage (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     run_id TEXT,
@@ -212,9 +344,135 @@ class CostManager:
                     prompt_tokens INTEGER,
                     completion_tokens INTEGER,
                     cost REAL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    task TEXT
+                );
+
+                -- Rollups of llm_usage, maintained in the same transaction as each insert, so
+                -- --stats and run summaries never scan llm_usage. task '' = untagged.
+                CREATE TABLE IF NOT EXISTS llm_usage_daily (
+                    day TEXT,
+                    model TEXT,
+                    task TEXT,
+                    calls INTEGER,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    cost REAL,
+                    PRIMARY KEY (day, model, task)
+                );
+                CREATE TABLE IF NOT EXISTS llm_usage_runs (
+                    run_id TEXT,
+                    model TEXT,
+                    calls INTEGER,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    cost REAL,
+                    PRIMARY KEY (run_id, model)
+                );
+                -- Which runs spent anything on which day: "runs this week" is a distinct count over
+                -- the week's rows, so a run crossing midnight still counts once.
+                CREATE TABLE IF NOT EXISTS llm_usage_run_days (
+                    day TEXT,
+                    run_id TEXT,
+                    PRIMARY KEY (day, run_id)
+                );
+                -- Per-day run counters from earlier versions, which summed such runs twice.
+                DROP TRIGGER IF EXISTS llm_usage_run_days_count;
+                DROP TABLE IF EXISTS llm_usage_daily_runs;
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+                -- One row per cached-gateway call (llm_gateway.chat_completion). Hits cost nothing;
+                -- saved_cost is what the call would have been billed.
+                CREATE TABLE IF NOT EXISTS llm_cache_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT,
+                    model TEXT,
+                    task TEXT,
+                    hit INTEGER,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    saved_cost REAL,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
+                );
+
+                -- Prompt content before/after content_packer.pack() — the tokens packing kept off the bill.
+                CREATE TABLE IF NOT EXISTS content_packing (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT,
+                    task TEXT,
+                    model TEXT,
+                    tokens_in INTEGER,
+                    tokens_out INTEGER,
+                    duplicate_tokens INTEGER,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+
+                -- One row per model tier tried by extract_insights --cascade.
+                CREATE TABLE IF NOT EXISTS extraction_cascade (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT,
+                    tier INTEGER,
+                    model TEXT,
+                    fields_requested INTEGER,
+                    fields_resolved INTEGER,
+                    fields_remaining INTEGER,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+
+                -- Run summaries filter on run_id, period stats on timestamp.
+                CREATE INDEX IF NOT EXISTS llm_usage_run_id_idx ON llm_usage (run_id);
+                CREATE INDEX IF NOT EXISTS llm_usage_timestamp_idx ON llm_usage (timestamp);
+                CREATE INDEX IF NOT EXISTS llm_cache_events_run_id_idx ON llm_cache_events (run_id);
+                CREATE INDEX IF NOT EXISTS llm_cache_events_timestamp_idx ON llm_cache_events (timestamp);
+                CREATE INDEX IF NOT EXISTS content_packing_run_id_idx ON content_packing (run_id);
+                CREATE INDEX IF NOT EXISTS extraction_cascade_run_id_idx ON extraction_cascade (run_id);
             """)
+            conn = self._connection()
+            # costs.db files from before llm_usage had a task column.
+            if "task" not in {row[1] for row in conn.execute("PRAGMA table_info(llm_usage)")}:
+                try:
+                    conn.execute("ALTER TABLE llm_usage ADD COLUMN task TEXT")
+                except sqlite3.OperationalError:
+                    pass  # another process added it first
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'rollups_built'").fetchone() is None:
+                self.backfill_rollups(only_if_missing=True)
+
+    def backfill_rollups(self, only_if_missing=False):
+        """Rebuild the llm_usage rollups from the full llm_usage history. Runs once by itself on
+        a costs.db that predates them; `cost_manager.py --backfill-rollups` forces a rebuild.
+        Returns the number of usage rows rolled up."""
+        with self._lock:
+            self._flush_locked()
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Checked again under the write lock: another process may have just built them.
+                if only_if_missing and conn.execute("SELECT 1 FROM meta WHERE key = 'rollups_built'").fetchone():
+                    conn.execute("COMMIT")
+                    return 0
+                # executescript() would commit first, so one statement at a time inside the transaction.
+                for sql in ("DELETE FROM llm_usage_daily",
+                            "DELETE FROM llm_usage_runs",
+                            "DELETE FROM llm_usage_run_days",
+                            """INSERT INTO llm_usage_daily (day, model, task, calls, prompt_tokens, completion_tokens, cost)
+                               SELECT date(timestamp), model, COALESCE(task, ''), COUNT(*), SUM(prompt_tokens),
+                                      SUM(completion_tokens), SUM(cost)
+                               FROM llm_usage GROUP BY date(timestamp), model, COALESCE(task, '')""",
+                            """INSERT INTO llm_usage_runs (run_id, model, calls, prompt_tokens, completion_tokens, cost)
+                               SELECT run_id, model, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost)
+                               FROM llm_usage WHERE run_id IS NOT NULL GROUP BY run_id, model""",
+                            """INSERT INTO llm_usage_run_days (day, run_id)
+                               SELECT DISTINCT date(timestamp), run_id FROM llm_usage WHERE run_id IS NOT NULL"""):
+                    conn.execute(sql)
+                rows = conn.execute("SELECT COUNT(*) FROM llm_usage").fetchone()[0]
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollups_built', ?)",
+                             (datetime.now(timezone.utc).isoformat(),))
+                conn.execute("COMMIT")
+                return rows
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
 
     def calculate_cost(self, model, prompt_tokens, completion_tokens):
         pricing = self.PRICING.get(model, (0, 0))
@@ -222,75 +480,145 @@ class CostManager:
         output_cost = (completion_tokens / 1_000_000) * pricing[1]
         return input_cost + output_cost
 
-    def record_usage(self, run_id, model, prompt_tokens, completion_tokens):
+    def record_usage(self, run_id, model, prompt_tokens, completion_tokens, task=None):
         cost = self.calculate_cost(model, prompt_tokens, completion_tokens)
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT INTO llm_usage (run_id, model, prompt_tokens, completion_tokens, cost)
-                VALUES (?, ?, ?, ?, ?)
-            """, (run_id, model, prompt_tokens, completion_tokens, cost))
-
-        # ponytail: no per-call start time available here (called post-hoc), so span is zero-duration.
-        now = time.time_ns()
-        trace_id = os.environ.get("TWOTAIL_TRACE_ID") or tracing.new_trace_id()
-        tracing.send_span(
-            trace_id, tracing.new_span_id(), os.environ.get("TWOTAIL_PARENT_SPAN_ID"),
-            f"llm.{model}", now, now,
-            attributes={
-                "gen_ai.system": model.split("/")[0] if "/" in model else "openai",
-                "gen_ai.request.model": model,
-                "gen_ai.usage.input_tokens": prompt_tokens,
-                "gen_ai.usage.output_tokens": completion_tokens,
-                "run.id": run_id,
-                "cost.usd": cost,
-            },
-        )
+        now = datetime.now(timezone.utc)
+        timestamp, day = now.strftime("%Y-%m-%d %H:%M:%S"), now.strftime("%Y-%m-%d")
+        # The usage row and its rollup updates land in the same flush transaction.
+        statements = [("""
+            INSERT INTO llm_usage (run_id, model, prompt_tokens, completion_tokens, cost, timestamp, task)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (run_id, model, prompt_tokens, completion_tokens, cost, timestamp, task)), ("""
+            INSERT INTO llm_usage_daily (day, model, task, calls, prompt_tokens, completion_tokens, cost)
+            VALUES (?, ?, ?, 1, ?, ?, ?)
+            ON CONFLICT (day, model, task) DO UPDATE SET
+                calls = calls + 1,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                cost = cost + excluded.cost
+        """, (day, model, task or "", prompt_tokens, completion_tokens, cost))]
+        if run_id is not None:
+            statements += [("""
+                INSERT INTO llm_usage_runs (run_id, model, calls, prompt_tokens, completion_tokens, cost)
+                VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT (run_id, model) DO UPDATE SET
+                    calls = calls + 1,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    completion_tokens = completion_tokens + excluded.completion_tokens,
+                    cost = cost + excluded.cost
+            """, (run_id, model, prompt_tokens, completion_tokens, cost)),
+                ("INSERT OR IGNORE INTO llm_usage_run_days (day, run_id) VALUES (?, ?)", (day, run_id))]
+        self._insert_all(statements)
+
         return cost
 
+    def record_cache_event(self, run_id, model, task, hit, prompt_tokens=0, completion_tokens=0):
+        saved = self.calculate_cost(model, prompt_tokens, completion_tokens) if hit else 0.0
+        self._insert("""
+            INSERT INTO llm_cache_events (run_id, model, task, hit, prompt_tokens, completion_tokens, saved_cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (run_id, model, task, int(bool(hit)), prompt_tokens, completion_tokens, saved))
+        return saved
+
+    def record_packing(self, run_id, task, model, tokens_in, tokens_out, duplicate_tokens=0):
+        self._insert("""
+            INSERT INTO content_packing (run_id, task, model, tokens_in, tokens_out, duplicate_tokens)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (run_id, task, model, tokens_in, tokens_out, duplicate_tokens))
+
+    def get_packing_summary(self, run_id):
+        row = self._rows("""
+            SELECT COALESCE(SUM(tokens_in), 0), COALESCE(SUM(tokens_out), 0), COALESCE(SUM(duplicate_tokens), 0)
+            FROM content_packing
+            WHERE run_id = ?
+        """, (run_id,))[0]
+        return {"tokens_in": row[0], "tokens_out": row[1], "tokens_saved": max(0, row[0] - row[1]),
+                "duplicate_tokens": row[2]}
+
+    def record_cascade_tier(self, run_id, tier, model, fields_requested, fields_resolved, fields_remaining):
+        self._insert("""
+            INSERT INTO extraction_cascade (run_id, tier, model, fields_requested, fields_resolved, fields_remaining)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (run_id, tier, model, fields_requested, fields_resolved, fields_remaining))
+
+    def get_cascade_summary(self, run_id=None):
+        """Per cascade tier: how often it was reached, how many requested fields it resolved,
+        and how often it finished the extraction (nothing left to escalate)."""
+        where, params = ("WHERE run_id = ?", (run_id,)) if run_id else ("", ())
+        rows = self._rows(f"""
+            SELECT tier, model, COUNT(*), SUM(fields_requested), SUM(fields_resolved),
+                   SUM(CASE WHEN fields_remaining = 0 THEN 1 ELSE 0 END)
+            FROM extraction_cascade
+            {where}
+            GROUP BY tier, model
+            ORDER BY tier, model
+        """, params)
+        return [{"tier": r[0], "model": r[1], "calls": r[2], "fields_requested": r[3], "fields_resolved": r[4],
+                 "completed": r[5]} for r in rows]
+
+    def get_cache_summary(self, run_id=None):
+        """LLM response-cache hits/misses per task, for one run or all time."""
+        where, params = ("WHERE run_id = ?", (run_id,)) if run_id else ("", ())
+        rows = self._rows(f"""
+            SELECT task, SUM(hit), SUM(1 - hit), COALESCE(SUM(saved_cost), 0)
+            FROM llm_cache_events
+            {where}
+            GROUP BY task
+            ORDER BY task
+        """, params)
+        return [{"task": r[0], "hits": r[1], "misses": r[2], "saved_cost": r[3]} for r in rows]
+
     def get_period_stats(self):
-        """Returns all-time, monthly, and weekly cost breakdowns from the local DB."""
-        with sqlite3.connect(self.db_path) as conn:
-            periods = {
-                "all_time":  ("All Time",  "1=1"),
-                "monthly":   ("This Month","strftime('%Y-%m', timestamp) = strftime('%Y-%m', 'now')"),
-                "weekly":    ("This Week", "timestamp >= datetime('now', '-7 days')"),
+        """Returns all-time, monthly, and weekly cost breakdowns from the local DB.
+        Answered from the daily rollups, so periods are whole UTC days (the week is today and the 6 before it)."""
+        periods = {
+            "all_time":  ("All Time",  "1=1"),
+            "monthly":   ("This Month","day >= strftime('%Y-%m-01', 'now')"),
+            "weekly":    ("This Week", "day >= date('now', '-6 days')"),
+        }
+        result = {}
+        for key, (label, where) in periods.items():
+            row = self._rows(f"""
+                SELECT
+                    COALESCE(SUM(cost), 0)             AS total_cost,
+                    COALESCE(SUM(prompt_tokens), 0)    AS total_prompt,
+                    COALESCE(SUM(completion_tokens), 0) AS total_completion
+                FROM llm_usage_daily
+                WHERE {where}
+            """)[0]
+            runs = self._rows(f"SELECT COUNT(DISTINCT run_id) FROM llm_usage_run_days WHERE {where}")[0][0]
+            # Top models and tasks
+            top_models = [{"model": r[0], "cost": r[1]} for r in self._rows(f"""
+                SELECT model, SUM(cost) AS spend
+                FROM llm_usage_daily
+                WHERE {where}
+                GROUP BY model
+                ORDER BY spend DESC
+                LIMIT 3
+            """)]
+            top_tasks = [{"task": r[0] or None, "cost": r[1]} for r in self._rows(f"""
+                SELECT task, SUM(cost) AS spend
+                FROM llm_usage_daily
+                WHERE {where}
+                GROUP BY task
+                ORDER BY spend DESC
+                LIMIT 3
+            """)]
+            result[key] = {
+                "label": label,
+                "total_cost": row[0],
+                "prompt_tokens": row[1],
+                "completion_tokens": row[2],
+                "runs": runs,
+                "top_models": top_models,
+                "top_tasks": top_tasks,
             }
-            result = {}
-            for key, (label, where) in periods.items():
-                cursor = conn.execute(f"""
-                    SELECT
-                        COALESCE(SUM(cost), 0)             AS total_cost,
-                        COALESCE(SUM(prompt_tokens), 0)    AS total_prompt,
-                        COALESCE(SUM(completion_tokens), 0) AS total_completion,
-                        COUNT(DISTINCT run_id)             AS runs
-                    FROM llm_usage
-                    WHERE {where}
-                """)
-                row = cursor.fetchone()
-                # Top models
-                cur2 = conn.execute(f"""
-                    SELECT model, SUM(cost) AS spend
-                    FROM llm_usage
-                    WHERE {where}
-                    GROUP BY model
-                    ORDER BY spend DESC
-                    LIMIT 3
-                """)
-                top_models = [{"model": r[0], "cost": r[1]} for r in cur2.fetchall()]
-                result[key] = {
-                    "label": label,
-                    "total_cost": row[0],
-                    "prompt_tokens": row[1],
-                    "completion_tokens": row[2],
-                    "runs": row[3],
-                    "top_models": top_models,
-                }
-            return result
+        return result
 
     @classmethod
     def show_stats(cls, db_path=None):
         """Print a cost summary table for all-time, monthly, and weekly."""
-        cm = cls(db_path)
+        cm = get_cost_manager(db_path)
         stats = cm.get_period_stats()
 
         print(f"\n{_BOLD}{'─'*60}{_R}")
@@ -309,32 +637,51 @@ class CostManager:
                 print(f"    Top models:")
                 for m in s["top_models"]:
                     print(f"      {_DIM}{m['model']:<45}{_R}  ${m['cost']:.4f}")
+            if s["top_tasks"]:
+                print(f"    Top tasks:")
+                for t in s["top_tasks"]:
+                    print(f"      {_DIM}{t['task'] or '(untagged)':<45}{_R}  ${t['cost']:.4f}")
             print()
 
         print(f"{_BOLD}{'─'*60}{_R}\n")
 
+    def get_total_cost(self):
+        """Total spend across all recorded runs, or None if nothing has been recorded."""
+        return self._rows("SELECT SUM(cost) FROM llm_usage_daily")[0][0]
+
     def get_run_summary(self, run_id):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT model, SUM(prompt_tokens), SUM(completion_tokens), SUM(cost)
-                FROM llm_usage
-                WHERE run_id = ?
-                GROUP BY model
-            """, (run_id,))
-            rows = cursor.fetchall()
-            
-            summary = []
-            total_cost = 0
-            for row in rows:
-                summary.append({
-                    "model": row[0],
-                    "prompt_tokens": row[1],
-                    "completion_tokens": row[2],
-                    "cost": row[3]
-                })
-                total_cost += row[3]
-            
-            return {"total_cost": total_cost, "details": summary}
+        rows = self._rows("""
+            SELECT model, prompt_tokens, completion_tokens, cost
+            FROM llm_usage_runs
+            WHERE run_id = ?
+        """, (run_id,))
+
+        summary = []
+        total_cost = 0
+        for row in rows:
+            summary.append({
+                "model": row[0],
+                "prompt_tokens": row[1],
+                "completion_tokens": row[2],
+                "cost": row[3]
+            })
+            total_cost += row[3]
+
+        return {"total_cost": total_cost, "details": summary}
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_cost_manager(db_path=None):
+    """The process-wide CostManager for `db_path` (default tools/costs.db): one connection,
+    one write buffer, shared by every thread."""
+    key = os.path.abspath(db_path) if db_path else None
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = CostManager(db_path)
+        return _managers[key]
 
 if __name__ == "__main__":
     import argparse
@@ -343,6 +690,9 @@ if __name__ == "__main__":
     parser.add_argument("--all", action="store_true", help="Get total cost for all runs")
     parser.add_argument("--models", action="store_true", help="Show model cost chart and recommendations")
     parser.add_argument("--stats", action="store_true", help="Show all-time, monthly, and weekly cost summary")
+    parser.add_argument("--cascade", action="store_true", help="Show per-tier hit rates for extract_insights --cascade")
+    parser.add_argument("--backfill-rollups", action="store_true",
+                        help="Rebuild the daily/per-run cost rollups from the full llm_usage history")
     args = parser.parse_args()
 
     if args.models:
@@ -353,17 +703,25 @@ if __name__ == "__main__":
         CostManager.show_stats()
         exit(0)
 
-    cm = CostManager()
-    if args.summary:
+    cm = get_cost_manager()
+    if args.backfill_rollups:
+        print(f"Rolled up {cm.backfill_rollups():,} usage rows.")
+    elif args.cascade:
+        rows = cm.get_cascade_summary()
+        if not rows:
+            print("No cascade extractions recorded yet.")
+        for row in rows:
+            field_rate = row["fields_resolved"] / row["fields_requested"] if row["fields_requested"] else 0.0
+            print(f"  tier {row['tier']}  {row['model']:<40} {row['calls']:>6} calls  "
+                  f"{field_rate:>4.0%} fields resolved  {row['completed'] / row['calls']:>4.0%} finished here")
+    elif args.summary:
         summary = cm.get_run_summary(args.summary)
         print(json.dumps(summary, indent=2))
     elif args.all:
-        with sqlite3.connect(cm.db_path) as conn:
-            cursor = conn.execute("SELECT SUM(cost) FROM llm_usage")
-            result = cursor.fetchone()[0]
-            if result is None:
-                print("No costs recorded yet.")
-            else:
-                print(f"Total historical cost: ${result:.4f}")
+        result = cm.get_total_cost()
+        if result is None:
+            print("No costs recorded yet.")
+        else:
+            print(f"Total historical cost: ${result:.4f}")
     else:
         parser.print_help()
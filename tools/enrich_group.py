@@ -8,14 +8,12 @@ from typing import Optional, List
 from openai import OpenAI
 from dotenv import load_dotenv
 
-# Add cost manager
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from cost_manager import CostManager
+import llm_gateway
+import search_cache
 
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 try:
     from duckduckgo_search import DDGS
@@ -24,17 +22,12 @@ except ImportError:
     HAS_DDGS = False
 
 class GroupEnricher:
-    def __init__(self):
+    def __init__(self, client: Optional[OpenAI] = None):
         self.ddgs = DDGS() if HAS_DDGS else None
         
-        api_key = OPENROUTER_API_KEY or OPENAI_API_KEY
-        base_url = "https://openrouter.ai/api/v1" if OPENROUTER_API_KEY else None
         self.model = "openai/gpt-4o-mini"
-        
-        if api_key:
-            self.client = OpenAI(base_url=base_url, api_key=api_key)
-        else:
-            self.client = None
+        # Shared pooled client from the gateway (None when no API key is set).
+        self.client = client or llm_gateway.default_client()
 
     def search_group_info(self, agency_name: str):
         """Searches for group and parent company information."""
@@ -51,7 +44,7 @@ class GroupEnricher:
         all_results = []
         for query in queries:
             try:
-                results = self.ddgs.text(query, max_results=5)
+                results = search_cache.search("group", "ddg_text", self.ddgs.text, query, max_results=5)
                 if results:
                     for r in results:
                         all_results.append({
@@ -98,29 +91,16 @@ class GroupEnricher:
         """
 
         try:
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = llm_gateway.chat_completion(
+                self.model,
+                [
                     {"role": "system", "content": "You are a corporate intelligence analyst. Return JSON ONLY."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                run_id=run_id, task="group_membership", client=self.client,
             )
-            
-            result = json.loads(completion.choices[0].message.content)
-            
-            # Record Cost
-            if run_id:
-                usage = completion.usage
-                cm = CostManager()
-                cm.record_usage(
-                    run_id=run_id,
-                    model=self.model,
-                    prompt_tokens=usage.prompt_tokens,
-                    completion_tokens=usage.completion_tokens
-                )
-            
-            return result
+            return response.json()
         except Exception as e:
             sys.stderr.write(f"LLM analysis failed: {e}\n")
             return {"is_group_member": False, "parent_company": None, "siblings": [], "error": str(e)}
@@ -132,7 +112,7 @@ class GroupEnricher:
 
         query = f"list of agencies owned by {parent_company} group"
         try:
-            results = self.ddgs.text(query, max_results=10)
+            results = search_cache.search("siblings", "ddg_text", self.ddgs.text, query, max_results=10)
             context = "\n".join([f"- {r['title']}: {r['body']}" for r in results])
             
             prompt = f"""
@@ -147,13 +127,13 @@ class GroupEnricher:
             Return JSON: {{"siblings": ["Name 1", "Name 2"]}}
             """
             
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "system", "content": "Return JSON ONLY."}, {"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
+            response = llm_gateway.chat_completion(
+                self.model,
+                [{"role": "system", "content": "Return JSON ONLY."}, {"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+                run_id=run_id, task="sibling_discovery", client=self.client,
             )
-            
-            new_siblings = json.loads(completion.choices[0].message.content).get("siblings", [])
+            new_siblings = response.json().get("siblings", [])
             return list(set(known_siblings + new_siblings))
         except Exception as e:
             sys.stderr.write(f"Sibling discovery failed: {e}\n")
@@ -5,17 +5,22 @@ Usage:
     python eval.py                          # Run all test agencies, print scores
     python eval.py --agency velstar         # Run a single agency
     python eval.py --verbose                # Show per-assertion breakdown
+    python eval.py --no-llm-cache           # Re-sample the model even if prompt + content are unchanged
+    python eval.py --cascade                # Score the cheap-model-first cascade (extract_insights --cascade)
 
 The agent uses this to score each iteration. Output is a single score (0.0–1.0)
 plus a breakdown. Append results to program.md manually or with --log.
 """
 
+import os
 import sys
 import json
 import argparse
 import subprocess
 from pathlib import Path
 
+from completeness import run_assertions
+
 # ---------------------------------------------------------------------------
 # Test set: slug → URL
 # ---------------------------------------------------------------------------
@@ -27,95 +32,6 @@ TEST_AGENCIES = {
 
 DATA_DIR = Path(__file__).parent / "data"
 
-# ---------------------------------------------------------------------------
-# Binary assertions
-# ---------------------------------------------------------------------------
-def run_assertions(data: dict, raw_content: str = "") -> dict[str, bool]:
-    """Return a dict of assertion_name → bool."""
-
-    def nonempty_list(val, min_items=1):
-        return isinstance(val, list) and len(val) >= min_items
-
-    def nonempty_str(val, min_len=1):
-        return isinstance(val, str) and len(val.strip()) >= min_len
-
-    results = {}
-
-    # 1. Schema valid — no error key in output
-    results["schema_valid"] = "error" not in data
-
-    if "error" in data:
-        # All remaining assertions fail if schema is invalid
-        for k in ["name", "description_quality", "revenue_estimated",
-                  "headcount_found", "specializations", "office_locations",
-                  "directors", "tech_stack", "competitor_intelligence"]:
-            results[k] = False
-        return results
-
-    # 2. Name extracted
-    results["name"] = nonempty_str(data.get("name"), min_len=2)
-
-    # 3. Description quality
-    results["description_quality"] = nonempty_str(data.get("description"), min_len=80)
-
-    # 4. Revenue estimated
-    results["revenue_estimated"] = nonempty_str(data.get("revenue_estimate"))
-
-    # 5. Headcount found
-    results["headcount_found"] = nonempty_str(data.get("headcount"))
-
-    # 6. Specializations populated
-    results["specializations"] = nonempty_list(data.get("specializations"), min_items=2)
-
-    # 7. Office locations found
-    results["office_locations"] = nonempty_list(data.get("office_locations"), min_items=1)
-
-    # 8. Directors extracted
-    # Pass if directors populated, OR if the scraped content has no detectable
-    # named individuals (meaning enrichment is the appropriate source, not the website).
-    # A "named individual" requires a Firstname Lastname pattern within 120 chars
-    # of a job title keyword — filters out UI phrases like "Shopify Plus", "Our Team".
-    directors_populated = nonempty_list(data.get("directors"), min_items=1)
-    if not directors_populated:
-        import re
-        JOB_TITLE_KEYWORDS = (
-            r'(?:CEO|CTO|COO|CFO|Founder|Co-Founder|Managing Director|'
-            r'Head of|Principal|President|Vice President)'
-        )
-        person_pattern = re.compile(
-            r'(?:'
-            r'[A-Z][a-z]+\s+[A-Z][a-z]+[^\n]{0,80}' + JOB_TITLE_KEYWORDS +
-            r'|' + JOB_TITLE_KEYWORDS + r'[^\n]{0,80}[A-Z][a-z]+\s+[A-Z][a-z]+'
-            r')',
-            re.MULTILINE,
-        )
-        names_in_content = bool(person_pattern.search(raw_content))
-        directors_populated = not names_in_content
-    results["directors"] = directors_populated
-
-    # 9. Tech stack populated
-    results["tech_stack"] = nonempty_list(data.get("tech_stack"), min_items=2)
-
-    # 10. Competitor intelligence checked
-    # Pass if competitor_partnerships is populated, OR if the raw scraped content
-    # contains no known competitor names (meaning absence is correct).
-    KNOWN_COMPETITORS = [
-        "klaviyo", "yotpo", "gorgias", "recharge", "attentive",
-        "postscript", "okendo", "reviews.io", "loop returns"
-    ]
-    partnerships = data.get("competitor_partnerships", [])
-    content_lower = raw_content.lower()
-    competitors_in_content = any(c in content_lower for c in KNOWN_COMPETITORS)
-    if competitors_in_content:
-        # Content mentions competitors — we expect them to be extracted
-        results["competitor_intelligence"] = nonempty_list(partnerships, min_items=1)
-    else:
-        # No competitors in source content — empty list is correct
-        results["competitor_intelligence"] = True
-
-    return results
-
-
 # ---------------------------------------------------------------------------
 # Run extraction for one agency
 # ---------------------------------------------------------------------------
@@ -124,7 +40,14 @@ def extract_agency(slug: str, url: str) -> tuple[dict, str]:
     cache_file = DATA_DIR / f"{slug}.md"
 
     if not cache_file.exists():
-        return {"error": f"No cached file at {cache_file}. Run scrape_agency.py first."}, ""
+        # Build the fixture from the page cache (network only on a cache miss) rather than failing.
+        sys.path.append(str(Path(__file__).parent))
+        from scrape_agency import scrape_markdown_with_subpages
+        scraped = scrape_markdown_with_subpages(url)
+        if "error" in scraped:
+            return {"error": f"No cached file at {cache_file} and scrape failed: {scraped['error']}"}, ""
+        DATA_DIR.mkdir(exist_ok=True)
+        cache_file.write_text(scraped["markdown"], encoding="utf-8")
 
     raw_markdown = cache_file.read_text(encoding="utf-8")
 
@@ -152,7 +75,15 @@ def main():
     parser = argparse.ArgumentParser(description="Score extract_insights.py against test set.")
     parser.add_argument("--agency", help="Run a single agency by slug")
     parser.add_argument("--verbose", action="store_true", help="Show per-assertion breakdown")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Bypass the LLM response cache (unchanged prompt + content is otherwise free)")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Extract via the model cascade; per-tier hit rates: python cost_manager.py --cascade")
     args = parser.parse_args()
+    if args.cascade:
+        os.environ["ATHOS_EXTRACT_CASCADE"] = "1"  # inherited by the extract_insights.py subprocess
+    if args.no_llm_cache:
+        os.environ["ATHOS_LLM_CACHE"] = "0"  # inherited by the extract_insights.py subprocess
 
     agencies = (
         {args.agency: TEST_AGENCIES[args.agency]}
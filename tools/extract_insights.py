@@ -5,16 +5,46 @@ import argparse
 import json
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 from dotenv import load_dotenv
 from openai import OpenAI
-from cost_manager import CostManager
+import llm_gateway
+import content_packer
+from cost_manager import CostManager, get_cost_manager
+from completeness import run_assertions, has_evidence
 
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+DEFAULT_MODEL = "openai/gpt-4o-mini" if OPENROUTER_API_KEY else "gpt-4o-mini"
+# Prompt budget for the crawled content (tokens, target model's tokenizer). See content_packer.py.
+EXTRACT_TOKEN_BUDGET = int(os.getenv("EXTRACT_TOKEN_BUDGET", "7000"))
+
+# --- Incremental re-extraction (incremental_extract.py) ---
+INCREMENTAL_TASK = "structured_extraction_incremental"
+INCREMENTAL_CONTEXT = "Only the pages below changed since this agency was last analysed."
+
+# --- Cascade ---
+# --cascade (or ATHOS_EXTRACT_CASCADE=1) extracts with the cheapest adequate model first and sends
+# only the fields that fail completeness.py's checks (and that the content states) up to the next tier. Tiers come from
+# CostManager.MODEL_CATALOG: extract quality >= CASCADE_MIN_QUALITY, cheapest per provider,
+# at most CASCADE_MAX_TIERS. EXTRACT_CASCADE="model_a,model_b" pins them instead.
+CASCADE_MIN_QUALITY = 4
+CASCADE_MAX_TIERS = 3
+# completeness.run_assertions check -> the Agency field it grades
+ASSERTION_FIELDS = {
+    "name": "name",
+    "description_quality": "description",
+    "revenue_estimated": "revenue_estimate",
+    "headcount_found": "headcount",
+    "specializations": "specializations",
+    "office_locations": "office_locations",
+    "directors": "directors",
+    "tech_stack": "tech_stack",
+    "competitor_intelligence": "competitor_partnerships",
+}
 
 # --- Pydantic Schema ---
 class Client(BaseModel):
@@ -62,22 +92,7 @@ class Agency(BaseModel):
     last_analyzed: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 
 # --- Tool Logic ---
-def extract_insights(markdown_content: str, website_url: str, run_id: Optional[str] = None, model: Optional[str] = None):
-    api_key = OPENROUTER_API_KEY or OPENAI_API_KEY
-    base_url = "https://openrouter.ai/api/v1" if OPENROUTER_API_KEY else None
-    if model is None:
-        model = "openai/gpt-4o-mini" if OPENROUTER_API_KEY else "gpt-4o-mini"
-
-    if not api_key:
-        print(json.dumps({"error": "Missing OPENROUTER_API_KEY or OPENAI_API_KEY"}))
-        return
-
-    client = OpenAI(
-        base_url=base_url,
-        api_key=api_key,
-    )
-
-    system_prompt = """You are an expert Commerce Intelligence Analyst specialising in the UK/global ecommerce agency ecosystem.
+SYSTEM_PROMPT = """You are an expert Commerce Intelligence Analyst specialising in the UK/global ecommerce agency ecosystem.
 
 Your task is to extract structured intelligence from scraped agency website content. You produce JSON only — no commentary.
 
@@ -134,13 +149,29 @@ Your task is to extract structured intelligence from scraped agency website cont
 - Do not infer competitor partnerships unless explicitly stated.
 - Only extract directors and partner managers whose names appear in the content."""
 
+
+def extract_insights(markdown_content: str, website_url: str, run_id: Optional[str] = None,
+                     model: Optional[str] = None, client: Optional[OpenAI] = None,
+                     cascade: Optional[bool] = None) -> dict:
+    """Returns the validated Agency as a dict, or an {"error": ...} dict.
+    Pass `client` to reuse a shared connection (pipeline.InProcessEngine does).
+    `cascade` defaults to --cascade / ATHOS_EXTRACT_CASCADE (catalog ids need OpenRouter)."""
+    if (cascade_enabled() if cascade is None else cascade) and OPENROUTER_API_KEY:
+        return extract_cascade(markdown_content, website_url, run_id=run_id, client=client)
+    if model is None:
+        model = DEFAULT_MODEL
+
+    client = client or llm_gateway.default_client()
+    if client is None:
+        return {"error": "Missing OPENROUTER_API_KEY or OPENAI_API_KEY"}
+
     user_prompt = f"""Website URL: {website_url}
 
 Agency Content:
-{markdown_content[:25000]}"""
+{_pack(markdown_content, model, run_id, "structured_extraction")}"""
 
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt}
     ]
 
@@ -148,50 +179,141 @@ Agency Content:
     max_attempts = 2
     for attempt in range(1, max_attempts + 1):
         try:
-            completion = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "agency_schema",
-                        "schema": Agency.model_json_schema()
-                    }
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "agency_schema",
+                    "schema": Agency.model_json_schema()
                 }
-            )
-
-            raw_json = completion.choices[0].message.content
+            }
+            # Cost is recorded by the gateway; identical content + prompt is served from its cache.
+            response = llm_gateway.chat_completion(model, list(messages), response_format=response_format,
+                                                   run_id=run_id, task="structured_extraction", client=client)
+            raw_json = response.content
 
             try:
                 agency_data = Agency.model_validate_json(raw_json)
                 # Ensure website is set if LLM missed it or assumed
                 if not agency_data.website or agency_data.website == "unknown":
                     agency_data.website = website_url
-
-                print(agency_data.model_dump_json(indent=2))
-
-                # Record Cost
-                if run_id:
-                    usage = completion.usage
-                    cm = CostManager()
-                    cm.record_usage(
-                        run_id=run_id,
-                        model=model,
-                        prompt_tokens=usage.prompt_tokens,
-                        completion_tokens=usage.completion_tokens
-                    )
-                return
+                return json.loads(agency_data.model_dump_json())
 
             except Exception as validation_error:
                 if attempt < max_attempts:
                     messages.append({"role": "assistant", "content": raw_json})
                     messages.append({"role": "user", "content": f"That response failed schema validation: {validation_error}. Return corrected JSON only."})
                     continue
-                print(json.dumps({"error": f"Validation Error: {str(validation_error)}", "raw": raw_json}))
+                return {"error": f"Validation Error: {str(validation_error)}", "raw": raw_json}
 
         except Exception as e:
-            print(json.dumps({"error": f"LLM Error: {str(e)}"}))
-            return
+            return {"error": f"LLM Error: {str(e)}"}
+
+def _pack(markdown_content: str, model: str, run_id: Optional[str], task: str) -> str:
+    packed = content_packer.pack(markdown_content, EXTRACT_TOKEN_BUDGET, model)
+    sys.stderr.write(f"[packer] {packed.tokens_in} → {packed.tokens_out} tokens "
+                     f"({packed.duplicate_tokens} duplicate, {packed.tokens_saved} saved)\n")
+    if run_id:
+        get_cost_manager().record_packing(run_id, task, model, packed.tokens_in,
+                                     packed.tokens_out, packed.duplicate_tokens)
+    return packed.text
+
+
+def cascade_enabled() -> bool:
+    return os.getenv("ATHOS_EXTRACT_CASCADE", "0") == "1"
+
+
+def cascade_tiers() -> List[str]:
+    """Model ids to try in order, cheapest first."""
+    pinned = os.getenv("EXTRACT_CASCADE")
+    if pinned:
+        return [m.strip() for m in pinned.split(",") if m.strip()]
+    adequate = [m for m in CostManager.MODEL_CATALOG if m["extract"] >= CASCADE_MIN_QUALITY]
+    adequate.sort(key=lambda m: CostManager.estimate_task_cost(m, "structured_extraction"))
+    tiers, providers = [], set()
+    for m in adequate:
+        provider = m["id"].split("/")[0]
+        if provider not in providers:  # a second model from the same family tends to miss the same fields
+            providers.add(provider)
+            tiers.append(m["id"])
+    return tiers[:CASCADE_MAX_TIERS]
+
+
+def failing_fields(data: dict, raw_content: str) -> List[str]:
+    """Agency fields that fail the completeness checks and that the content gives a model something to find."""
+    checks = run_assertions(data, raw_content)
+    return [field for check, field in ASSERTION_FIELDS.items()
+            if not checks.get(check, True) and has_evidence(field, raw_content)]
+
+
+def extract_fields(markdown_content: str, website_url: str, fields: List[str], model: str,
+                   run_id: Optional[str] = None, client: Optional[OpenAI] = None,
+                   task: str = "structured_extraction_escalation", context: Optional[str] = None) -> dict:
+    """Re-extract only `fields` (a subset of Agency's) with `model`. Returns {field: value}, or {"error": ...}.
+    `context` tells the model why only these fields are asked for."""
+    context = context or f"A first pass left these fields missing or incomplete: {', '.join(fields)}."
+    partial = create_model("AgencyFields", **{f: (Agency.model_fields[f].annotation, Agency.model_fields[f])
+                                              for f in fields})
+    user_prompt = f"""Website URL: {website_url}
+
+{context}
+Extract only these fields, following the rules above: {", ".join(fields)}.
+
+Agency Content:
+{_pack(markdown_content, model, run_id, task)}"""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}]
+    response_format = {"type": "json_schema",
+                       "json_schema": {"name": "agency_fields", "schema": partial.model_json_schema()}}
+    try:
+        response = llm_gateway.chat_completion(model, messages, response_format=response_format, run_id=run_id,
+                                               task=task, client=client)
+        return partial.model_validate_json(response.content).model_dump(mode="json")
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def extract_cascade(markdown_content: str, website_url: str, run_id: Optional[str] = None,
+                    client: Optional[OpenAI] = None) -> dict:
+    """Extract with the cheapest tier, then escalate only failing fields. Each tier is logged to costs.db."""
+    cm = get_cost_manager()
+    tiers = cascade_tiers()
+    data, remaining = None, []
+    for tier, model in enumerate(tiers):
+        if data is None:
+            # Nothing usable yet (LLM or schema failure) — full extraction at this tier.
+            requested = list(ASSERTION_FIELDS.values())
+            result = extract_insights(markdown_content, website_url, run_id=run_id, model=model,
+                                      client=client, cascade=False)
+            if "error" not in result:
+                data = result
+        else:
+            requested = remaining
+            result = extract_fields(markdown_content, website_url, remaining, model, run_id=run_id, client=client)
+            for field, value in result.items():
+                # Only take the stronger model's answer where it now passes the check.
+                if field in remaining and field not in failing_fields({**data, field: value}, markdown_content):
+                    data[field] = value
+        remaining = failing_fields(data, markdown_content) if data is not None else requested
+        resolved = len([f for f in requested if f not in remaining])
+        cm.record_cascade_tier(run_id, tier, model, len(requested), resolved, len(remaining))
+        sys.stderr.write(f"[cascade] tier {tier} {model}: {resolved}/{len(requested)} fields ok"
+                         + (f", escalating {', '.join(remaining)}\n" if remaining else "\n"))
+        if not remaining:
+            break
+    if data is None:
+        return result
+    return data
+
+
+def add_cascade_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cascade", action="store_true",
+                        help="Extract with the cheapest adequate model, escalating only failing fields (overrides --model for extraction)")
+
+
+def apply_cascade_arguments(args) -> None:
+    """Exported via the environment so a subprocess extract_insights.py inherits it."""
+    if args.cascade:
+        os.environ["ATHOS_EXTRACT_CASCADE"] = "1"
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract insights from Agency markdown.")
@@ -199,7 +321,13 @@ if __name__ == "__main__":
     parser.add_argument("--url", required=True, help="Original URL of the agency")
     parser.add_argument("--run-id", help="Orchestration Run ID for cost tracking")
     parser.add_argument("--model", help="Override LLM model (e.g. openai/gpt-4o-mini). Run 'python cost_manager.py --models' to see options.")
+    parser.add_argument("--fields", help="Comma-separated Agency fields to re-extract from the given pages only "
+                                         "(incremental re-extraction; see incremental_extract.py)")
+    add_cascade_arguments(parser)
+    llm_gateway.add_cache_arguments(parser)
     args = parser.parse_args()
+    apply_cascade_arguments(args)
+    llm_gateway.apply_cache_arguments(args)
 
     content = ""
     if args.file:
@@ -209,4 +337,12 @@ if __name__ == "__main__":
         # Read from stdin
         content = sys.stdin.read()
 
-    extract_insights(content, args.url, run_id=args.run_id, model=args.model)
+    if args.fields:
+        fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in Agency.model_fields]
+        if unknown:
+            parser.error(f"Unknown Agency fields: {', '.join(unknown)}")
+        print(json.dumps(extract_fields(content, args.url, fields, args.model or DEFAULT_MODEL, run_id=args.run_id,
+                                        task=INCREMENTAL_TASK, context=INCREMENTAL_CONTEXT), indent=2))
+    else:
+        print(json.dumps(extract_insights(content, args.url, run_id=args.run_id, model=args.model), indent=2))
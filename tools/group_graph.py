@@ -0,0 +1,258 @@
+"""
+group_graph.py — Persistent parent-company → member-agencies graph.
+
+Every group the pipeline learns about is recorded here with provenance (which step said so)
+and freshness, from three sources:
+    group_membership    GroupEnricher.analyze_group_membership (agency + its siblings)
+    sibling_discovery   GroupEnricher.discover_more_siblings
+    supabase            agencies.parent_company / sibling_agencies (seeded once a day)
+
+The orchestrator resolves a later agency of a known group from the graph — no search and
+no LLM call. When the group's last discovery is older than GROUP_TTL_SECONDS the cached
+answer is still used, and refresh_async() re-runs sibling discovery in the background.
+
+Stored in tools/.cache/groups.db (kv_cache.cache_dir(), ATHOS_CACHE_DIR to move it).
+
+Usage:
+    python group_graph.py --agency "Pinpoint"     # resolve one agency
+    python group_graph.py --list                  # every group, member count, age
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional
+
+import name_index
+from kv_cache import cache_dir
+
+GROUP_TTL_SECONDS = 30 * 24 * 3600
+SEED_INTERVAL_SECONDS = 24 * 3600
+
+
+def normalize_name(name: str) -> str:
+    # Same normalisation as sibling ingestion, so "Pinpoint Digital Ltd" and "Pinpoint Digital" are one member.
+    return name_index.normalize(name)
+
+
+# parent_company values that mean "no parent"
+NOT_A_PARENT = {normalize_name(v) for v in ("", "Self (Group Head)", "null", "none", "independent")}
+
+
+@dataclass
+class GroupInfo:
+    parent: str
+    members: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    refreshed_at: float = 0.0
+
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.refreshed_at > GROUP_TTL_SECONDS
+
+    def siblings_of(self, agency_name: str) -> List[str]:
+        key = normalize_name(agency_name)
+        return [m for m in self.members if normalize_name(m) != key]
+
+
+class GroupGraph:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS groups (
+                parent_key TEXT PRIMARY KEY,
+                parent_name TEXT,
+                refreshed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS members (
+                parent_key TEXT,
+                member_key TEXT,
+                member_name TEXT,
+                source TEXT,
+                first_seen REAL,
+                last_seen REAL,
+                PRIMARY KEY (parent_key, member_key)
+            );
+            CREATE INDEX IF NOT EXISTS members_member_key_idx ON members (member_key);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._conn.commit()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="group-refresh")
+        self._refreshing = set()
+
+    # --- writes ---
+
+    def record(self, parent: str, members: Iterable[str], source: str, discovered: bool = True) -> int:
+        """Add `members` to `parent`'s group. `discovered` marks the group as freshly refreshed;
+        otherwise (a Supabase seed) the time only dates a group seen for the first time, so daily
+        re-seeds don't reset the staleness clock and seeded groups don't all start out stale.
+        Returns the number of new members."""
+        parent_key = normalize_name(parent)
+        if parent_key in NOT_A_PARENT:
+            return 0
+        now = time.time()
+        added = 0
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO groups (parent_key, parent_name, refreshed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(parent_key) DO UPDATE SET refreshed_at = " +
+                ("MAX(refreshed_at, excluded.refreshed_at)" if discovered else
+                 # Groups seeded before seeds were dated (refreshed_at = 0) pick up this one.
+                 "CASE WHEN refreshed_at > 0 THEN refreshed_at ELSE excluded.refreshed_at END"),
+                (parent_key, parent.strip(), now))
+            for name in dict.fromkeys(m.strip() for m in members if m and m.strip()):
+                member_key = normalize_name(name)
+                if not member_key or member_key == parent_key:
+                    continue
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO members (parent_key, member_key, member_name, source, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (parent_key, member_key, name, source, now, now))
+                if cur.rowcount:
+                    added += 1
+                else:
+                    self._conn.execute("UPDATE members SET last_seen = ? WHERE parent_key = ? AND member_key = ?",
+                                       (now, parent_key, member_key))
+            self._conn.commit()
+        return added
+
+    def seed_from_supabase(self, supabase, page_size: int = 1000) -> int:
+        """Load parent_company/sibling_agencies from the agencies table. Returns groups touched."""
+        parents = set()
+        start = 0
+        while True:
+            res = (supabase.table("agencies").select("name, parent_company, sibling_agencies")
+                   .not_.is_("parent_company", "null").range(start, start + page_size - 1).execute())
+            rows = res.data or []
+            for row in rows:
+                parent = row.get("parent_company") or ""
+                if normalize_name(parent) in NOT_A_PARENT:
+                    continue
+                self.record(parent, [row.get("name") or ""] + list(row.get("sibling_agencies") or []),
+                            "supabase", discovered=False)
+                parents.add(normalize_name(parent))
+            if len(rows) < page_size:
+                break
+            start += page_size
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded_at', ?)", (str(time.time()),))
+            self._conn.commit()
+        return len(parents)
+
+    def ensure_seeded(self, supabase) -> None:
+        """Seed from Supabase if that hasn't happened in the last SEED_INTERVAL_SECONDS."""
+        if supabase is None:
+            return
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'seeded_at'").fetchone()
+        if row and time.time() - float(row[0]) < SEED_INTERVAL_SECONDS:
+            return
+        try:
+            self.seed_from_supabase(supabase)
+        except Exception as e:
+            sys.stderr.write(f"Group graph seed from Supabase failed: {e}\n")
+
+    # --- reads ---
+
+    def group(self, parent: str) -> Optional[GroupInfo]:
+        parent_key = normalize_name(parent)
+        with self._lock:
+            row = self._conn.execute("SELECT parent_name, refreshed_at FROM groups WHERE parent_key = ?",
+                                     (parent_key,)).fetchone()
+            if row is None:
+                return None
+            members = self._conn.execute(
+                "SELECT member_name, source FROM members WHERE parent_key = ? ORDER BY first_seen, member_name",
+                (parent_key,)).fetchall()
+        return GroupInfo(row[0], [m[0] for m in members], sorted({m[1] for m in members}), row[1])
+
+    def lookup_member(self, agency_name: str) -> Optional[GroupInfo]:
+        """The group `agency_name` belongs to, or None if the graph doesn't know it.
+        If several groups list it, the most recently confirmed one wins."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT g.parent_name FROM members m JOIN groups g ON g.parent_key = m.parent_key "
+                "WHERE m.member_key = ? ORDER BY m.last_seen DESC LIMIT 1",
+                (normalize_name(agency_name),)).fetchone()
+        return self.group(row[0]) if row else None
+
+    def groups(self) -> List[GroupInfo]:
+        with self._lock:
+            names = [r[0] for r in self._conn.execute("SELECT parent_name FROM groups ORDER BY parent_name")]
+        return [g for g in (self.group(n) for n in names) if g is not None]
+
+    # --- background refresh ---
+
+    def refresh_async(self, parent: str, discover: Callable[[List[str]], List[str]],
+                      on_new: Optional[Callable[[List[str]], None]] = None) -> bool:
+        """Re-run discovery for a stale group in the background. `discover(known_members)` returns
+        the full member list; `on_new(names)` is called with members that weren't known.
+        Returns False if a refresh for this group is already running."""
+        key = normalize_name(parent)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        def _run():
+            try:
+                known = self.group(parent)
+                known_members = known.members if known else []
+                found = discover(known_members) or []
+                before = {normalize_name(m) for m in known_members}
+                self.record(parent, found, "sibling_discovery")
+                new = [m for m in found if normalize_name(m) not in before]
+                if new and on_new:
+                    on_new(new)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_pool.submit(_run)
+        return True
+
+
+_graph: Optional[GroupGraph] = None
+_graph_lock = threading.Lock()
+
+
+def get_graph() -> GroupGraph:
+    global _graph
+    path = os.path.join(cache_dir(), "groups.db")
+    with _graph_lock:
+        if _graph is None or _graph.path != path:
+            _graph = GroupGraph(path)
+        return _graph
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the parent-company group graph.")
+    parser.add_argument("--agency", help="Resolve the group an agency belongs to")
+    parser.add_argument("--list", action="store_true", help="List every known group")
+    parser.add_argument("--seed", action="store_true", help="Seed from the Supabase agencies table now")
+    args = parser.parse_args()
+
+    graph = get_graph()
+    if args.seed:
+        from pipeline import get_engine
+        print(f"Seeded {graph.seed_from_supabase(get_engine().supabase)} groups from Supabase")
+    if args.agency:
+        info = graph.lookup_member(args.agency)
+        print(json.dumps(None if info is None else {
+            "parent_company": info.parent, "siblings": info.siblings_of(args.agency), "sources": info.sources,
+            "refreshed_days_ago": round((time.time() - info.refreshed_at) / 86400, 1) if info.refreshed_at else None,
+            "stale": info.stale}, indent=2))
+    elif args.list:
+        for info in graph.groups():
+            age = f"{(time.time() - info.refreshed_at) / 86400:.0f}d" if info.refreshed_at else "never discovered"
+            print(f"  {info.parent:<32} {len(info.members):>4} members  {age:<18} {', '.join(info.sources)}")
+    elif not args.seed:
+        parser.print_help()
@@ -0,0 +1,144 @@
+"""
+incremental_extract.py — Re-extract only the fields fed by the pages that changed.
+
+The stored agencies row carries the per-page section_hashes of the crawl it was extracted from
+(change_detection.fingerprint, written by store_data). On the next crawl the new page hashes
+are compared with those:
+
+    nothing changed       reuse the stored record — no LLM call
+    only mapped pages     re-extract just SECTION_FIELDS for those pages, from those pages,
+                          and merge into the stored record
+    anything else         full extraction (homepage or unmapped page changed, page removed,
+                          nothing stored yet)
+
+Disable with --full-extract (ATHOS_INCREMENTAL=0) to always extract the whole crawl.
+
+Usage:
+    python incremental_extract.py --url https://www.velstar.co.uk --file new.md   # show the plan
+"""
+import os
+import json
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from change_detection import fingerprint, iter_sections
+from content_packer import section_kind
+from store_data import canonical_url
+
+# Page kind (content_packer.section_kind) -> Agency fields extracted from it.
+# Homepage and "other" pages feed everything, so a change there means a full extraction.
+SECTION_FIELDS = {
+    "careers": ("open_roles_count", "hiring_roles"),
+    "team": ("directors", "partner_managers", "headcount"),
+    "partners": ("competitor_partnerships", "platforms", "tech_stack", "partner_page_url"),
+}
+
+# agencies columns holding the extracted Agency record (is_group_member is the Agency's is_part_of_group).
+RECORD_COLUMNS = ("name", "description", "website", "partner_page_url", "specializations", "platforms",
+                  "competitor_partnerships", "revenue_estimate", "open_roles_count", "hiring_roles",
+                  "parent_company", "is_group_member", "headcount", "office_locations", "tech_stack",
+                  "clients", "case_studies", "directors", "partner_managers", "awards", "last_analyzed")
+
+
+def enabled() -> bool:
+    return os.getenv("ATHOS_INCREMENTAL", "1") != "0"
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--full-extract", action="store_true",
+                        help="Re-extract every field from the whole crawl, even if only some pages changed")
+
+
+def apply_arguments(args) -> None:
+    if args.full_extract:
+        os.environ["ATHOS_INCREMENTAL"] = "0"
+
+
+def load_stored(url: str, supabase) -> Optional[dict]:
+    """section_hashes plus RECORD_COLUMNS of the stored agency for `url`, or None."""
+    if supabase is None:
+        return None
+    res = (supabase.table("agencies").select(", ".join(("section_hashes",) + RECORD_COLUMNS))
+           .eq("website", canonical_url(url)).limit(1).execute())
+    return res.data[0] if res.data else None
+
+
+def record_from_row(row: dict) -> dict:
+    """The stored row in extract_insights' Agency shape, ready to merge into and store again."""
+    record = {column: row.get(column) for column in RECORD_COLUMNS if column in row}
+    record["is_part_of_group"] = bool(record.pop("is_group_member", False))
+    return record
+
+
+@dataclass
+class Plan:
+    mode: str  # "reuse", "partial" or "full"
+    reason: str
+    changed: List[str] = field(default_factory=list)   # section labels
+    fields: List[str] = field(default_factory=list)    # Agency fields to re-extract (partial)
+    markdown: str = ""                                  # changed sections only (partial)
+    record: Optional[dict] = None                       # stored record to merge into
+
+    def merge(self, partial: dict) -> dict:
+        """Stored record with the re-extracted fields swapped in."""
+        merged = dict(self.record or {})
+        merged.update({k: v for k, v in partial.items() if k in self.fields})
+        merged["last_analyzed"] = datetime.utcnow().isoformat()
+        return merged
+
+
+def _keyed(markdown: str) -> Dict[str, Tuple[str, str]]:
+    """label -> (marker, text); repeated labels get a suffix, as change_detection.fingerprint does."""
+    out = {}
+    for label, marker, text in iter_sections(markdown):
+        key, n = label, 2
+        while key in out:
+            key, n = f"{label} #{n}", n + 1
+        out[key] = (marker, text)
+    return out
+
+
+def plan(stored: Optional[dict], markdown: str) -> Plan:
+    """Decide how much of `markdown` needs extracting, given the stored row for the same site
+    (section_hashes plus RECORD_COLUMNS, as load_stored returns it)."""
+    if not stored or not stored.get("name") or not stored.get("section_hashes"):
+        return Plan("full", "no stored extraction with page hashes")
+    old, new = stored["section_hashes"], fingerprint(markdown).section_hashes
+    sections = _keyed(markdown)
+    removed = [k for k in old if k not in new]
+    changed = [k for k in new if old.get(k) != new[k]]
+    record = record_from_row(stored)
+    if removed:
+        return Plan("full", f"pages gone: {', '.join(removed)}", changed=changed)
+    if not changed:
+        return Plan("reuse", "no page changed since the last extraction", record=record)
+
+    fields, parts = [], []
+    for key in changed:
+        marker, text = sections[key]
+        kind = section_kind(marker) if marker else "homepage"
+        if kind not in SECTION_FIELDS:
+            return Plan("full", f"{key} changed ({kind})", changed=changed)
+        fields += [f for f in SECTION_FIELDS[kind] if f not in fields]
+        parts.append(f"{marker}{text}")
+    return Plan("partial", f"only {', '.join(changed)} changed", changed=changed, fields=fields,
+                markdown="".join(parts), record=record)
+
+
+def plan_for(url: str, markdown: str, supabase) -> Plan:
+    return plan(load_stored(url, supabase), markdown)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show what an incremental re-extraction would do for a new crawl.")
+    parser.add_argument("--url", required=True, help="Agency URL (looked up in the agencies table)")
+    parser.add_argument("--file", required=True, help="Newly crawled markdown")
+    args = parser.parse_args()
+
+    from pipeline import get_engine
+    with open(args.file) as f:
+        p = plan_for(args.url, f.read(), get_engine().supabase)
+    print(json.dumps({"mode": p.mode, "reason": p.reason, "changed": p.changed, "fields": p.fields,
+                      "markdown_chars": len(p.markdown)}, indent=2))
@@ -0,0 +1,100 @@
+"""
+kv_cache.py — Small SQLite key/value store with a TTL and a size cap.
+
+Values are strings (callers JSON-encode). Entries older than the TTL read as misses;
+when the stored values exceed max_bytes the least recently read entries are evicted.
+Safe to share between threads; several processes may open the same file (WAL).
+
+cache_dir() is where the local caches live: tools/.cache, or ATHOS_CACHE_DIR. The LLM, page
+and trace stores can still be moved on their own (ATHOS_LLM_CACHE_DIR, ATHOS_PAGE_CACHE_DIR,
+ATHOS_TRACE_DIR); the search cache and group graph always follow cache_dir().
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def cache_dir() -> str:
+    return os.getenv("ATHOS_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+
+class KVCache:
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                size INTEGER,
+                created_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at_idx ON entries (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if time.time() - row[1] > max_age:
+                self.stats["expired"] += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now))
+            self.stats["writes"] += 1
+            self._evict_locked()
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Expired entries go first, then least recently read, down to 90% so we don't evict on every write.
+        self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        target = self.max_bytes * 0.9
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC").fetchall():
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.stats["evictions"] += 1
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def summary(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes, **self.stats}
@@ -0,0 +1,197 @@
+"""
+link_classifier.py — Find an agency's About / Team / Partners / Careers pages without an LLM.
+
+Every anchor on the homepage (markdown [text](url) links or raw HTML <a href>) is scored
+for each page type:
+    path        last path segment equals a keyword (strong) or contains one (weak);
+                shallow paths preferred, blog/news/case-study posts penalised
+    anchor      link text equals a keyword phrase (strong) or contains one (weak)
+    position    links in the header nav (first quarter of the page) or the footer get a nudge
+
+Confidence is the best score scaled to 0–1. scrape_agency.find_subpages only falls back
+to the LLM when neither an About nor a Team page reaches MIN_CONFIDENCE.
+
+Usage:
+    python link_classifier.py --url https://www.velstar.co.uk
+    python link_classifier.py --file homepage.md --base https://www.velstar.co.uk
+"""
+import re
+import json
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+PAGE_TYPES = ("about", "team", "partners", "careers")
+
+PATH_KEYWORDS = {
+    "about": ("about", "about-us", "aboutus", "who-we-are", "our-story", "story", "company", "the-agency",
+              "agency", "our-agency", "us"),
+    "team": ("team", "our-team", "the-team", "meet-the-team", "people", "our-people", "leadership", "staff",
+             "founders", "management", "who-we-are"),
+    "partners": ("partners", "our-partners", "partnerships", "technology-partners", "tech-partners",
+                 "integrations", "ecosystem", "alliances", "platforms"),
+    "careers": ("careers", "career", "jobs", "join-us", "join-the-team", "work-with-us", "vacancies",
+                "hiring", "work-for-us", "opportunities"),
+}
+TEXT_KEYWORDS = {
+    "about": ("about", "about us", "who we are", "our story", "the agency", "our agency", "company"),
+    "team": ("team", "our team", "the team", "meet the team", "people", "our people", "leadership"),
+    "partners": ("partners", "our partners", "partnerships", "technology partners", "tech partners",
+                 "integrations", "ecosystem"),
+    "careers": ("careers", "jobs", "join us", "join the team", "work with us", "vacancies",
+                "we're hiring", "we are hiring", "work for us"),
+}
+# Careers pages are often hosted by an applicant-tracking system on another domain.
+ATS_HOSTS = ("greenhouse.io", "lever.co", "workable.com", "teamtailor.com", "bamboohr.com",
+             "recruitee.com", "personio.de", "breezy.hr", "ashbyhq.com")
+POST_SEGMENTS = ("blog", "news", "insights", "post", "posts", "article", "articles", "case-studies",
+                 "case-study", "work", "tag", "category", "author", "resources")
+SKIP_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".mp4")
+
+MIN_CONFIDENCE = 0.6
+_FULL_SCORE = 5.0
+
+_MD_LINK = re.compile(r'(?<!!)\[([^\]]*)\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+_HTML_LINK = re.compile(r'<a\s[^>]*?href=["\']([^"\']+)["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+
+
+@dataclass
+class PageLink:
+    page_type: str
+    url: str
+    text: str
+    score: float
+
+    @property
+    def confidence(self) -> float:
+        return max(0.0, min(1.0, self.score / _FULL_SCORE))
+
+
+def extract_links(content: str, base_url: str) -> List[Tuple[str, str, float]]:
+    """[(absolute_url, anchor_text, position)] for every anchor, position in 0..1 (document order).
+    Accepts markdown or HTML; fragment-only, mailto: and tel: links are dropped."""
+    raw = [(m.group(2), m.group(1)) for m in _MD_LINK.finditer(content)]
+    raw += [(m.group(1), _TAG.sub(" ", m.group(2))) for m in _HTML_LINK.finditer(content)]
+    links = []
+    for i, (href, text) in enumerate(raw):
+        href = href.strip()
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:")):
+            continue
+        url = urljoin(base_url, href).split("#")[0]
+        links.append((url, " ".join(text.split()), i / max(1, len(raw) - 1)))
+    return links
+
+
+def _host(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _text_norm(text: str) -> str:
+    return re.sub(r"[^a-z' ]+", " ", text.lower().replace("’", "'")).strip()
+
+
+def score_link(page_type: str, url: str, text: str, position: float, base_host: str) -> float:
+    parsed = urlparse(url)
+    host = _host(url)
+    if host != base_host:
+        if not (page_type == "careers" and any(host.endswith(ats) for ats in ATS_HOSTS)):
+            return 0.0
+    path = parsed.path.lower()
+    if path.endswith(SKIP_EXTENSIONS):
+        return 0.0
+    segments = [s for s in path.split("/") if s]
+    # Drop a leading locale segment (/en/, /en-gb/) so /en/about scores like /about.
+    if segments and re.fullmatch(r"[a-z]{2}(?:-[a-z]{2})?", segments[0]):
+        segments = segments[1:]
+
+    score = 0.0
+    keywords = PATH_KEYWORDS[page_type]
+    if host != base_host:
+        score += 3.0  # an ATS link is a careers page whatever its path
+    elif segments:
+        last = re.sub(r"\.(?:html?|php|aspx?)$", "", segments[-1])
+        if last in keywords:
+            score += 3.0
+        elif any(k in last.split("-") or k in last for k in keywords if len(k) > 3):
+            score += 1.5
+        if any(s in POST_SEGMENTS for s in segments[:-1]):
+            score -= 2.5
+        score += 0.5 if len(segments) == 1 else -0.75 * max(0, len(segments) - 2)
+    else:
+        return 0.0  # the bare homepage is never one of these pages
+
+    text_norm = _text_norm(text)
+    if text_norm:
+        phrases = TEXT_KEYWORDS[page_type]
+        if text_norm in phrases:
+            score += 2.5
+        elif any(re.search(rf"\b{re.escape(p)}\b", text_norm) for p in phrases) and len(text_norm) <= 40:
+            score += 1.0
+
+    if position <= 0.25:
+        score += 0.5   # header navigation
+    elif position >= 0.85:
+        score += 0.25  # footer links
+    return score
+
+
+def classify_links(content: str, base_url: str) -> Dict[str, PageLink]:
+    """Best-scoring link per page type ({} entries omitted when nothing scored)."""
+    base_host = _host(base_url)
+    root = urlparse(base_url)._replace(query="", fragment="").geturl().rstrip("/")
+    best: Dict[str, PageLink] = {}
+    for url, text, position in extract_links(content, base_url):
+        if url.rstrip("/") == root:
+            continue
+        for page_type in PAGE_TYPES:
+            score = score_link(page_type, url, text, position, base_host)
+            if score > 0 and (page_type not in best or score > best[page_type].score):
+                best[page_type] = PageLink(page_type, url, text, score)
+    return best
+
+
+def page_type_of(url: str) -> Optional[str]:
+    """Page type a URL's path alone suggests (no anchor text), or None."""
+    scores = {t: score_link(t, url, "", 0.5, _host(url)) for t in PAGE_TYPES}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else None
+
+
+def is_confident(links: Dict[str, PageLink], min_confidence: float = MIN_CONFIDENCE) -> bool:
+    """Trust the heuristic when it found an About or Team page with enough confidence.
+    Partners/Careers pages are often genuinely absent, so missing them isn't a reason to ask the LLM."""
+    return any(links.get(t) and links[t].confidence >= min_confidence for t in ("about", "team"))
+
+
+def confident_urls(links: Dict[str, PageLink], min_confidence: float = MIN_CONFIDENCE) -> List[str]:
+    """URLs in PAGE_TYPES order, de-duplicated, keeping only confident picks."""
+    urls = [links[t].url for t in PAGE_TYPES if t in links and links[t].confidence >= min_confidence]
+    return list(dict.fromkeys(urls))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify homepage links into About/Team/Partners/Careers.")
+    parser.add_argument("--url", help="Fetch this homepage and classify its links")
+    parser.add_argument("--file", help="Classify links in a saved markdown/HTML file")
+    parser.add_argument("--base", help="Base URL for --file (relative links)")
+    args = parser.parse_args()
+
+    if args.url:
+        from scrape_agency import fetch_html
+        content, _ = fetch_html(args.url)
+        base = args.url
+    elif args.file and args.base:
+        with open(args.file) as f:
+            content = f.read()
+        base = args.base
+    else:
+        parser.error("--url, or --file with --base, is required")
+
+    links = classify_links(content, base)
+    print(json.dumps({
+        "confident": is_confident(links),
+        "links": {t: {"url": l.url, "text": l.text, "confidence": round(l.confidence, 2)} for t, l in links.items()},
+    }, indent=2))
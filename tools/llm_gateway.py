@@ -0,0 +1,385 @@
+"""
+llm_gateway.py — The one place pipeline tools call the LLM from.
+
+chat_completion() wraps an OpenAI-compatible chat call (OpenRouter by default) with:
+- one process-wide client over a pooled keep-alive HTTP connection (default_client())
+- a persistent response cache keyed by (model, messages, response_format), so eval loops
+  and re-runs over identical content cost nothing and return in milliseconds
+- throttle.llm_slot() around the network call, bounding LLM calls in flight
+- retries on 429 / 5xx / timeouts with exponential backoff and full jitter, honouring
+  Retry-After; a 429 pauses every caller in the process, not just the one that hit it
+- per-model timeouts (MODEL_TIMEOUTS), so a slow premium model doesn't share the budget of a flash model
+- cost recording in costs.db (llm_usage) plus a hit/miss row per call (llm_cache_events)
+- an llm.{model} span per call, child of the current phase span, timed from entry to return,
+  with one llm.attempt child span per HTTP attempt (time to first byte, error, retry delay)
+
+Cache lives in tools/.cache/llm.db (ATHOS_LLM_CACHE_DIR, or ATHOS_CACHE_DIR for every cache, to move it), entries expire after
+30 days and the cache is capped at 256 MB. Bypass it with --no-llm-cache (or ATHOS_LLM_CACHE=0),
+or per call with use_cache=False. Callers that check answers beyond valid JSON pass `validate`:
+answers it rejects are returned (and costed) but never cached, so a bad answer isn't replayed.
+
+Usage:
+    python llm_gateway.py --stats
+    python llm_gateway.py --clear
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import contextvars
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI, DefaultHttpxClient, APIConnectionError, APIStatusError
+from cost_manager import get_cost_manager
+from kv_cache import KVCache, cache_dir
+import throttle
+import tracing
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Seconds per request, matched by model-id prefix (first match wins). A call site's explicit
+# timeout takes precedence; ATHOS_LLM_TIMEOUT overrides the default for unlisted models.
+MODEL_TIMEOUTS = (
+    ("meta-llama/", 90.0),          # free tier queues under load
+    ("anthropic/claude-3-opus", 120.0),
+    ("anthropic/claude-3-sonnet", 90.0),
+    ("openai/gpt-4o-2024", 90.0),
+    ("openai/gpt-4o-mini", 45.0),
+    ("openai/gpt-4o", 90.0),
+    ("google/gemini", 45.0),
+)
+DEFAULT_TIMEOUT = float(os.getenv("ATHOS_LLM_TIMEOUT", "60"))
+
+MAX_RETRIES = int(os.getenv("ATHOS_LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = 1.0   # seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {408, 409, 429}  # plus every 5xx
+
+POOL_CONNECTIONS = 32
+POOL_KEEPALIVE = 16
+
+
+# Timing of the HTTP attempt in flight on this thread, filled in by the httpx response hook.
+_attempt = contextvars.ContextVar("llm_attempt", default=None)
+
+
+def _on_response(response) -> None:
+    # httpx calls response hooks once the status line and headers are in, before the body is read.
+    timing = _attempt.get()
+    if timing is not None and timing.get("ttfb_ns") is None:
+        timing["ttfb_ns"] = time.time_ns()
+
+
+@dataclass
+class LLMResponse:
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached: bool = False
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def build_client() -> Optional[OpenAI]:
+    """OpenAI-compatible client for OpenRouter (preferred) or OpenAI. None if no key is set."""
+    api_key = OPENROUTER_API_KEY or OPENAI_API_KEY
+    if not api_key:
+        return None
+    base_url = "https://openrouter.ai/api/v1" if OPENROUTER_API_KEY else None
+    # Retries are chat_completion's job (with a shared cooldown), so the SDK's own are off.
+    http_client = DefaultHttpxClient(limits=httpx.Limits(max_connections=POOL_CONNECTIONS,
+                                                         max_keepalive_connections=POOL_KEEPALIVE),
+                                     event_hooks={"response": [_on_response]})
+    return OpenAI(base_url=base_url, api_key=api_key, http_client=http_client, max_retries=0)
+
+
+_client: Optional[OpenAI] = None
+_cache: Optional[KVCache] = None
+_lock = threading.Lock()
+_cooldown_until = 0.0  # monotonic time before which no new call starts (set by 429s)
+
+
+def default_client() -> Optional[OpenAI]:
+    """Process-wide client for callers that don't bring their own."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = build_client()
+        return _client
+
+
+def get_cache() -> Optional[KVCache]:
+    """Shared response cache, or None when bypassed."""
+    global _cache
+    if os.getenv("ATHOS_LLM_CACHE", "1") == "0":
+        return None
+    path = os.path.join(os.getenv("ATHOS_LLM_CACHE_DIR") or cache_dir(), "llm.db")
+    with _lock:
+        if _cache is None or _cache.path != path:
+            _cache = KVCache(path, ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES)
+        return _cache
+
+
+def cache_key(model: str, messages: List[dict], response_format: Optional[dict] = None) -> str:
+    blob = json.dumps({"model": model, "messages": messages, "response_format": response_format},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _cacheable(content: str, response_format: Optional[dict]) -> bool:
+    # Never pin a malformed JSON answer in the cache — the next run should get a fresh try.
+    if not content:
+        return False
+    if response_format and response_format.get("type") in ("json_object", "json_schema"):
+        try:
+            json.loads(content)
+        except ValueError:
+            return False
+    return True
+
+
+def model_timeout(model: str) -> float:
+    for prefix, seconds in MODEL_TIMEOUTS:
+        if model.startswith(prefix):
+            return seconds
+    return DEFAULT_TIMEOUT
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRY_STATUSES or error.status_code >= 500
+    return isinstance(error, APIConnectionError)  # includes APITimeoutError
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to our own backoff
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt)), at least Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_CAP))
+    return delay
+
+
+def _wait_for_cooldown() -> None:
+    wait = _cooldown_until - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _attempt_span(trace: dict, attempt: int, start_ns: int, end_ns: int, timing: dict,
+                  error: Optional[Exception], retry_in: Optional[float]) -> None:
+    attributes = {"llm.attempt": attempt + 1}
+    if timing.get("ttfb_ns"):
+        attributes["llm.ttfb_ms"] = round((timing["ttfb_ns"] - start_ns) / 1e6, 1)
+    if error is not None:
+        attributes["error.type"] = type(error).__name__
+        if isinstance(error, APIStatusError):
+            attributes["http.status_code"] = error.status_code
+    if retry_in is not None:
+        attributes["llm.retry_in_s"] = round(retry_in, 2)
+    tracing.send_span(trace["trace_id"], tracing.new_span_id(), trace["span_id"], "llm.attempt", start_ns, end_ns,
+                      attributes=attributes, status_code=2 if error is not None else 1)
+
+
+def _create_with_retries(client: OpenAI, kwargs: dict, model: str, task: Optional[str], trace: dict):
+    """client.chat.completions.create with retries. Returns (completion, stats) where stats holds
+    retries, time spent queued (cooldown + llm_slot) and the successful attempt's time to first byte."""
+    global _cooldown_until
+    stats = {"retries": 0, "queued_ms": 0.0, "ttfb_ms": None}
+    for attempt in range(MAX_RETRIES + 1):
+        queued = time.monotonic()
+        _wait_for_cooldown()
+        with throttle.llm_slot():
+            stats["queued_ms"] += (time.monotonic() - queued) * 1000
+            timing, error, completion = {"ttfb_ns": None}, None, None
+            token = _attempt.set(timing)
+            start_ns = time.time_ns()
+            try:
+                completion = client.chat.completions.create(**kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                _attempt.reset(token)
+            end_ns = time.time_ns()
+
+        if error is None:
+            _attempt_span(trace, attempt, start_ns, end_ns, timing, None, None)
+            if timing["ttfb_ns"]:
+                stats["ttfb_ms"] = round((timing["ttfb_ns"] - start_ns) / 1e6, 1)
+            return completion, stats
+        if attempt >= MAX_RETRIES or not _retryable(error):
+            _attempt_span(trace, attempt, start_ns, end_ns, timing, error, None)
+            raise error
+        delay = backoff_delay(attempt, _retry_after(error))
+        _attempt_span(trace, attempt, start_ns, end_ns, timing, error, delay)
+        stats["retries"] += 1
+        if isinstance(error, APIStatusError) and error.status_code == 429:
+            # The rate limit is per key, so hold back every caller, not just this one.
+            with _lock:
+                _cooldown_until = max(_cooldown_until, time.monotonic() + delay)
+        sys.stderr.write(f"[llm] {model} ({task or '-'}): {type(error).__name__} — "
+                         f"retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s\n")
+        time.sleep(delay)  # outside llm_slot, so waiting doesn't hold a slot
+
+
+def _send_call_span(trace: dict, model: str, task: Optional[str], run_id: Optional[str], start_ns: int,
+                    response: Optional[LLMResponse], stats: Optional[dict], cost: float,
+                    error: Optional[Exception] = None) -> None:
+    attributes = {
+        "gen_ai.system": model.split("/")[0] if "/" in model else "openai",
+        "gen_ai.request.model": model,
+        "llm.task": task or "-",
+        "llm.cache_hit": bool(response and response.cached),
+    }
+    if run_id:
+        attributes["run.id"] = run_id
+    if response is not None:
+        attributes["gen_ai.usage.input_tokens"] = response.prompt_tokens
+        attributes["gen_ai.usage.output_tokens"] = response.completion_tokens
+        attributes["cost.usd"] = cost
+    if stats:
+        attributes["llm.retries"] = stats["retries"]
+        attributes["llm.queued_ms"] = round(stats["queued_ms"], 1)
+        if stats["ttfb_ms"] is not None:
+            attributes["llm.ttfb_ms"] = stats["ttfb_ms"]
+    if error is not None:
+        attributes["error.type"] = type(error).__name__
+    tracing.send_span(trace["trace_id"], trace["span_id"], trace["parent_span_id"], f"llm.{model}",
+                      start_ns, time.time_ns(), attributes=attributes, status_code=2 if error is not None else 1)
+
+
+def _split_usage(response: LLMResponse, run_id: Optional[str],
+                 run_shares: Optional[List[Tuple[Optional[str], int]]]) -> List[Tuple[Optional[str], int, int]]:
+    """[(run_id, prompt_tokens, completion_tokens)] to record for one call."""
+    if not run_shares:
+        return [(run_id, response.prompt_tokens, response.completion_tokens)]
+    total = sum(weight for _, weight in run_shares) or 1
+    return [(share_run, round(response.prompt_tokens * weight / total),
+             round(response.completion_tokens * weight / total)) for share_run, weight in run_shares]
+
+
+def chat_completion(model: str, messages: List[dict], response_format: Optional[dict] = None,
+                    run_id: Optional[str] = None, task: Optional[str] = None,
+                    client: Optional[OpenAI] = None, timeout: Optional[float] = None,
+                    use_cache: bool = True, validate: Optional[Callable[[str], bool]] = None,
+                    run_shares: Optional[List[Tuple[Optional[str], int]]] = None) -> LLMResponse:
+    """Cached chat completion. Transient API errors are retried; anything else, or a failure
+    that outlasts MAX_RETRIES, is raised (callers keep their own error handling).
+    `task` labels the call in costs.db (e.g. "structured_extraction", "link_extraction").
+    `timeout` defaults to model_timeout(model). `validate(content)` gates caching: a rejected
+    answer is still returned but not cached, and a cached one it rejects is dropped and refetched.
+    `run_shares` [(run_id, weight)] is for one call serving several runs (batched classification):
+    its usage and cache events are split between them pro rata to weight, instead of to `run_id`."""
+    start_ns = time.time_ns()
+    trace = {"trace_id": tracing.current_trace_id() or tracing.new_trace_id(), "span_id": tracing.new_span_id(),
+             "parent_span_id": tracing.current_parent_span_id()}
+    cache = get_cache() if use_cache else None
+    key = cache_key(model, messages, response_format)
+    cm = get_cost_manager()
+
+    if cache:
+        hit = cache.get(key)
+        if hit is not None and validate is not None and not validate(json.loads(hit)["content"]):
+            cache.delete(key)
+            hit = None
+        if hit is not None:
+            entry = json.loads(hit)
+            response = LLMResponse(entry["content"], model, entry["prompt_tokens"], entry["completion_tokens"], cached=True)
+            for share_run, prompt_tokens, completion_tokens in _split_usage(response, run_id, run_shares):
+                cm.record_cache_event(share_run, model, task, hit=True,
+                                      prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            _send_call_span(trace, model, task, run_id, start_ns, response, None, 0.0)
+            return response
+
+    client = client or default_client()
+    if client is None:
+        raise RuntimeError("Missing OPENROUTER_API_KEY or OPENAI_API_KEY")
+    kwargs = {"model": model, "messages": messages, "timeout": timeout or model_timeout(model)}
+    if response_format:
+        kwargs["response_format"] = response_format
+    try:
+        completion, stats = _create_with_retries(client, kwargs, model, task, trace)
+    except Exception as e:
+        _send_call_span(trace, model, task, run_id, start_ns, None, None, 0.0, error=e)
+        raise
+
+    usage = completion.usage
+    response = LLMResponse(
+        completion.choices[0].message.content or "", model,
+        getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+    cost = cm.calculate_cost(model, response.prompt_tokens, response.completion_tokens)
+    shares = _split_usage(response, run_id, run_shares)
+    for share_run, prompt_tokens, completion_tokens in shares:
+        if share_run:
+            cm.record_usage(run_id=share_run, model=model,
+                            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, task=task)
+    _send_call_span(trace, model, task, run_id, start_ns, response, stats, cost)
+    if cache is not None:
+        for share_run, prompt_tokens, completion_tokens in shares:
+            cm.record_cache_event(share_run, model, task, hit=False,
+                                  prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        if _cacheable(response.content, response_format) and (validate is None or validate(response.content)):
+            cache.put(key, json.dumps({"content": response.content, "prompt_tokens": response.prompt_tokens,
+                                       "completion_tokens": response.completion_tokens}))
+    return response
+
+
+def configure(cache_dir: Optional[str] = None, enabled: bool = True) -> None:
+    """Apply --llm-cache-dir / --no-llm-cache. Exported via the environment so subprocess tools inherit it."""
+    if cache_dir:
+        os.environ["ATHOS_LLM_CACHE_DIR"] = os.path.abspath(cache_dir)
+    if not enabled:
+        os.environ["ATHOS_LLM_CACHE"] = "0"
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--no-llm-cache", action="store_true", help="Always call the LLM (skip the response cache)")
+
+
+def apply_cache_arguments(args) -> None:
+    configure(enabled=not args.no_llm_cache)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument("--stats", action="store_true", help="Show cache size and hit/miss history")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached response")
+    args = parser.parse_args()
+
+    cache = KVCache(os.path.join(os.getenv("ATHOS_LLM_CACHE_DIR") or cache_dir(), "llm.db"),
+                    ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.path}")
+    elif args.stats:
+        s = cache.summary()
+        print(f"LLM cache: {s['path']}")
+        print(f"  Entries: {s['entries']}  ({s['bytes'] / 1024 / 1024:.1f} MB of {s['max_bytes'] / 1024 / 1024:.0f} MB)")
+        for row in get_cost_manager().get_cache_summary():
+            rate = row["hits"] / (row["hits"] + row["misses"]) if row["hits"] + row["misses"] else 0.0
+            print(f"  {row['task'] or '-':<24} {row['hits']:>6} hits {row['misses']:>6} misses ({rate:.0%})  "
+                  f"saved ${row['saved_cost']:.4f}")
+    else:
+        parser.print_help()
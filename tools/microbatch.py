@@ -0,0 +1,76 @@
+"""
+microbatch.py — Coalesce small calls made by concurrent pipelines into batched ones.
+
+A MicroBatcher wraps a batch function fn(items) -> results (same length, same order).
+Threads call submit(item) and block; the first item opens a window of `max_wait` seconds,
+and the batch is flushed when the window closes, `max_items` are waiting or the items'
+total weight reaches `max_weight`. Each caller gets its own result back (or its exception).
+
+Used by monitor_growth to classify many agencies' signals in one LLM request, and by
+pipeline.InProcessEngine to write many agencies in one upsert, during batch runs
+(batch_runner enables both).
+"""
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_items: int = 16, max_wait: float = 0.5,
+                 max_weight: Optional[float] = None, weight: Callable[[Any], float] = lambda item: 1.0):
+        self.fn = fn
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self.max_weight = max_weight
+        self.weight = weight
+        self.stats = {"items": 0, "batches": 0}
+        self._lock = threading.Lock()
+        self._pending = []  # [(item, future, weight)]
+        self._pending_weight = 0.0
+        self._timer = None
+
+    def submit(self, item: Any) -> Any:
+        """Queue `item` and block until its batch has run. Re-raises the batch's exception."""
+        future = Future()
+        w = self.weight(item)
+        with self._lock:
+            # An item that would push the batch over its weight budget starts the next one.
+            if self._pending and self.max_weight is not None and self._pending_weight + w > self.max_weight:
+                self._flush_locked()
+            self._pending.append((item, future, w))
+            self._pending_weight += w
+            if len(self._pending) >= self.max_items or (self.max_weight is not None and self._pending_weight >= self.max_weight):
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_wait, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future.result()
+
+    def _flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_weight = self._pending, [], 0.0
+        if batch:
+            self.stats["items"] += len(batch)
+            self.stats["batches"] += 1
+            # Run outside the lock so new items can queue for the next batch meanwhile.
+            threading.Thread(target=self._run, args=(batch,), daemon=True).start()
+
+    def _run(self, batch):
+        try:
+            results = self.fn([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"batch function returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
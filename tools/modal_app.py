@@ -3,9 +3,6 @@ import modal
 import sys
 import os
 import json
-from tools.scrape_agency import scrape_agency
-from tools.extract_insights import extract_insights
-from tools.store_data import store_data
 
 app = modal.App("athos-intelligence-platform")
 
@@ -15,8 +12,14 @@ image = modal.Image.debian_slim().pip_install(
     "openai",
     "pydantic",
     "supabase",
-    "python-dotenv"
-).add_local_dir("tools", remote_path="/root/tools")
+    "python-dotenv",
+    "tiktoken"
+).env({"ATHOS_CACHE_DIR": "/cache"}).add_local_dir("tools", remote_path="/root/tools")
+
+# Local caches (pages, LLM responses, searches, group graph) shared by every container, so the
+# scheduled sweep revalidates (ETag/304) and resolves known groups instead of starting cold. Containers commit when they finish; the SQLite index is last-writer-wins across
+# concurrent containers, which costs at most some cache entries, never correctness.
+cache_volume = modal.Volume.from_name("athos-cache", create_if_missing=True)
 
 # Define secrets (assumes these are set in Modal dashboard or local .env if running locally with modal run)
 # best practice is to create secrets in modal dashboard: modal secret create athos-secrets ...
@@ -27,7 +30,8 @@ secrets = [
 @app.function(
     image=image, 
     secrets=secrets, 
-    timeout=600 # Increased timeout for potential re-tries
+    timeout=600, # Increased timeout for potential re-tries
+    volumes={"/cache": cache_volume}
 )
 @modal.web_endpoint(method="POST")
 def analyze_agency_webhook(item: dict):
@@ -55,7 +59,8 @@ def analyze_agency_webhook(item: dict):
 @app.function(
     image=image,
     secrets=secrets,
-    timeout=600
+    timeout=600,
+    volumes={"/cache": cache_volume}
 )
 def analyze_agency(url: str):
     """
@@ -64,77 +69,42 @@ def analyze_agency(url: str):
     return _analyze_logic(url)
 
 def _analyze_logic(url: str):
+    try:
+        return _run_analysis(url)
+    finally:
+        cache_volume.commit()
+
+def _run_analysis(url: str):
     print(f"🚀 [Cloud] Starting analysis for: {url}")
-    
-    from io import StringIO
-    import contextlib
-
-    @contextlib.contextmanager
-    def capture_stdout():
-        new_out = StringIO()
-        old_out = sys.stdout
-        try:
-            sys.stdout = new_out
-            yield new_out
-        finally:
-            sys.stdout = old_out
+
+    from tools.pipeline import InProcessEngine
+    engine = InProcessEngine()
 
     # --- Step 1: Scrape ---
     print(f"--- Scraping {url} ---")
-    scrape_data = None
-    with capture_stdout() as buffer:
-        try:
-            from tools.scrape_agency import scrape_agency as run_scrape
-            run_scrape(url)
-        except Exception as e:
-            print(f"Scrape Error: {e}")
-            return {"success": False, "error": str(e)}
-            
     try:
-        scrape_output = buffer.getvalue()
-        # Find the last valid JSON line or try parsing the whole thing if it's clean
-        # scrape_agency prints JSON at the end.
-        scrape_json = json.loads(scrape_output)
-        if not scrape_json.get("success"):
-            return scrape_json
-        scrape_data = scrape_json
-    except json.JSONDecodeError:
-        return {"success": False, "error": f"Invalid Scrape JSON: {scrape_output}"}
+        scrape_data = engine.scrape(url, run_id=None)
+    except Exception as e:
+        print(f"Scrape Error: {e}")
+        return {"success": False, "error": str(e)}
+    if not scrape_data.get("success"):
+        return scrape_data
 
     # --- Step 2: Extract ---
     print(f"--- Extracting Insights ---")
-    extract_data = None
-    with capture_stdout() as buffer:
-        try:
-            from tools.extract_insights import extract_insights as run_extract
-            run_extract(scrape_data["markdown"], url)
-        except Exception as e:
-             return {"success": False, "error": str(e)}
-
     try:
-        extract_output = buffer.getvalue()
-        extract_json = json.loads(extract_output)
-        if "error" in extract_json:
-             return extract_json
-        extract_data = extract_json 
-    except json.JSONDecodeError:
-         return {"success": False, "error": f"Invalid Extract JSON: {extract_output}"}
+        extract_data = engine.extract(scrape_data["markdown"], url, run_id=None)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    if "error" in extract_data:
+        return extract_data
 
     # --- Step 3: Store ---
     print(f"--- Storing Data ---")
-    with capture_stdout() as buffer:
-        try:
-            from tools.store_data import store_data as run_store
-            run_store(extract_data) 
-        except Exception as e:
-            return {"success": False, "error": str(e)}
-
     try:
-        store_output = buffer.getvalue()
-        store_json = json.loads(store_output)
-        return store_json
-    except json.JSONDecodeError:
-        return {"success": False, "error": f"Invalid Store JSON: {store_output}"}
+        return engine.store(extract_data)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
 
 @app.function(
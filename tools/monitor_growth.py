@@ -3,10 +3,13 @@ import json
 import sys
 import os
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from openai import OpenAI
 from dotenv import load_dotenv
-from cost_manager import CostManager
+import llm_gateway
+import search_cache
+import content_packer
+from microbatch import MicroBatcher
 
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
@@ -20,13 +23,16 @@ except ImportError:
     HAS_DDGS = False
 
 class GrowthMonitor:
-    def __init__(self):
+    def __init__(self, client: Optional[OpenAI] = None):
         self.ddgs = DDGS() if HAS_DDGS else None
         
         self.model = "openai/gpt-4o-mini"
 
-        if OPENROUTER_API_KEY:
-            self.client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=OPENROUTER_API_KEY)
+        # Shared pooled client from the gateway; the model id is OpenRouter-style, so only with that key.
+        if client is not None:
+            self.client = client
+        elif OPENROUTER_API_KEY:
+            self.client = llm_gateway.default_client()
         else:
             self.client = None
 
@@ -69,7 +75,8 @@ class GrowthMonitor:
         print(f"DEBUG: Searching News: {query}", file=sys.stderr)
         # DDGS().news() returns list of dicts
         results = []
-        for r in self.ddgs.news(query, max_results=5):
+        hits = search_cache.search("news", "ddg_news", self.ddgs.news, query, max_results=5)
+        for r in hits:
             results.append({
                 "title": r.get('title'),
                 "url": r.get('url'),
@@ -84,67 +91,182 @@ class GrowthMonitor:
         query = f'site:linkedin.com/company/ "{agency_name}" ("thrilled to announce" OR "welcome" OR "partnership")'
         print(f"DEBUG: Searching Social: {query}", file=sys.stderr)
         results = []
-        for r in self.ddgs.text(query, max_results=5):
+        hits = search_cache.search("social", "ddg_text", self.ddgs.text, query, max_results=5)
+        for r in hits:
             results.append({
                 "title": r.get('title'),
                 "url": r.get('href'),
                 "description": r.get('body')
             })
+        return results
+
     def analyze_signals(self, signals: dict, agency_name: str, run_id: Optional[str] = None):
         """
         Uses LLM to categorize raw signals into structured growth events.
+        During batch runs (configure_batching) the call is pooled with other agencies' signals.
         """
         if not self.client:
             return signals
 
-        # Flatten signals for context
-        news_context = "\n".join([f"- {n['title']} ({n['url']})" for n in signals.get("news", []) or []])
-        social_context = "\n".join([f"- {s['title']}: {s.get('description', '')[:200]}" for s in signals.get("social_mentions", []) or []])
-        
+        try:
+            if _batcher is not None:
+                signals["classified_signals"] = _batcher.submit((agency_name, signals, run_id, self))
+            else:
+                signals["classified_signals"] = self.classify_batch([(agency_name, signals, run_id)])[0]
+        except Exception as e:
+            sys.stderr.write(f"Signal analysis failed: {e}\n")
+
+        return signals
+
+    def classify_batch(self, batch: List[Tuple[str, dict, Optional[str]]]) -> List[list]:
+        """Classify several agencies' signals in as few LLM calls as the token budget allows.
+        `batch` is [(agency_name, signals, run_id)]; returns each agency's classified_signals, in order.
+        Every signal gets a stable id ("A2.3" = third signal of the second agency) so results
+        can be split back per agency; cost is shared between the runs by prompt size."""
+        results = [[] for _ in batch]
+        entries = [_signal_entries(signals) for _, signals, _ in batch]
+        for group in _plan_batches([i for i, e in enumerate(entries) if e], entries):
+            self._classify_group(group, batch, entries, results)
+        return results
+
+    def _classify_group(self, group: List[int], batch, entries, results):
+        ids = {i: f"A{n}" for n, i in enumerate(group, 1)}
+        blocks = [_agency_block(ids[i], batch[i][0], entries[i]) for i in group]
         prompt = f"""
-        Analyze these search results for the agency "{agency_name}".
-        Categorize each entry into one of: "Won Work", "Recruitment", "Award", "Partnership", or "General News".
+        Classify every search result below (grouped by agency) into one of: {", ".join(f'"{t}"' for t in SIGNAL_TYPES)}.
         Look specifically for "recruitment" or "hiring" signals and "won work" or "new client" wins.
-        
-        News:
-        {news_context}
-        
-        Social:
-        {social_context}
-        
-        Return a JSON object with a single key 'classified_signals' which is a list of objects:
-        {{ "title": "...", "url": "...", "type": "...", "summary": "brief summary" }}
+
+        {chr(10).join(blocks)}
+
+        Return a JSON object with a single key 'classified_signals': a list with one object per result,
+        {{ "id": "<result id, e.g. A1.2>", "type": "...", "summary": "brief summary" }}
         """
+        def parse(content: str):
+            by_id = {c.get("id"): c for c in json.loads(content).get("classified_signals", []) if isinstance(c, dict)}
+            missing = [i for i in group if not any(f"{ids[i]}.{n}" in by_id for n in range(1, len(entries[i]) + 1))]
+            return by_id, missing
+
+        def complete(content: str) -> bool:
+            # What the checks below accept; anything else is retried, so keep it out of the cache.
+            try:
+                return len(group) == 1 or not parse(content)[1]
+            except Exception:
+                return False
 
         try:
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = llm_gateway.chat_completion(
+                self.model,
+                [
                     {"role": "system", "content": "You are a growth signal analyst. Return JSON ONLY."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                task="classification", client=self.client, validate=complete,
+                # One call for several runs: cost and cache events are shared by prompt size, and
+                # recorded by the gateway as soon as the call completes, usable answer or not.
+                run_shares=[(batch[i][2], _block_tokens(blocks[n])) for n, i in enumerate(group)],
             )
-            
-            raw_response = completion.choices[0].message.content
-            classified = json.loads(raw_response)
-            signals["classified_signals"] = classified.get("classified_signals", [])
-            
-            # Record Cost
-            if run_id:
-                usage = completion.usage
-                cm = CostManager()
-                cm.record_usage(
-                    run_id=run_id,
-                    model=self.model,
-                    prompt_tokens=usage.prompt_tokens,
-                    completion_tokens=usage.completion_tokens
-                )
-                
+            by_id, missing = parse(response.content)
+            if missing and len(group) > 1:
+                raise ValueError(f"no results for {len(missing)} of {len(group)} agencies")
         except Exception as e:
-            sys.stderr.write(f"Signal analysis failed: {e}\n")
-            
-        return signals
+            if len(group) == 1:
+                sys.stderr.write(f"Signal analysis failed for {batch[group[0]][0]}: {e}\n")
+                return
+            # Truncated or garbled answer: halve the batch and retry each half.
+            sys.stderr.write(f"Batched classification of {len(group)} agencies failed ({e}); splitting\n")
+            half = len(group) // 2
+            self._classify_group(group[:half], batch, entries, results)
+            self._classify_group(group[half:], batch, entries, results)
+            return
+
+        for i in group:
+            results[i] = [{"title": entry["title"], "url": entry["url"],
+                           "type": by_id[f"{ids[i]}.{n}"].get("type", "General News"),
+                           "summary": by_id[f"{ids[i]}.{n}"].get("summary", "")}
+                          for n, entry in enumerate(entries[i], 1) if f"{ids[i]}.{n}" in by_id]
+
+
+SIGNAL_TYPES = ("Won Work", "Recruitment", "Award", "Partnership", "General News")
+# Prompt budget per classification request, and the answer size we expect per signal. Batches
+# are sized so the prompt fits CLASSIFY_BATCH_TOKENS and the answer CLASSIFY_MAX_OUTPUT_TOKENS.
+CLASSIFY_BATCH_TOKENS = int(os.getenv("CLASSIFY_BATCH_TOKENS", "6000"))
+CLASSIFY_MAX_OUTPUT_TOKENS = 3000
+_OUTPUT_TOKENS_PER_SIGNAL = 45
+
+_batcher: Optional[MicroBatcher] = None
+
+
+def _signal_entries(signals: dict) -> List[dict]:
+    entries = [{"title": n.get("title"), "url": n.get("url"), "text": f"{n.get('title')} ({n.get('url')})"}
+               for n in signals.get("news", []) or []]
+    entries += [{"title": m.get("title"), "url": m.get("url"),
+                 "text": f"{m.get('title')}: {(m.get('description') or '')[:200]}"}
+                for m in signals.get("social_mentions", []) or []]
+    return entries
+
+
+def _agency_block(agency_id: str, agency_name: str, entries: List[dict]) -> str:
+    lines = [f'Agency {agency_id}: "{agency_name}"']
+    lines += [f"- {agency_id}.{n}: {e['text']}" for n, e in enumerate(entries, 1)]
+    return "\n".join(lines)
+
+
+def _block_tokens(block: str) -> int:
+    return content_packer.count_tokens(block)
+
+
+def _plan_batches(indices: List[int], entries: List[List[dict]]) -> List[List[int]]:
+    """Greedy grouping: add agencies until the next would overflow the prompt or answer budget."""
+    groups, current, prompt_tokens, output_tokens = [], [], 0, 0
+    for i in indices:
+        p = _block_tokens(_agency_block("A00", "", entries[i])) + 10
+        o = _OUTPUT_TOKENS_PER_SIGNAL * len(entries[i])
+        if current and (prompt_tokens + p > CLASSIFY_BATCH_TOKENS or output_tokens + o > CLASSIFY_MAX_OUTPUT_TOKENS):
+            groups.append(current)
+            current, prompt_tokens, output_tokens = [], 0, 0
+        current.append(i)
+        prompt_tokens += p
+        output_tokens += o
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _classify_pooled(items: List[Tuple[str, dict, Optional[str], GrowthMonitor]]) -> List[list]:
+    """MicroBatcher callback: classify with each caller's own monitor (model and client),
+    pooling only the callers that share both."""
+    results = [None] * len(items)
+    pools = {}
+    for i, (_, _, _, monitor) in enumerate(items):
+        pools.setdefault((monitor.model, id(monitor.client)), []).append(i)
+    for indices in pools.values():
+        monitor = items[indices[0]][3]
+        for i, classified in zip(indices, monitor.classify_batch([items[i][:3] for i in indices])):
+            results[i] = classified
+    return results
+
+
+def configure_batching(max_wait: float = 0.5, max_items: int = 32) -> None:
+    """Pool analyze_signals calls from concurrent pipelines into batched requests (batch_runner).
+    Calls are held for up to `max_wait` seconds while others join the batch. Undo with stop_batching()."""
+    global _batcher
+    _batcher = MicroBatcher(
+        _classify_pooled, max_items=max_items, max_wait=max_wait, max_weight=CLASSIFY_BATCH_TOKENS,
+        weight=lambda item: _block_tokens(_agency_block("A00", item[0], _signal_entries(item[1]))))
+
+
+def stop_batching() -> Optional[dict]:
+    """Back to one classification call per analyze_signals. Returns the batcher's final stats."""
+    global _batcher
+    stats = batching_stats()
+    _batcher = None
+    return stats
+
+
+def batching_stats() -> Optional[dict]:
+    return dict(_batcher.stats) if _batcher is not None else None
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Monitor Agency Growth Signals")
@@ -0,0 +1,191 @@
+"""
+name_index.py — In-memory index of agency names for resolving discovered siblings.
+
+Loaded from Supabase once per process (refreshed after MAX_AGE_SECONDS) and matched locally:
+    normalise       lowercase, "&" → "and", punctuation dropped, leading "the" dropped
+    strip suffixes  trailing legal/generic words: Ltd, Limited, Group, Agency, Inc, LLC, ...
+    similarity      exact normalised match, else the best of trigram Jaccard, spacing-insensitive
+                    equality and token containment of the new name in the stored one
+                    ("Velstar" ⊂ "Velstar Commerce", never "Media" ⊂ "Social Media Agency")
+
+Replaces two ilike round-trips per sibling; new names are claimed in the index as they are
+queued so concurrent pipelines don't insert the same lead twice (and released if the insert fails),
+and agencies the pipeline stores are added as they are written (note_stored).
+
+Usage:
+    python name_index.py "Pinpoint Digital Ltd" "We Make Websites"
+"""
+import re
+import sys
+import time
+import argparse
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+LEGAL_SUFFIXES = {"ltd", "limited", "llc", "llp", "inc", "plc", "gmbh", "co", "company", "corp", "group",
+                  "agency", "holdings", "uk"}
+# Words too common in agency names to identify one on their own.
+GENERIC_WORDS = {"and", "digital", "media", "social", "creative", "partners", "marketing", "design", "studio",
+                 "studios", "commerce", "ecommerce", "web", "online", "consulting", "solutions", "labs", "interactive",
+                 "global", "brand", "brands", "growth", "performance", "content", "collective", "works", "tech"}
+MATCH_THRESHOLD = 0.75
+MAX_AGE_SECONDS = 3600
+
+
+def normalize(name: str) -> str:
+    words = re.sub(r"[^a-z0-9]+", " ", (name or "").lower().replace("&", " and ")).split()
+    if len(words) > 1 and words[0] == "the":
+        words = words[1:]
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words = words[:-1]
+    return " ".join(words)
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(new: str, stored: str) -> float:
+    """Similarity of a new normalised name to a stored one in 0..1. Not symmetric: containment
+    only counts the new name's words inside the stored name's (the direction of the old ilike)."""
+    if new == stored:
+        return 1.0
+    if new.replace(" ", "") == stored.replace(" ", ""):
+        return 0.95  # "WeMakeWebsites" vs "We Make Websites"
+    ta, tb = trigrams(new), trigrams(stored)
+    jaccard = len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+    words = set(new.split())
+    distinctive = {w for w in words - GENERIC_WORDS if len(w) >= 5 or len(words) > 1}
+    contained = 0.9 if distinctive and words <= set(stored.split()) else 0.0
+    return max(jaccard, contained)
+
+
+class NameIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: List[Tuple[Optional[str], str, str]] = []  # (id, name, key)
+        self._by_key: Dict[str, int] = {}
+        self._by_trigram: Dict[str, Set[int]] = defaultdict(set)
+        self.loaded_at = 0.0
+
+    def __len__(self):
+        return len(self._names)
+
+    def _add_locked(self, name: str, agency_id: Optional[str] = None) -> None:
+        key = normalize(name)
+        if not key:
+            return
+        if key in self._by_key:
+            pos = self._by_key[key]
+            if agency_id and self._names[pos][0] is None:
+                # A claim whose row now exists: record its id (and it can no longer be released).
+                self._names[pos] = (agency_id, self._names[pos][1], key)
+            return
+        pos = len(self._names)
+        self._names.append((agency_id, name, key))
+        self._by_key[key] = pos
+        for gram in trigrams(key):
+            self._by_trigram[gram].add(pos)
+
+    def add(self, name: str, agency_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._add_locked(name, agency_id)
+
+    def _match_locked(self, name: str, threshold: float) -> Optional[Tuple[Optional[str], str, float]]:
+        key = normalize(name)
+        if not key:
+            return None
+        if key in self._by_key:
+            agency_id, stored, _ = self._names[self._by_key[key]]
+            return agency_id, stored, 1.0
+        candidates = defaultdict(int)
+        for gram in trigrams(key):
+            for pos in self._by_trigram.get(gram, ()):
+                candidates[pos] += 1
+        best = None
+        # Score the names sharing the most trigrams, not the whole table.
+        for pos, _ in sorted(candidates.items(), key=lambda kv: -kv[1])[:50]:
+            agency_id, stored, stored_key = self._names[pos]
+            score = similarity(key, stored_key)
+            if score >= threshold and (best is None or score > best[2]):
+                best = (agency_id, stored, score)
+        return best
+
+    def match(self, name: str, threshold: float = MATCH_THRESHOLD) -> Optional[Tuple[Optional[str], str, float]]:
+        """(id, stored name, score) of the best match at or above `threshold`, or None."""
+        with self._lock:
+            return self._match_locked(name, threshold)
+
+    def claim(self, name: str, threshold: float = MATCH_THRESHOLD) -> Optional[Tuple[Optional[str], str, float]]:
+        """match(), and if nothing matches add `name` — atomically, so only one caller gets None."""
+        with self._lock:
+            found = self._match_locked(name, threshold)
+            if found is None:
+                self._add_locked(name)
+            return found
+
+    def release(self, name: str) -> None:
+        """Undo claim(name) — e.g. when its insert failed — so the next pipeline can ingest it.
+        Names loaded from Supabase (with an id) are never released."""
+        key = normalize(name)
+        with self._lock:
+            pos = self._by_key.get(key)
+            if pos is None or self._names[pos][0] is not None:
+                return
+            del self._by_key[key]
+            for gram in trigrams(key):
+                self._by_trigram[gram].discard(pos)
+
+    def load(self, supabase, page_size: int = 1000) -> "NameIndex":
+        start, rows = 0, []
+        while True:
+            page = supabase.table("agencies").select("id, name").range(start, start + page_size - 1).execute().data or []
+            rows += page
+            if len(page) < page_size:
+                break
+            start += page_size
+        with self._lock:
+            for row in rows:
+                if row.get("name"):
+                    self._add_locked(row["name"], row.get("id"))
+            self.loaded_at = time.time()
+        return self
+
+
+_index: Optional[NameIndex] = None
+_index_lock = threading.Lock()
+
+
+def note_stored(name: Optional[str], agency_id: Optional[str]) -> None:
+    """Add an agency just written to Supabase to the shared index, if one is loaded, so siblings
+    discovered later in the same batch match it without waiting for the next reload."""
+    with _index_lock:
+        index = _index
+    if index is not None and name:
+        index.add(name, agency_id)
+
+
+def get_index(supabase, max_age: float = MAX_AGE_SECONDS) -> NameIndex:
+    """Shared index, loaded on first use and reloaded once it is older than `max_age`."""
+    global _index
+    with _index_lock:
+        if _index is None or time.time() - _index.loaded_at > max_age:
+            started = time.monotonic()
+            _index = NameIndex().load(supabase)
+            sys.stderr.write(f"[name_index] loaded {len(_index)} agency names in {time.monotonic() - started:.1f}s\n")
+        return _index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match names against the agencies table.")
+    parser.add_argument("names", nargs="+", help="Names to resolve")
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    args = parser.parse_args()
+
+    from pipeline import get_engine
+    index = get_index(get_engine().supabase)
+    for name in args.names:
+        found = index.match(name, args.threshold)
+        print(f"{name!r:<36} → " + (f"{found[1]!r} ({found[2]:.2f}, id {found[0]})" if found else "no match"))
@@ -1,28 +1,38 @@
-
 import os
 import sys
 import argparse
-import subprocess
 import json
 import logging
 import uuid
-import hashlib
 import time
 from typing import Optional
 from dotenv import load_dotenv
-from supabase import create_client
-from cost_manager import CostManager
+from cost_manager import get_cost_manager
+from pipeline import get_engine, ENGINES, run_tool  # run_tool re-exported for existing callers
+from phase_graph import PhaseGraph, PhaseAbort
 import tracing
+import page_cache
+import llm_gateway
+import extract_insights
+import change_detection
+import incremental_extract
+import group_graph
+import name_index
+from store_data import canonical_url
 
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
-_supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
 
-def get_existing_hash(website: str) -> Optional[str]:
-    """Fetch stored content_hash for a website from Supabase."""
+def get_stored_fingerprint(website: str, supabase, extra_columns=()) -> Optional[dict]:
+    """Stored change-detection columns (plus `extra_columns`) for a website, looked up by its
+    canonical form, or None."""
+    if supabase is None:
+        return None
     try:
-        res = _supabase.table("agencies").select("content_hash").eq("website", website).limit(1).execute()
+        res = (supabase.table("agencies")
+               .select(", ".join(("content_hash", "normalized_content_hash", "section_hashes") + tuple(extra_columns)))
+               .eq("website", canonical_url(website)).limit(1).execute())
         if res.data:
-            return res.data[0].get("content_hash")
+            return res.data[0]
     except Exception:
         pass
     return None
@@ -30,47 +40,33 @@ def get_existing_hash(website: str) -> Optional[str]:
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_tool(script_name, input_data=None, args=None):
-    """
-    Runs a tool script as a subprocess.
-    """
-    tool_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script_name)
-    cmd = [sys.executable, tool_path]
-    
-    if args:
-        cmd.extend(args)
-        
-    logging.info(f"Running tool: {script_name} with args: {args}")
-
-    try:
-        if input_data:
-            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            stdout, stderr = process.communicate(input=input_data)
-        else:
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            stdout, stderr = process.communicate()
-            
-        if process.returncode != 0:
-            logging.error(f"Tool {script_name} failed with code {process.returncode}")
-            logging.error(f"Stderr: {stderr}")
-            return None
-            
-        return stdout.strip()
-
-    except Exception as e:
-        logging.error(f"Failed to execute {script_name}: {e}")
-        return None
-
-def orchestrate(url: str, model: str = None):
-    """One trace per run: root span here, child span per phase, linked via TWOTAIL_PARENT_SPAN_ID."""
+def orchestrate(url: str, model: str = None, engine=None):
+    """One trace per run: root span here, child span per phase, linked via tracing.set_parent().
+    `engine` is a pipeline engine (in-process by default); pass one in to share its clients across runs.
+    Returns {"run_id", "url", "status", "timing", "revalidation"} where status is "complete",
+    "unchanged" or "<phase>_failed", timing is the phase graph's critical-path
+    report and revalidation counts how the scraper's pages were served (cache hit / 304 / fetched)."""
+    engine = engine or get_engine()
     run_id = str(uuid.uuid4())
     trace_id = run_id.replace("-", "")
-    os.environ["TWOTAIL_TRACE_ID"] = trace_id
+    tracing.set_trace(trace_id)
     root_span_id = tracing.new_span_id()
+    tracing.set_parent(root_span_id)
     root_start = time.time_ns()
     status_code = 1
+    attributes = {"target.url": url, "workflow.name": "blast_pipeline", "run.id": run_id,
+                  "pipeline.engine": engine.name}
     try:
-        _run_pipeline(url, model, run_id, trace_id, root_span_id)
+        status, timing, revalidation = _run_pipeline(url, model, run_id, trace_id, root_span_id, engine)
+        attributes.update({
+            "pipeline.status": status,
+            "pipeline.critical_path": " > ".join(timing["critical_path"]),
+            "pipeline.critical_path_ms": int(timing["critical_path_s"] * 1000),
+            "pipeline.serial_ms": int(timing["serial_s"] * 1000),
+            "pipeline.saved_ms": int(timing["saved_s"] * 1000),
+            "pipeline.pages_not_modified": revalidation.get("not_modified", 0),
+        })
+        return {"run_id": run_id, "url": url, "status": status, "timing": timing, "revalidation": revalidation}
     except Exception:
         status_code = 2
         raise
@@ -78,243 +74,351 @@ def orchestrate(url: str, model: str = None):
         tracing.send_span(
             trace_id, root_span_id, None, "orchestration",
             root_start, time.time_ns(),
-            attributes={"target.url": url, "workflow.name": "blast_pipeline", "run.id": run_id},
+            attributes=attributes,
             status_code=status_code,
         )
 
 
-def _run_pipeline(url: str, model, run_id, trace_id, root_span_id):
-    logging.info(f"🚀 Starting B.L.A.S.T. Orchestration (Run ID: {run_id}) for: {url}")
+def _traced(trace_id, parent_span_id, name, fn, attributes=None, spans=None):
+    """Wrap a phase function so it runs under its own child span (status 2 if it raises)."""
+    def wrapper(inputs):
+        span_id, start = tracing.new_span_id(), time.time_ns()
+        tracing.set_parent(span_id)
+        status_code = 2
+        try:
+            value = fn(inputs)
+            status_code = 1
+            return value
+        finally:
+            end = time.time_ns()
+            if spans is not None:
+                spans[name] = (start, end)
+            tracing.send_span(trace_id, span_id, parent_span_id, name, start, end,
+                              attributes=attributes, status_code=status_code)
+    return wrapper
+
+
+def _ingest_siblings(engine, agency_name: str, parent: str, siblings: list):
+    """Insert discovered sibling agencies as new leads unless they already exist.
+    Existing agencies are matched in memory (name_index); new leads go in one bulk insert."""
+    _supa = engine.supabase
+    if not _supa:
+        return
+    index = name_index.get_index(_supa)
+    own_key = name_index.normalize(agency_name)
+    new_leads = []
+    for sibling in siblings:
+        sibling_clean = sibling.strip()
+        if not sibling_clean or name_index.normalize(sibling_clean) == own_key:
+            continue
+        existing = index.claim(sibling_clean)
+        if existing:
+            logging.info(f"⏭️ Sibling lead '{sibling_clean}' already exists as '{existing[1]}'. Skipping ingestion.")
+            continue
+        new_leads.append({
+            "name": sibling_clean,
+            "parent_company": parent,
+            "is_group_member": True,
+            "description": f"Discovered sibling agency of {agency_name} via {parent} group."
+        })
+    if new_leads:
+        logging.info(f"✨ Ingesting {len(new_leads)} new discovered lead(s): {', '.join(r['name'] for r in new_leads)}")
+        try:
+            inserted = _supa.table("agencies").insert(new_leads).execute().data or []
+        except Exception:
+            # Not stored: drop the claims so other pipelines don't treat these names as existing.
+            for lead in new_leads:
+                index.release(lead["name"])
+            raise
+        for row in inserted:
+            index.add(row.get("name"), row.get("id"))
+
+
+def _run_pipeline(url: str, model, run_id, trace_id, root_span_id, engine):
+    """Builds and runs the phase graph. Returns (status, timing_report, revalidation).
+
+        scrape → detect_changes → extract ─┬─ growth ─┬─ store → score
+                                           └─ group  ─┘
+
+    growth and group only need the agency name, so they run concurrently; store
+    merges both into the extracted record.
+    """
+    logging.info(f"🚀 Starting B.L.A.S.T. Orchestration (Run ID: {run_id}, engine: {engine.name}) for: {url}")
     if model:
         logging.info(f"🤖 Model override: {model}")
 
-    # Step 1: Link/Scrape
-    logging.info("--- Phase 1: Scraping (Link) ---")
-    scrape_args = ["--url", url, "--run-id", run_id]
-    if model:
-        scrape_args += ["--model", model]
-    _span_id, _start = tracing.new_span_id(), time.time_ns()
-    os.environ["TWOTAIL_PARENT_SPAN_ID"] = _span_id
-    scrape_output_raw = run_tool("scrape_agency.py", args=scrape_args)
-    tracing.send_span(trace_id, _span_id, root_span_id, "scrape", _start, time.time_ns(),
-                       attributes={"target.url": url}, status_code=1 if scrape_output_raw else 2)
-    
-    if not scrape_output_raw:
-        logging.error("Scraping failed. Aborting.")
-        return
+    scrape_info = {"revalidation": {}, "stored": None}
 
-    try:
-        scrape_json = json.loads(scrape_output_raw)
+    # Step 1: Link/Scrape
+    def scrape(_):
+        logging.info("--- Phase 1: Scraping (Link) ---")
+        scrape_json = engine.scrape(url, run_id, model)
+        if not scrape_json:
+            logging.error("Scraping failed. Aborting.")
+            raise PhaseAbort("scrape_failed")
         if not scrape_json.get("success"):
             logging.error(f"Scraper reported failure: {scrape_json.get('error')}")
-            return
-        
+            raise PhaseAbort("scrape_failed")
         markdown_content = scrape_json.get("markdown")
         if not markdown_content:
-             logging.error("No markdown content returned.")
-             return
-             
-    except json.JSONDecodeError:
-        logging.error(f"Invalid JSON from scraper: {scrape_output_raw}")
-        return
+            logging.error("No markdown content returned.")
+            raise PhaseAbort("scrape_failed")
+        scrape_info["revalidation"] = scrape_json.get("revalidation") or {}
+        logging.info(f"✅ Scrape successful. Length: {len(markdown_content)} chars")
+        return markdown_content
 
-    logging.info(f"✅ Scrape successful. Length: {len(markdown_content)} chars")
+    # Change detection — skip extraction if content unchanged (see change_detection.py)
+    def detect_changes(inputs):
+        # The stored record comes along for incremental extraction, which merges into it.
+        stored = get_stored_fingerprint(url, engine.supabase, incremental_extract.RECORD_COLUMNS
+                                        if incremental_extract.enabled() else ())
+        scrape_info["stored"] = stored
+        # A fully revalidated crawl (every page 304 / cache hit) is still fingerprinted: the local
+        # page cache can be newer than the stored record (failed store, eval.py or
+        # --markdown-only warm-ups), so only the stored hash decides whether to skip.
+        fp = change_detection.fingerprint(inputs["scrape"])
+        report = change_detection.compare(fp, stored)
+        if report.unchanged:
+            logging.info(f"⏭️  Content unchanged ({report.explain()}). Skipping extraction — no LLM cost incurred.")
+            raise PhaseAbort("unchanged")
+        logging.info(f"🔎 Content {report.explain()}")
+        return fp
 
-    # Hash check — skip extraction if content unchanged
-    new_hash = hashlib.sha256(markdown_content.encode()).hexdigest()
-    existing_hash = get_existing_hash(url)
-    if existing_hash and existing_hash == new_hash:
-        logging.info("⏭️  Content unchanged (hash match). Skipping extraction — no LLM cost incurred.")
-        return
+    def _extract_incremental(markdown):
+        """Stored record with only the changed pages' fields re-extracted, or None for a full extraction."""
+        plan = incremental_extract.plan(scrape_info["stored"], markdown)
+        if plan.mode == "reuse":
+            logging.info(f"♻️  {plan.reason.capitalize()}. Reusing the previous extraction — no LLM cost incurred.")
+            return dict(plan.record)
+        if plan.mode == "partial":
+            logging.info(f"✂️  {plan.reason.capitalize()}. Re-extracting {', '.join(plan.fields)} "
+                         f"from {len(plan.markdown)} of {len(markdown)} chars.")
+            partial = engine.extract_fields(plan.markdown, url, plan.fields, run_id, model)
+            if partial and "error" not in partial:
+                return plan.merge(partial)
+            logging.warning(f"Incremental extraction failed ({(partial or {}).get('error')}). Falling back to full extraction.")
+            return None
+        logging.info(f"📄 Full extraction: {plan.reason}.")
+        return None
 
     # Step 2: Blueprint/Architect (Extract)
-    logging.info("--- Phase 2: Extraction (Blueprint) ---")
-    extract_args = ["--url", url, "--run-id", run_id]
-    if model:
-        extract_args += ["--model", model]
-    _span_id, _start = tracing.new_span_id(), time.time_ns()
-    os.environ["TWOTAIL_PARENT_SPAN_ID"] = _span_id
-    extract_output_raw = run_tool("extract_insights.py", input_data=markdown_content, args=extract_args)
-    tracing.send_span(trace_id, _span_id, root_span_id, "extract", _start, time.time_ns(),
-                       status_code=1 if extract_output_raw else 2)
-    
-    if not extract_output_raw:
-        logging.error("Extraction failed. Aborting.")
-        return
-        
-    try:
-        # Check if output looks like JSON error
-        extract_json = json.loads(extract_output_raw)
-        if "error" in extract_json:
-             logging.error(f"Extraction reported error: {extract_json['error']}")
-             return
-    except json.JSONDecodeError:
-         logging.error(f"Invalid JSON from extractor: {extract_output_raw}")
-         return
-         
-    logging.info("✅ Extraction successful. Insights generated.")
+    def extract(inputs):
+        logging.info("--- Phase 2: Extraction (Blueprint) ---")
+        markdown = inputs["scrape"]
+        extract_json_obj = _extract_incremental(markdown) if incremental_extract.enabled() else None
+        if extract_json_obj is None:
+            extract_json_obj = engine.extract(markdown, url, run_id, model)
+        if not extract_json_obj:
+            logging.error("Extraction failed. Aborting.")
+            raise PhaseAbort("extract_failed")
+        if "error" in extract_json_obj:
+            logging.error(f"Extraction reported error: {extract_json_obj['error']}")
+            raise PhaseAbort("extract_failed")
+        logging.info("✅ Extraction successful. Insights generated.")
+        if not extract_json_obj.get("name"):
+            logging.warning("No agency name found in extraction. Skipping subsequent enrichment steps.")
+        return extract_json_obj
 
     # Step 2.5: Growth Monitoring (Social/News)
-    logging.info("--- Phase 2.5: Growth Monitoring (Signal Check) ---")
-    _enrich_span_id, _enrich_start = tracing.new_span_id(), time.time_ns()
-    os.environ["TWOTAIL_PARENT_SPAN_ID"] = _enrich_span_id
-    try:
-        # Agency Name is needed for search. Extracted data has it.
-        extract_json_obj = json.loads(extract_output_raw)
-        agency_name = extract_json_obj.get("name")
-        
-        if agency_name:
-            monitor_output_raw = run_tool("monitor_growth.py", args=["--agency", agency_name, "--run-id", run_id])
-            if monitor_output_raw:
-                try:
-                    monitor_json = json.loads(monitor_output_raw)
-                    
-                    # Merge logic: Format structured news into strings to match Agency schema
-                    formatted_news = [f"{n.get('title')} ({n.get('url')})" for n in monitor_json.get("news", [])]
-                    extract_json_obj["recent_news"] = extract_json_obj.get("recent_news", []) + formatted_news
-                    
-                    # Add social mentions (flattened)
-                    # We store them as a list of strings or objects? Let's use objects if Supabase allows, 
-                    # but for consistency with 'recent_news' schema, let's stringify or assume store_data handles it.
-                    # Actually, let's keep it structured for social_mentions as it's a new field.
-                    # But store_data needs to put it somewhere. 
-                    # Let's stringify for now to be safe with existing text[] columns if applicable, 
-                    # or assume JSONB.
-                    # Let's just add it to top level.
-                    # Add classified growth signals (new field)
-                    extract_json_obj["growth_signals"] = monitor_json.get("classified_signals", [])
-
-                    # Logging
-                    logging.info(f"✅ Growth signals merged. Added {len(formatted_news)} news items and {len(extract_json_obj['growth_signals'])} classified signals.")
-                except Exception as e:
-                     logging.error(f"Failed to merge growth data: {e}")
-            else:
-                logging.warning("Growth monitor returned no output. Skipping merge.")
-
-            # Step 2.6: Group Identification & Recursive Discovery
-            logging.info("--- Phase 2.6: Group Identification & Recursive Discovery ---")
-            
-            # Use the GroupEnricher directly for recursive logic
-            from enrich_group import GroupEnricher
-            
-            enricher = GroupEnricher()
-            search_results = enricher.search_group_info(agency_name)
-            group_json = enricher.analyze_group_membership(agency_name, search_results, run_id=run_id)
-            
-            if group_json.get("parent_company") and group_json.get("parent_company") != "Self (Group Head)":
-                parent = group_json.get("parent_company")
-                known_siblings = group_json.get("siblings", [])
-                
-                # Recursive Discovery Step
-                logging.info(f"🔍 Parent found: {parent}. Searching for sibling agencies...")
-                all_siblings = enricher.discover_more_siblings(parent, known_siblings, run_id=run_id)
-                group_json["siblings"] = all_siblings
-                logging.info(f"✅ Discovered {len(all_siblings)} agencies in {parent} group.")
-                
-                # Automatic Lead Ingestion
-                from supabase import create_client
-                _supa_url = os.getenv("SUPABASE_URL")
-                _supa_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-                _supa = create_client(_supa_url, _supa_key) if (_supa_url and _supa_key) else None
-
-                for sibling in all_siblings:
-                    sibling_clean = sibling.strip()
-                    if sibling_clean.lower() == agency_name.lower():
-                        continue
-                    if _supa:
-                        # Exact case-insensitive match first
-                        exists = _supa.table("agencies").select("id").ilike("name", sibling_clean).execute()
-                        if not exists.data:
-                            # Partial match to catch name variations (e.g. "Agency Ltd" vs "Agency")
-                            fuzzy = _supa.table("agencies").select("id").ilike("name", f"%{sibling_clean}%").execute()
-                            exists = fuzzy
-                        if not exists.data:
-                            logging.info(f"✨ Ingesting new discovered lead: {sibling_clean}")
-                            _supa.table("agencies").insert({
-                                "name": sibling_clean,
-                                "parent_company": parent,
-                                "is_group_member": True,
-                                "description": f"Discovered sibling agency of {agency_name} via {parent} group."
-                            }).execute()
-                        else:
-                            logging.info(f"⏭️ Sibling lead '{sibling_clean}' already exists. Skipping ingestion.")
+    def growth(inputs):
+        agency_name = inputs["extract"].get("name")
+        if not agency_name:
+            return None
+        logging.info("--- Phase 2.5: Growth Monitoring (Signal Check) ---")
+        monitor_json = engine.monitor(agency_name, run_id)
+        if not monitor_json:
+            logging.warning("Growth monitor returned no output. Skipping merge.")
+        return monitor_json
+
+    # Step 2.6: Group Identification & Recursive Discovery
+    def group(inputs):
+        agency_name = inputs["extract"].get("name")
+        if not agency_name:
+            return None
+        logging.info("--- Phase 2.6: Group Identification & Recursive Discovery ---")
+
+        # Use the GroupEnricher directly for recursive logic
+        enricher = engine.group_enricher()
+
+        # A later agency of a group we already mapped resolves from the graph — no search, no LLM.
+        graph = group_graph.get_graph()
+        graph.ensure_seeded(engine.supabase)
+        known = graph.lookup_member(agency_name)
+        if known:
+            siblings = known.siblings_of(agency_name)
+            logging.info(f"🗂️  {agency_name} is in {known.parent} (group graph: {len(siblings)} siblings, "
+                         f"{'stale — refreshing in background' if known.stale else 'fresh'}). Skipping group LLM calls.")
+            if known.stale:
+                graph.refresh_async(
+                    known.parent,
+                    lambda members: enricher.discover_more_siblings(known.parent, members, run_id=run_id),
+                    on_new=lambda new: _ingest_siblings(engine, agency_name, known.parent, new))
+            return {"is_group_member": True, "parent_company": known.parent, "siblings": siblings}
+
+        search_results = enricher.search_group_info(agency_name)
+        group_json = enricher.analyze_group_membership(agency_name, search_results, run_id=run_id)
+
+        if group_json.get("parent_company") and group_json.get("parent_company") != "Self (Group Head)":
+            parent = group_json.get("parent_company")
+            known_siblings = group_json.get("siblings", [])
+            graph.record(parent, [agency_name] + known_siblings, "group_membership", discovered=False)
 
+            # Recursive Discovery Step
+            logging.info(f"🔍 Parent found: {parent}. Searching for sibling agencies...")
+            all_siblings = enricher.discover_more_siblings(parent, known_siblings, run_id=run_id)
+            group_json["siblings"] = all_siblings
+            graph.record(parent, all_siblings, "sibling_discovery")
+            logging.info(f"✅ Discovered {len(all_siblings)} agencies in {parent} group.")
+
+            # Automatic Lead Ingestion
+            _ingest_siblings(engine, agency_name, parent, all_siblings)
+        return group_json
+
+    # Step 3: Trigger (Store) — merge the enrichment branches first
+    def store(inputs):
+        extract_json_obj = inputs["extract"]
+        monitor_json, group_json = inputs["growth"], inputs["group"]
+
+        if monitor_json:
+            try:
+                # Merge logic: Format structured news into strings to match Agency schema
+                formatted_news = [f"{n.get('title')} ({n.get('url')})" for n in monitor_json.get("news", [])]
+                extract_json_obj["recent_news"] = extract_json_obj.get("recent_news", []) + formatted_news
+                # Add classified growth signals (new field)
+                extract_json_obj["growth_signals"] = monitor_json.get("classified_signals", [])
+                logging.info(f"✅ Growth signals merged. Added {len(formatted_news)} news items and {len(extract_json_obj['growth_signals'])} classified signals.")
+            except Exception as e:
+                logging.error(f"Failed to merge growth data: {e}")
+
+        if group_json:
             extract_json_obj["is_part_of_group"] = group_json.get("is_group_member", False)
             extract_json_obj["parent_company"] = group_json.get("parent_company")
             extract_json_obj["sibling_agencies"] = group_json.get("siblings", [])
             logging.info(f"✅ Group identification complete: {extract_json_obj['parent_company'] or 'Independent'}")
-            
-            # Re-serialize updated extract_json_obj for the storage phase
-            extract_output_raw = json.dumps(extract_json_obj)
-        else:
-             logging.warning("No agency name found in extraction. Skipping subsequent enrichment steps.")
-             
-    except Exception as e:
-        logging.error(f"Enrichment phases failed (non-fatal): {e}")
-    finally:
-        tracing.send_span(trace_id, _enrich_span_id, root_span_id, "enrich", _enrich_start, time.time_ns())
-
-    # Step 3: Trigger (Store)
-    logging.info("--- Phase 3: Storage (Trigger) ---")
-    _span_id, _start = tracing.new_span_id(), time.time_ns()
-    os.environ["TWOTAIL_PARENT_SPAN_ID"] = _span_id
-    store_output_raw = run_tool("store_data.py", input_data=extract_output_raw)
-    tracing.send_span(trace_id, _span_id, root_span_id, "store", _start, time.time_ns(),
-                       status_code=1 if store_output_raw else 2)
-    
-    if not store_output_raw:
-        logging.error("Storage failed. Aborting.")
-        return
-        
-    try:
-        store_json = json.loads(store_output_raw)
+
+        # Fingerprint of the crawl this record was extracted from, for the next run's change check.
+        extract_json_obj.update(inputs["detect_changes"].as_columns())
+
+        logging.info("--- Phase 3: Storage (Trigger) ---")
+        store_json = engine.store(extract_json_obj)
+        if not store_json:
+            logging.error("Storage failed. Aborting.")
+            raise PhaseAbort("store_failed")
         if not store_json.get("success"):
             logging.error(f"Storage failed: {store_json.get('error')}")
-            return
-    except json.JSONDecodeError:
-        logging.error(f"Invalid JSON from storage: {store_output_raw}")
-        return
-        
-    logging.info("✅ Data successfully stored in Intelligence Platform.")
-    
+            raise PhaseAbort("store_failed")
+        logging.info("✅ Data successfully stored in Intelligence Platform.")
+        name_index.note_stored((store_json.get("data") or {}).get("name") or extract_json_obj.get("name"),
+                               store_json.get("id"))
+        return store_json
+
     # Step 4: Scoring (Lead Scoring Agent)
-    logging.info("--- Phase 4: Scoring (Lead Scoring Agent) ---")
-    try:
-        agency_id = store_json.get("id")
-        if agency_id:
-            _span_id, _start = tracing.new_span_id(), time.time_ns()
-            os.environ["TWOTAIL_PARENT_SPAN_ID"] = _span_id
-            score_output_raw = run_tool("score_leads.py", args=["--id", agency_id])
-            tracing.send_span(trace_id, _span_id, root_span_id, "score", _start, time.time_ns(),
-                               status_code=1 if score_output_raw else 2)
-            if score_output_raw:
-                score_json = json.loads(score_output_raw)
-                if score_json.get("success"):
-                    res = score_json["results"][0]
-                    logging.info(f"✅ Lead Score calculated: {res['score']} / 100")
-                else:
-                    logging.error(f"Scoring logic failed: {score_json.get('error')}")
-            else:
-                 logging.error("Scoring tool returned no output.")
-        else:
+    def score(inputs):
+        logging.info("--- Phase 4: Scoring (Lead Scoring Agent) ---")
+        agency_id = inputs["store"].get("id")
+        if not agency_id:
             logging.warning("No agency ID found in storage output. Skipping scoring.")
-    except Exception as e:
-        logging.error(f"Scoring phase failed (non-fatal): {e}")
-    
-    # Cost Summary
-    cm = CostManager()
-    summary = cm.get_run_summary(run_id)
-    logging.info("--- Run Cost Summary ---")
-    logging.info(f"Total Cost: ${summary['total_cost']:.4f}")
-    for item in summary['details']:
-        logging.info(f"  - {item['model']}: {item['prompt_tokens']} prompt, {item['completion_tokens']} completion tokens (${item['cost']:.4f})")
-    
-    logging.info("🏁 Orchestration Complete.")
+            return None
+        if inputs["store"].get("score") is not None:
+            # store_data writes lead_score/score_breakdown with the record — nothing left to update.
+            row = inputs["store"].get("data") or {}
+            logging.info(f"✅ Lead Score calculated: {inputs['store']['score']} / 100 (stored with the record)")
+            return {"success": True, "results": [{"id": agency_id, "name": row.get("name"),
+                                                  "score": inputs["store"]["score"],
+                                                  "breakdown": row.get("score_breakdown")}]}
+        score_json = engine.score(agency_id)
+        if not score_json:
+            logging.error("Scoring tool returned no output.")
+        elif score_json.get("success"):
+            res = score_json["results"][0]
+            logging.info(f"✅ Lead Score calculated: {res['score']} / 100")
+        else:
+            logging.error(f"Scoring logic failed: {score_json.get('error')}")
+        return score_json
+
+    # Growth and group are children of a shared "enrich" span, sent once both branches finish.
+    enrich_span_id, enrich_spans = tracing.new_span_id(), {}
+    graph = PhaseGraph()
+    graph.add("scrape", _traced(trace_id, root_span_id, "scrape", scrape, attributes={"target.url": url}))
+    graph.add("detect_changes", detect_changes, deps=("scrape",))
+    graph.add("extract", _traced(trace_id, root_span_id, "extract", extract), deps=("scrape", "detect_changes"))
+    graph.add("growth", _traced(trace_id, enrich_span_id, "enrich.growth", growth, spans=enrich_spans),
+              deps=("extract",), optional=True)
+    graph.add("group", _traced(trace_id, enrich_span_id, "enrich.group", group, spans=enrich_spans),
+              deps=("extract",), optional=True)
+    graph.add("store", _traced(trace_id, root_span_id, "store", store),
+              deps=("detect_changes", "extract", "growth", "group"))
+    graph.add("score", _traced(trace_id, root_span_id, "score", score), deps=("store",), optional=True)
+
+    status = graph.run()
+    if enrich_spans:
+        tracing.send_span(trace_id, enrich_span_id, root_span_id, "enrich",
+                          min(s for s, _ in enrich_spans.values()), max(e for _, e in enrich_spans.values()))
+
+    if status is None:
+        failed = [n for n, r in graph.results.items() if not r.ok and not r.skipped and n not in ("growth", "group", "score")]
+        status = f"{failed[0]}_failed" if failed else "complete"
+
+    timing = graph.timing_report()
+    logging.info(f"⏱️  Critical path: {' → '.join(timing['critical_path'])} {timing['critical_path_s']:.1f}s "
+                 f"(wall {timing['wall_s']:.1f}s, serial {timing['serial_s']:.1f}s, saved {timing['saved_s']:.1f}s)")
+
+    if status == "complete":
+        # Cost Summary
+        cm = get_cost_manager()
+        summary = cm.get_run_summary(run_id)
+        logging.info("--- Run Cost Summary ---")
+        logging.info(f"Total Cost: ${summary['total_cost']:.4f}")
+        for item in summary['details']:
+            logging.info(f"  - {item['model']}: {item['prompt_tokens']} prompt, {item['completion_tokens']} completion tokens (${item['cost']:.4f})")
+        packing = cm.get_packing_summary(run_id)
+        if packing["tokens_saved"]:
+            logging.info(f"  - packing: {packing['tokens_in']} → {packing['tokens_out']} prompt tokens "
+                         f"({packing['tokens_saved']} saved, {packing['duplicate_tokens']} duplicate nav/footer)")
+        for row in cm.get_cache_summary(run_id):
+            if row["hits"]:
+                logging.info(f"  - cache: {row['hits']} {row['task']} call(s) served from the LLM cache (saved ${row['saved_cost']:.4f})")
+        for row in cm.get_cascade_summary(run_id):
+            logging.info(f"  - cascade tier {row['tier']} ({row['model']}): "
+                         f"{row['fields_resolved']}/{row['fields_requested']} fields resolved")
+
+        logging.info("🏁 Orchestration Complete.")
+    return status, timing, scrape_info["revalidation"]
 
 if __name__ == "__main__":
+    from batch_runner import add_batch_arguments, read_url_file, query_agencies, run_batch, QUERIES
+
     parser = argparse.ArgumentParser(description="Orchestrator for Agency Intelligence Pipeline")
-    parser.add_argument("--url", required=True, help="Target Agency URL")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Target Agency URL")
+    target.add_argument("--batch", metavar="FILE", help="Run every URL in FILE (one per line, '-' for stdin) concurrently")
+    target.add_argument("--batch-query", choices=QUERIES, help="Run every agency selected from Supabase concurrently")
+    parser.add_argument("--days", type=int, default=7, help="For --batch-query stale: not analysed in this many days")
+    parser.add_argument("--limit", type=int, help="Maximum number of agencies in a batch")
     parser.add_argument("--model", help="Override LLM model for all pipeline steps (e.g. openai/gpt-4o-mini). Run 'python cost_manager.py --models' to see options.")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="in-process",
+                        help="in-process (default) calls each tool as a library; subprocess runs one interpreter per phase.")
+    add_batch_arguments(parser)
+    page_cache.add_cache_arguments(parser)
+    llm_gateway.add_cache_arguments(parser)
+    extract_insights.add_cascade_arguments(parser)
+    incremental_extract.add_arguments(parser)
+    tracing.add_trace_arguments(parser)
     args = parser.parse_args()
+    page_cache.apply_cache_arguments(args)
+    llm_gateway.apply_cache_arguments(args)
+    extract_insights.apply_cascade_arguments(args)
+    incremental_extract.apply_arguments(args)
+    tracing.apply_trace_arguments(args)
 
-    orchestrate(args.url, model=args.model)
+    engine = get_engine(args.engine)
+    if args.url:
+        orchestrate(args.url, model=args.model, engine=engine)
+    else:
+        if args.batch:
+            urls = read_url_file(args.batch)
+            urls = urls[:args.limit] if args.limit else urls
+        else:
+            urls = query_agencies(engine.supabase, args.batch_query, days=args.days, limit=args.limit)
+        run_batch(urls, concurrency=args.concurrency, llm_concurrency=args.llm_concurrency,
+                  per_domain=args.per_domain, model=args.model, engine=engine)
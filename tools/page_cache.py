@@ -0,0 +1,284 @@
+"""
+page_cache.py — Content-addressed on-disk cache for scraped pages.
+
+Layout under the cache dir (default tools/.cache/pages):
+    index.db                 SQLite index: (url_key, kind) → blob hash, fetch time, last access, validators
+    blobs/ab/abcdef….gz      gzip-compressed content, named by sha256 of the content
+
+Entries are keyed by normalised URL plus a kind:
+    html       raw HTML fetched directly from the site
+    markdown   html2text conversion of that HTML (markdown-clean: after boilerplate.py stripping)
+    firecrawl  markdown returned by Firecrawl (re-using it saves a Firecrawl credit)
+    crawl      JSON list of subpages chosen for a start URL on its last crawl
+
+Identical content shared by several URLs/kinds is stored once. Entries younger than
+fresh_for are served as-is; older ones that carry an ETag/Last-Modified are revalidated by
+the scraper with a conditional request (a 304 refreshes the entry via touch()); entries
+without validators are refetched. Past the TTL get() only returns an entry with allow_stale
+(for revalidation); when the blobs exceed max_bytes the least recently used entries are
+evicted. Disable with --no-cache (or ATHOS_PAGE_CACHE=0), relocate with --cache-dir
+(or ATHOS_PAGE_CACHE_DIR, or ATHOS_CACHE_DIR for every cache); both flags are exported to the environment so tool subprocesses
+follow the parent's choice.
+
+Usage:
+    python page_cache.py --stats
+    python page_cache.py --clear
+"""
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from kv_cache import cache_dir as root_cache_dir
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pages")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+# Younger than this, an entry is served without touching the network. Older entries that
+# carry an ETag/Last-Modified are revalidated with a conditional GET; entries without
+# validators are refetched.
+DEFAULT_FRESH_SECONDS = 6 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_TRACKING_PARAMS = ("utm_", "gclid", "fbclid", "mc_cid", "mc_eid", "_hs")
+
+
+def normalize_cache_url(url: str) -> str:
+    """Cache key form of a URL: lowercase host without www/default port, no fragment,
+    no tracking params, sorted query, no trailing slash (except the root)."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not k.lower().startswith(_TRACKING_PARAMS)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+@dataclass
+class CachedPage:
+    url: str
+    kind: str
+    content: str
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    source: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def conditional_headers(self) -> dict:
+        """If-None-Match / If-Modified-Since for revalidating this entry (empty if it has no validators)."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    def __init__(self, cache_dir: str = DEFAULT_DIR, ttl: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, fresh_for: float = DEFAULT_FRESH_SECONDS):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.fresh_for = fresh_for
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url_key TEXT,
+                kind TEXT,
+                url TEXT,
+                blob TEXT,
+                size INTEGER,
+                fetched_at REAL,
+                accessed_at REAL,
+                etag TEXT,
+                last_modified TEXT,
+                source TEXT,
+                PRIMARY KEY (url_key, kind)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at_idx ON pages (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_blob_idx ON pages (blob)")
+        self._conn.commit()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", digest[:2], f"{digest}.gz")
+
+    def get(self, url: str, kind: str, max_age: Optional[float] = None, allow_stale: bool = False) -> Optional[CachedPage]:
+        """Fresh entry for (url, kind), or None. allow_stale returns expired entries too (for revalidation)."""
+        key = normalize_cache_url(url)
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob, fetched_at, etag, last_modified, source FROM pages WHERE url_key = ? AND kind = ?",
+                (key, kind)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            blob, fetched_at, etag, last_modified, source = row
+            expired = time.time() - fetched_at > max_age
+            if expired and not allow_stale:
+                self.stats["expired"] += 1
+                return None
+            try:
+                with gzip.open(self._blob_path(blob), "rt", encoding="utf-8") as f:
+                    content = f.read()
+            except OSError:
+                # Blob evicted or deleted underneath the index — drop the dangling row.
+                self._conn.execute("DELETE FROM pages WHERE url_key = ? AND kind = ?", (key, kind))
+                self._conn.commit()
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url_key = ? AND kind = ?",
+                               (time.time(), key, kind))
+            self._conn.commit()
+            self.stats["expired" if expired else "hits"] += 1
+        return CachedPage(url, kind, content, fetched_at, etag, last_modified, source)
+
+    def put(self, url: str, kind: str, content: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, source: Optional[str] = None) -> None:
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        size = os.path.getsize(path)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO pages (url_key, kind, url, blob, size, fetched_at, accessed_at, etag, last_modified, source)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (normalize_cache_url(url), kind, url, digest, size, now, now, etag, last_modified, source))
+            self._conn.commit()
+            self.stats["writes"] += 1
+            self._evict_locked()
+
+    def touch(self, url: str, kind: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Mark an entry as freshly fetched (e.g. after a 304) without rewriting its content."""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("""
+                UPDATE pages SET fetched_at = ?, accessed_at = ?,
+                    etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE url_key = ? AND kind = ?
+            """, (now, now, etag, last_modified, normalize_cache_url(url), kind))
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        # Blobs are shared, so count each distinct blob once.
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT blob, size FROM pages)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9  # evict a little extra so we don't do this on every write
+        for url_key, kind, blob in self._conn.execute(
+                "SELECT url_key, kind, blob FROM pages ORDER BY accessed_at ASC").fetchall():
+            self._conn.execute("DELETE FROM pages WHERE url_key = ? AND kind = ?", (url_key, kind))
+            self.stats["evictions"] += 1
+            if not self._conn.execute("SELECT 1 FROM pages WHERE blob = ? LIMIT 1", (blob,)).fetchone():
+                path = self._blob_path(blob)
+                try:
+                    total -= os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    pass
+            if total <= target:
+                break
+        self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            for (blob,) in self._conn.execute("SELECT DISTINCT blob FROM pages").fetchall():
+                try:
+                    os.remove(self._blob_path(blob))
+                except OSError:
+                    pass
+            self._conn.execute("DELETE FROM pages")
+            self._conn.commit()
+
+    def summary(self) -> dict:
+        with self._lock:
+            entries, blobs, size = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT blob), "
+                "(SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT blob, size FROM pages)) FROM pages").fetchone()
+            by_kind = dict(self._conn.execute("SELECT kind, COUNT(*) FROM pages GROUP BY kind").fetchall())
+        return {"dir": self.cache_dir, "entries": entries, "blobs": blobs, "bytes": size,
+                "max_bytes": self.max_bytes, "by_kind": by_kind, **self.stats}
+
+
+# --- Process-wide instance ---------------------------------------------------------------
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[PageCache]:
+    """Shared PageCache for this process, or None when caching is disabled."""
+    global _cache
+    if os.getenv("ATHOS_PAGE_CACHE", "1") == "0":
+        return None
+    cache_dir = os.getenv("ATHOS_PAGE_CACHE_DIR") or os.path.join(root_cache_dir(), "pages")
+    with _cache_lock:
+        if _cache is None or _cache.cache_dir != cache_dir:
+            _cache = PageCache(cache_dir)
+        return _cache
+
+
+def configure(cache_dir: Optional[str] = None, enabled: bool = True) -> None:
+    """Apply --cache-dir / --no-cache. Exported via the environment so subprocess tools inherit it."""
+    if cache_dir:
+        os.environ["ATHOS_PAGE_CACHE_DIR"] = os.path.abspath(cache_dir)
+    if not enabled:
+        os.environ["ATHOS_PAGE_CACHE"] = "0"
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cache-dir", help=f"Page cache directory (default {DEFAULT_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch pages from the network")
+
+
+def apply_cache_arguments(args) -> None:
+    configure(cache_dir=args.cache_dir, enabled=not args.no_cache)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the scraped page cache.")
+    parser.add_argument("--cache-dir", help=f"Page cache directory (default {DEFAULT_DIR})")
+    parser.add_argument("--stats", action="store_true", help="Show entry counts and size")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached page")
+    args = parser.parse_args()
+
+    cache = PageCache(args.cache_dir or os.getenv("ATHOS_PAGE_CACHE_DIR") or os.path.join(root_cache_dir(), "pages"))
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.cache_dir}")
+    elif args.stats:
+        s = cache.summary()
+        print(f"Page cache: {s['dir']}")
+        print(f"  Entries: {s['entries']} ({', '.join(f'{k}: {v}' for k, v in s['by_kind'].items()) or 'empty'})")
+        print(f"  Blobs:   {s['blobs']}  ({s['bytes'] / 1024 / 1024:.1f} MB of {s['max_bytes'] / 1024 / 1024:.0f} MB)")
+    else:
+        parser.print_help()
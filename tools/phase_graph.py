@@ -0,0 +1,150 @@
+"""Dependency graph of pipeline phases.
+
+Each phase declares the phases it needs; a phase starts as soon as all of its
+dependencies have finished, so independent branches (e.g. growth monitoring and
+group enrichment, which only need the agency name) run concurrently.
+
+A phase function receives {dependency_name: value} and returns its own value.
+- raise PhaseAbort(status) to stop the run cleanly (e.g. "unchanged"): every
+  phase not yet started is skipped and run() reports that status.
+- any other exception fails the phase; dependents are skipped unless the phase
+  was added with optional=True, in which case dependents see its value as None.
+"""
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class PhaseAbort(Exception):
+    """Stop the pipeline without treating it as a crash. `status` becomes the run status."""
+
+    def __init__(self, status: str, message: str = ""):
+        super().__init__(message or status)
+        self.status = status
+
+
+@dataclass
+class PhaseResult:
+    name: str
+    value: Any = None
+    start: float = 0.0  # time.monotonic()
+    end: float = 0.0
+    ok: bool = False
+    skipped: bool = False
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.end - self.start)
+
+
+@dataclass
+class _Phase:
+    name: str
+    fn: Callable[[Dict[str, Any]], Any]
+    deps: Tuple[str, ...]
+    optional: bool
+
+
+class PhaseGraph:
+    def __init__(self):
+        self._phases: Dict[str, _Phase] = {}
+        self.results: Dict[str, PhaseResult] = {}
+        self.status: Optional[str] = None
+        self.wall_seconds = 0.0
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Any], deps=(), optional: bool = False):
+        missing = [d for d in deps if d not in self._phases]
+        if missing:
+            raise ValueError(f"Phase '{name}' depends on unknown phase(s): {missing}")
+        self._phases[name] = _Phase(name, fn, tuple(deps), optional)
+        return self
+
+    def _execute(self, phase: _Phase, inputs: Dict[str, Any]) -> PhaseResult:
+        result = PhaseResult(phase.name, start=time.monotonic())
+        try:
+            result.value = phase.fn(inputs)
+            result.ok = True
+        except PhaseAbort:
+            raise
+        except Exception as e:
+            result.error = str(e)
+            logging.error(f"Phase '{phase.name}' failed{' (non-fatal)' if phase.optional else ''}: {e}")
+        finally:
+            result.end = time.monotonic()
+        return result
+
+    def _ready(self, phase: _Phase) -> bool:
+        return all(d in self.results for d in phase.deps)
+
+    def _blocked(self, phase: _Phase) -> bool:
+        for d in phase.deps:
+            dep = self.results.get(d)
+            if dep is not None and not dep.ok and not (self._phases[d].optional and not dep.skipped):
+                return True
+        return False
+
+    def run(self, max_workers: int = 4) -> Optional[str]:
+        """Run every phase respecting dependencies. Returns the PhaseAbort status, or None if not aborted."""
+        started = time.monotonic()
+        pending = dict(self._phases)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="phase") as pool:
+            while pending or running:
+                for name, phase in list(pending.items()):
+                    if self.status is not None or self._blocked(phase):
+                        now = time.monotonic()
+                        self.results[name] = PhaseResult(name, start=now, end=now, skipped=True)
+                        del pending[name]
+                    elif self._ready(phase):
+                        inputs = {d: self.results[d].value for d in phase.deps}
+                        # Each phase runs in a copy of the caller's context so trace state set
+                        # inside one branch (tracing.set_parent) does not leak into another.
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, self._execute, phase, inputs)] = name
+                        del pending[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except PhaseAbort as abort:
+                        now = time.monotonic()
+                        self.results[name] = PhaseResult(name, start=now, end=now, error=str(abort))
+                        if self.status is None:
+                            self.status = abort.status
+        self.wall_seconds = time.monotonic() - started
+        return self.status
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """Longest chain of dependent phase durations — the latency no amount of parallelism removes."""
+        best: Dict[str, Tuple[float, List[str]]] = {}
+        for name, phase in self._phases.items():  # insertion order is a topological order
+            own = self.results[name].duration if name in self.results else 0.0
+            prev = max((best[d] for d in phase.deps), key=lambda b: b[0], default=(0.0, []))
+            best[name] = (prev[0] + own, prev[1] + [name])
+        if not best:
+            return [], 0.0
+        seconds, path = max(best.values(), key=lambda b: b[0])
+        return path, seconds
+
+    def serial_seconds(self) -> float:
+        """What the same phases would have taken run one after another."""
+        return sum(r.duration for r in self.results.values())
+
+    def timing_report(self) -> dict:
+        path, crit = self.critical_path()
+        serial = self.serial_seconds()
+        return {
+            "wall_s": round(self.wall_seconds, 3),
+            "serial_s": round(serial, 3),
+            "critical_path": path,
+            "critical_path_s": round(crit, 3),
+            "saved_s": round(max(0.0, serial - self.wall_seconds), 3),
+            "phases": {n: round(r.duration, 3) for n, r in self.results.items() if not r.skipped},
+        }
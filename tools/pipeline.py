@@ -0,0 +1,203 @@
+"""
+pipeline.py — Execution engines for the B.L.A.S.T. phases run by orchestrator.py.
+
+InProcessEngine calls the tool functions directly and shares one LLM client and one
+Supabase client across every phase of every run. SubprocessEngine is the original
+one-interpreter-per-phase behaviour (JSON over stdin/stdout), kept for isolation and
+as the baseline for bench_pipeline.py.
+
+Both engines expose the same methods and return plain dicts (or None on failure), so
+orchestrator._run_pipeline does not care which one it is driving.
+"""
+import os
+import sys
+import json
+import logging
+import subprocess
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import tracing
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_tool(script_name, input_data=None, args=None):
+    """
+    Runs a tool script as a subprocess.
+    """
+    tool_path = os.path.join(TOOLS_DIR, script_name)
+    cmd = [sys.executable, tool_path]
+
+    if args:
+        cmd.extend(args)
+
+    logging.info(f"Running tool: {script_name} with args: {args}")
+    env = tracing.child_env()
+
+    try:
+        if input_data:
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+            stdout, stderr = process.communicate(input=input_data)
+        else:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+            stdout, stderr = process.communicate()
+
+        if process.returncode != 0:
+            logging.error(f"Tool {script_name} failed with code {process.returncode}")
+            logging.error(f"Stderr: {stderr}")
+            return None
+
+        return stdout.strip()
+
+    except Exception as e:
+        logging.error(f"Failed to execute {script_name}: {e}")
+        return None
+
+
+def _parse_tool_output(script_name, raw):
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        logging.error(f"Invalid JSON from {script_name}: {raw}")
+        return None
+
+
+class _Engine:
+    """Clients the orchestrator itself needs (hash lookups, sibling ingestion), built once per engine."""
+
+    def __init__(self):
+        self._supabase = None
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            from supabase import create_client
+            url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+            self._supabase = create_client(url, key) if (url and key) else None
+        return self._supabase
+
+
+class SubprocessEngine(_Engine):
+    """One fresh interpreter per phase. Every phase re-imports its dependencies and builds its own clients."""
+
+    name = "subprocess"
+
+    def scrape(self, url: str, run_id: str, model: Optional[str] = None):
+        args = ["--url", url, "--run-id", run_id]
+        if model:
+            args += ["--model", model]
+        return _parse_tool_output("scrape_agency.py", run_tool("scrape_agency.py", args=args))
+
+    def extract(self, markdown: str, url: str, run_id: str, model: Optional[str] = None):
+        args = ["--url", url, "--run-id", run_id]
+        if model:
+            args += ["--model", model]
+        return _parse_tool_output("extract_insights.py", run_tool("extract_insights.py", input_data=markdown, args=args))
+
+    def extract_fields(self, markdown: str, url: str, fields, run_id: str, model: Optional[str] = None):
+        args = ["--url", url, "--run-id", run_id, "--fields", ",".join(fields)]
+        if model:
+            args += ["--model", model]
+        return _parse_tool_output("extract_insights.py", run_tool("extract_insights.py", input_data=markdown, args=args))
+
+    def monitor(self, agency_name: str, run_id: str):
+        return _parse_tool_output("monitor_growth.py",
+                                  run_tool("monitor_growth.py", args=["--agency", agency_name, "--run-id", run_id]))
+
+    def store(self, data: dict):
+        return _parse_tool_output("store_data.py", run_tool("store_data.py", input_data=json.dumps(data)))
+
+    def score(self, agency_id: str):
+        return _parse_tool_output("score_leads.py", run_tool("score_leads.py", args=["--id", agency_id]))
+
+    def group_enricher(self):
+        # Group enrichment has always run in the orchestrator's own process.
+        from enrich_group import GroupEnricher
+        return GroupEnricher()
+
+
+class InProcessEngine(_Engine):
+    """Library-mode phases. Clients are built once, on first use, and shared by every run on this engine."""
+
+    name = "in-process"
+
+    def __init__(self):
+        super().__init__()
+        self._llm = None
+        self._store_batcher = None
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from llm_gateway import default_client
+            self._llm = default_client()
+        return self._llm
+
+    def scrape(self, url: str, run_id: str, model: Optional[str] = None):
+        from scrape_agency import scrape_agency_crawler
+        return scrape_agency_crawler(url, run_id=run_id, model=model)
+
+    def extract(self, markdown: str, url: str, run_id: str, model: Optional[str] = None):
+        from extract_insights import extract_insights
+        return extract_insights(markdown, url, run_id=run_id, model=model, client=self.llm)
+
+    def extract_fields(self, markdown: str, url: str, fields, run_id: str, model: Optional[str] = None):
+        from extract_insights import extract_fields, DEFAULT_MODEL, INCREMENTAL_TASK, INCREMENTAL_CONTEXT
+        return extract_fields(markdown, url, list(fields), model or DEFAULT_MODEL, run_id=run_id, client=self.llm,
+                              task=INCREMENTAL_TASK, context=INCREMENTAL_CONTEXT)
+
+    def monitor(self, agency_name: str, run_id: str):
+        from monitor_growth import GrowthMonitor, HAS_DDGS
+        if not HAS_DDGS:
+            logging.warning("duckduckgo-search not installed. pip install duckduckgo-search")
+            return None
+        monitor = GrowthMonitor(client=self.llm)
+        results = monitor.fetch_signals(agency_name)
+        return monitor.analyze_signals(results, agency_name, run_id=run_id)
+
+    def store(self, data: dict):
+        from store_data import store_data, build_payload
+        if self._store_batcher is None:
+            return store_data(data, supabase=self.supabase)
+        if self.supabase is None:
+            return {"error": "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY"}
+        # Enrichment and scoring run in the caller's thread; only the write is pooled.
+        return self._store_batcher.submit(build_payload(data))
+
+    def configure_store_batching(self, max_wait: float = 2.0, max_items: int = 100) -> None:
+        """Pool store() calls from concurrent pipelines into multi-row upserts (batch_runner).
+        Each call is held for up to `max_wait` seconds while others join the write. Undo with stop_store_batching()."""
+        from microbatch import MicroBatcher
+        from store_data import upsert_payloads
+        self._store_batcher = MicroBatcher(lambda payloads: upsert_payloads(payloads, self.supabase),
+                                           max_items=max_items, max_wait=max_wait)
+
+    def stop_store_batching(self) -> Optional[dict]:
+        """Back to one upsert per store(). Returns the batcher's final stats."""
+        stats = self.store_batching_stats()
+        self._store_batcher = None
+        return stats
+
+    def store_batching_stats(self) -> Optional[dict]:
+        return dict(self._store_batcher.stats) if self._store_batcher is not None else None
+
+    def score(self, agency_id: str):
+        from score_leads import score_leads
+        return score_leads(agency_id=agency_id, supabase=self.supabase)
+
+    def group_enricher(self):
+        from enrich_group import GroupEnricher
+        return GroupEnricher(client=self.llm)
+
+
+ENGINES = {
+    "in-process": InProcessEngine,
+    "subprocess": SubprocessEngine,
+}
+
+
+def get_engine(name: str = "in-process"):
+    return ENGINES[name]()
@@ -1,17 +1,12 @@
-
 import os
-import json
-import time
 import sys
+import argparse
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
 # Import our tools
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from scrape_agency import scrape_agency_crawler, scrape_url, find_subpages, extract_with_llm
-# We need to monkeytype hack or refactor scrape_agency to return object instead of print
-# Actually, let's just use subprocess for safety, or refactor scrape_agency to be importable.
-# I'll modify scrape_agency to have a helper that returns the dict.
+from batch_runner import add_batch_arguments, run_batch
 
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
@@ -30,42 +25,19 @@ def get_all_agencies():
     # Access data using the .data attribute on the response object
     return [row['website'] for row in response.data if row.get('website')]
 
-def run_refresh():
+def run_refresh(concurrency: int = 4, llm_concurrency: int = 8, per_domain: int = 3):
     print("--- 🔄 Starting Batch Refresh of All Agencies ---")
     websites = get_all_agencies()
     print(f"Found {len(websites)} agencies in database.")
-    
-    for i, url in enumerate(websites):
-        print(f"\n[{i+1}/{len(websites)}] Processing: {url}")
-        
-        # We will use subprocess to run the tool exactly as the CLI does, 
-        # to ensure environment and piping works identical to 'manual' run.
-        # This is robust.
-        cmd = f"python3 tools/scrape_agency.py --url {url} > temp_batch.json"
-        exit_code = os.system(cmd)
-        
-        if exit_code == 0:
-            # Check if temp_batch.json has content
-            try:
-                with open("temp_batch.json", "r") as f:
-                    content = f.read()
-                    if content.strip():
-                        # Run extract_insights then store_data (B.L.A.S.T pipeline)
-                        cmd_extract = f"cat temp_batch.json | python3 tools/extract_insights.py --url {url} | python3 tools/store_data.py"
-                        os.system(cmd_extract)
-                        print(f"✅ Updated {url}")
-                    else:
-                        print(f"⚠️  No output for {url}")
-            except Exception as e:
-                print(f"❌ Error reading output: {e}")
-        else:
-            print(f"❌ Scraper failed for {url}")
-            
-        time.sleep(2) # Politeness delay
-        
+
+    # Scrape → extract → store (and enrich/score) for every site, several at a time.
+    # Politeness is enforced per domain by throttle.host_slot instead of a fixed sleep.
+    run_batch(websites, concurrency=concurrency, llm_concurrency=llm_concurrency, per_domain=per_domain)
+
     print("\n--- ✨ Batch Refresh Complete ---")
-    if os.path.exists("temp_batch.json"):
-        os.remove("temp_batch.json")
 
 if __name__ == "__main__":
-    run_refresh()
+    parser = argparse.ArgumentParser(description="Refresh every agency in the database.")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    run_refresh(concurrency=args.concurrency, llm_concurrency=args.llm_concurrency, per_domain=args.per_domain)
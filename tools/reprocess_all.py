@@ -1,13 +1,13 @@
 
 import os
 import sys
-import json
-import subprocess
+import argparse
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
 # Add tools directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from batch_runner import add_batch_arguments, run_batch
 
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
@@ -15,26 +15,11 @@ load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file_
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-def run_orchestrator(agency_name, url):
-    print(f"\\n--- Processing: {agency_name} ({url}) ---")
-    try:
-        # Construct command: python tools/orchestrator.py --url <url>
-        cmd = [sys.executable, "tools/orchestrator.py", "--url", url]
-        
-        # Run process
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(f"✅ Success for {agency_name}")
-            # print(result.stdout) # Optional: print stdout
-        else:
-            print(f"❌ Failed for {agency_name}")
-            print(f"Error: {result.stderr}")
-            
-    except Exception as e:
-        print(f"❌ Exception for {agency_name}: {str(e)}")
-
 def main():
+    parser = argparse.ArgumentParser(description="Re-run the full pipeline for every agency.")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
     if not SUPABASE_URL or not SUPABASE_KEY:
         print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
         return
@@ -49,15 +34,15 @@ def main():
         
         print(f"Found {len(agencies)} agencies. Starting batch processing...")
         
+        websites = []
         for agency in agencies:
-            name = agency.get("name")
-            website = agency.get("website")
-            
-            if website:
-                run_orchestrator(name, website)
+            if agency.get("website"):
+                websites.append(agency["website"])
             else:
-                print(f"Skipping {name} (No website)")
-                
+                print(f"Skipping {agency.get('name')} (No website)")
+
+        run_batch(websites, concurrency=args.concurrency, llm_concurrency=args.llm_concurrency,
+                  per_domain=args.per_domain)
         print("\\n✅ Batch processing complete.")
         
     except Exception as e:
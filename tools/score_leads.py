@@ -77,7 +77,7 @@ def calculate_score(agency: Dict) -> Dict:
     has_pm = False
     pm_keywords = ["partnership", "partner", "alliances"]
     for d in directors:
-        role = d.get("role", "").lower()
+        role = (d.get("role") or "").lower()
         if any(kw in role for kw in pm_keywords):
             has_pm = True
             break
@@ -108,19 +108,96 @@ def calculate_score(agency: Dict) -> Dict:
         "breakdown": breakdown
     }
 
-def score_leads(agency_id: Optional[str] = None, dry_run: bool = False):
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print(json.dumps({"error": "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY"}))
-        return
+# Columns calculate_score reads, plus what score_all needs to page, compare and write back.
+# recent_news is not an agencies column, so stored rows never earn the news points.
+SCORE_COLUMNS = ("id", "name", "revenue_estimate", "growth_signals", "directors",
+                 "competitor_partnerships", "is_group_member", "lead_score", "score_breakdown")
+PAGE_SIZE = 1000
+# Ids per update().in_() — they travel in the URL, so keep the filter well under request-line limits.
+WRITE_CHUNK_SIZE = 200
+PM_KEYWORDS = ("partnership", "partner", "alliances")
+
+
+def score_columns(columns: Dict[str, list]) -> Dict[str, list]:
+    """calculate_score over whole columns at once (one list per SCORE_COLUMNS entry, same length).
+    Returns {"score": [...], "breakdown": [...]} in row order."""
+    # Revenue strings are a handful of ranges — parse each distinct one once.
+    parsed = {}
+    for value in columns["revenue_estimate"]:
+        if value not in parsed:
+            parsed[value] = parse_revenue(value)
+    revenue = [30 if r >= 50_000_000 else 20 if r >= 10_000_000 else 10 if r >= 1_000_000 else 0
+               for r in (parsed[v] for v in columns["revenue_estimate"])]
+
+    hiring = [sum(1 for s in signals or () if isinstance(s, dict) and s.get("type") == "hiring")
+              for signals in columns["growth_signals"]]
+    growth = [15 if h >= 5 else 5 if h > 0 else 0 for h in hiring]
+
+    alignment = [20 if any(kw in (d.get("role") or "").lower() for d in directors or () for kw in PM_KEYWORDS) else 0
+                 for directors in columns["directors"]]
+
+    competitors = [len(c or ()) for c in columns["competitor_partnerships"]]
+    competition = [20 if c == 0 else 10 if c <= 2 else 0 for c in competitors]
+
+    group_bonus = [10 if g else 0 for g in columns["is_group_member"]]
+
+    breakdowns = [{"revenue": r, "growth": g, "alignment": a, "competition": c, "group_bonus": b}
+                  for r, g, a, c, b in zip(revenue, growth, alignment, competition, group_bonus)]
+    scores = [min(r + g + a + c + b, 100) for r, g, a, c, b in zip(revenue, growth, alignment, competition, group_bonus)]
+    return {"score": scores, "breakdown": breakdowns}
+
+
+def iter_pages(supabase: Client, page_size: int = PAGE_SIZE):
+    """SCORE_COLUMNS of every agency, `page_size` rows at a time, keyset-paginated on id."""
+    last_id = None
+    while True:
+        query = supabase.table("agencies").select(", ".join(SCORE_COLUMNS)).order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def score_all(dry_run: bool = False, supabase: Optional[Client] = None, page_size: int = PAGE_SIZE,
+              chunk_size: int = WRITE_CHUNK_SIZE) -> dict:
+    """Scores the whole agencies table page by page and writes back only the rows whose
+    lead_score or score_breakdown changed: one update().in_("id", ...) per distinct score and
+    breakdown, so the write touches nothing but those two columns and can't insert a row."""
+    results, writes, changed_total = [], 0, 0
+    for rows in iter_pages(supabase, page_size):
+        scored = score_columns({column: [row.get(column) for row in rows] for column in SCORE_COLUMNS})
+        changed: Dict[tuple, List[str]] = {}
+        for row, score, breakdown in zip(rows, scored["score"], scored["breakdown"]):
+            results.append({"id": row["id"], "name": row.get("name"), "score": score, "breakdown": breakdown})
+            if row.get("lead_score") != score or row.get("score_breakdown") != breakdown:
+                changed.setdefault((score, json.dumps(breakdown, sort_keys=True)), []).append(row["id"])
+                changed_total += 1
+        if dry_run:
+            continue
+        for (score, breakdown), ids in changed.items():
+            values = {"lead_score": score, "score_breakdown": json.loads(breakdown)}
+            for start in range(0, len(ids), chunk_size):
+                supabase.table("agencies").update(values).in_("id", ids[start:start + chunk_size]).execute()
+                writes += 1
+    return {"success": True, "results": results, "changed": changed_total, "writes": writes}
+
+
+def score_leads(agency_id: Optional[str] = None, dry_run: bool = False, supabase: Optional[Client] = None) -> dict:
+    """Scores one agency (or all, via score_all) and writes lead_score/score_breakdown back unless dry_run."""
+    if supabase is None and (not SUPABASE_URL or not SUPABASE_KEY):
+        return {"error": "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY"}
 
     try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        if supabase is None:
+            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        if not agency_id:
+            return score_all(dry_run=dry_run, supabase=supabase)
         
-        query = supabase.table("agencies").select("*")
-        if agency_id:
-            query = query.eq("id", agency_id)
-        
-        response = query.execute()
+        response = supabase.table("agencies").select(", ".join(SCORE_COLUMNS)).eq("id", agency_id).execute()
         agencies = response.data
 
         results = []
@@ -139,10 +216,10 @@ def score_leads(agency_id: Optional[str] = None, dry_run: bool = False):
                     "score_breakdown": scoring["breakdown"]
                 }).eq("id", agency["id"]).execute()
 
-        print(json.dumps({"success": True, "results": results}))
+        return {"success": True, "results": results}
 
     except Exception as e:
-        print(json.dumps({"success": False, "error": str(e)}))
+        return {"success": False, "error": str(e)}
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Calculate lead scores for agencies.")
@@ -150,4 +227,4 @@ if __name__ == "__main__":
     parser.add_argument("--dry-run", action="store_true", help="Calculate but don't update DB")
     args = parser.parse_args()
     
-    score_leads(agency_id=args.id, dry_run=args.dry_run)
+    print(json.dumps(score_leads(agency_id=args.id, dry_run=args.dry_run)))
@@ -1,15 +1,20 @@
 
 import os
 import sys
-import re
 import argparse
 import requests
 import json
-import time
-from urllib.parse import urljoin, urlparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import Optional
-from cost_manager import CostManager
+import llm_gateway
+import link_classifier
+import content_packer
+import boilerplate
+from cost_manager import get_cost_manager
+import throttle
+import page_cache
 
 # Load .env explicitly
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
@@ -17,58 +22,161 @@ load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file_
 FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-TEAM_PAGE_PATTERN = re.compile(
-    r'/(?:about|team|people|who-we-are|our-team|about-us|meet-the-team|leadership|staff|founders)(?:[/?#]|$)',
-    re.IGNORECASE,
-)
-
 def find_team_pages(html: str, base_url: str) -> list:
-    """Extract About/Team page URLs from raw HTML using link patterns."""
-    base_domain = urlparse(base_url).netloc
-    hrefs = re.findall(r'href=["\']([^"\'#?][^"\']*)["\']', html)
-    seen, results = set(), []
-    for href in hrefs:
-        full_url = urljoin(base_url, href).split('#')[0].split('?')[0]
-        if urlparse(full_url).netloc != base_domain:
-            continue
-        if TEAM_PAGE_PATTERN.search(full_url) and full_url not in seen:
-            seen.add(full_url)
-            results.append(full_url)
-    return results[:2]  # max 2 subpages
+    """Extract About/Team page URLs from raw HTML with the heuristic link classifier."""
+    links = link_classifier.classify_links(html, base_url)
+    team_links = {t: links[t] for t in ("about", "team") if t in links}
+    return link_classifier.confident_urls(team_links)[:2]  # max 2 subpages
 
 
-def scrape_markdown_with_subpages(url: str) -> dict:
-    """Fetch homepage + About/Team subpages and return combined markdown."""
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; AthosBot/1.0)"}
+
+# One keep-alive connection pool for every site fetch and Firecrawl call in this process.
+# Politeness is throttle.host_slot's job (per-host concurrency + minimum gap), not sleeps.
+_session = None
+_session_lock = threading.Lock()
+# Leaf tasks only (a fetch never submits another), so sharing one pool across pipelines can't deadlock.
+_fetch_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="fetch")
+# Validator HEADs sent alongside a cold Firecrawl scrape (kept apart from _fetch_pool, whose tasks wait on them).
+_probe_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="probe")
+
+
+def http_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=64, pool_maxsize=16)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def fetch_concurrently(fn, urls: list) -> list:
+    """[fn(url) for url in urls], run on the shared fetch pool; results keep the input order."""
+    if len(urls) <= 1:
+        return [fn(u) for u in urls]
+    return list(_fetch_pool.map(fn, urls))
+
+# How a page was obtained. "hit" and "not_modified" mean the content is what we already had.
+FETCH_HIT = "hit"                    # served from the page cache, no request made
+FETCH_NOT_MODIFIED = "not_modified"  # conditional request answered 304
+FETCH_CHANGED = "changed"            # conditional request answered 200 with new content
+FETCH_NEW = "fetched"                # nothing cached (or no validators) — plain download
+UNCHANGED = (FETCH_HIT, FETCH_NOT_MODIFIED)
+
+# Cache kind for converted pages. Boilerplate-stripped output is stored apart from the plain
+# html2text conversions cached before stripping existed (and from runs with stripping disabled).
+MARKDOWN_KIND = "markdown-clean" if boilerplate.enabled() else "markdown"
+
+
+def _validators(resp) -> dict:
+    return {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+
+def _cached_or_conditional(cache, entry) -> tuple:
+    """Decide what to do with a cached entry: (serve_it, conditional_headers).
+    Past fresh_for an entry is revalidated if it has validators and refetched if it hasn't."""
+    if entry is None:
+        return False, {}
+    if entry.age < cache.fresh_for:
+        return True, {}
+    return False, entry.conditional_headers()
+
+
+def _head(url: str, conditional: Optional[dict] = None):
+    with throttle.host_slot(url):
+        return http_session().head(url, headers={**HEADERS, **(conditional or {})}, timeout=15, allow_redirects=True)
+
+
+def _probed_validators(probe) -> dict:
     try:
-        import html2text
-    except ImportError:
-        return {"error": "html2text not installed. Run: pip3 install html2text"}
+        head = probe.result(timeout=15)
+        return _validators(head) if head.ok else {}
+    except Exception:
+        return {}
 
-    headers = {"User-Agent": "Mozilla/5.0 (compatible; AthosBot/1.0)"}
+
+def fetch_html(url: str) -> tuple:
+    """GET a page's HTML through the page cache. Returns (html, fetch) where fetch is one of the
+    FETCH_* states; stale entries with an ETag/Last-Modified are revalidated with a conditional GET.
+    Raises on HTTP errors."""
+    cache = page_cache.get_cache()
+    entry = cache.get(url, "html", allow_stale=True) if cache else None
+    serve, conditional = _cached_or_conditional(cache, entry)
+    if serve:
+        sys.stderr.write(f"[cache] html hit {url}\n")
+        return entry.content, FETCH_HIT
+    with throttle.host_slot(url):
+        resp = http_session().get(url, headers={**HEADERS, **conditional}, timeout=30, allow_redirects=True)
+    if resp.status_code == 304 and entry:
+        sys.stderr.write(f"[cache] html not modified {url}\n")
+        cache.touch(url, "html", **_validators(resp))
+        cache.touch(url, MARKDOWN_KIND)
+        return entry.content, FETCH_NOT_MODIFIED
+    resp.raise_for_status()
+    if cache:
+        cache.put(url, "html", resp.text, source="requests", **_validators(resp))
+    return resp.text, FETCH_CHANGED if conditional else FETCH_NEW
+
+
+def convert_html(html: str, strip: bool = True) -> str:
+    """html2text conversion, with boilerplate regions and repeated blocks removed first unless strip=False."""
+    import html2text
     h = html2text.HTML2Text()
     h.ignore_links = False
     h.ignore_images = True
     h.body_width = 0
+    if not strip:
+        return h.handle(html)
+    return boilerplate.dedupe_blocks(h.handle(boilerplate.strip_boilerplate(html).html))
+
 
+def html_to_markdown(url: str, html: str, fetch: str = FETCH_NEW) -> str:
+    """html2text conversion, reusing the cached conversion when the HTML is unchanged (cache hit or 304)."""
+    cache = page_cache.get_cache()
+    if cache and fetch in UNCHANGED:
+        hit = cache.get(url, MARKDOWN_KIND)
+        if hit:
+            return hit.content
+    strip = boilerplate.enabled()
+    markdown = convert_html(html, strip=strip)
+    if strip:
+        sys.stderr.write(f"[clean] {url}: html {len(html):,} chars → markdown {len(markdown):,} chars, "
+                         f"~{content_packer.count_tokens(markdown):,} tokens\n")
+    if cache:
+        cache.put(url, MARKDOWN_KIND, markdown, source="html2text")
+    return markdown
+
+
+def scrape_markdown_with_subpages(url: str) -> dict:
+    """Fetch homepage + About/Team subpages and return combined markdown."""
     try:
-        resp = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-        resp.raise_for_status()
+        import html2text
+    except ImportError:
+        return {"error": "html2text not installed. Run: pip3 install html2text"}
+
+    try:
+        home_html, fetch = fetch_html(url)
     except Exception as e:
         return {"error": f"Failed to fetch {url}: {str(e)}"}
 
-    home_html = resp.text
-    combined = f"--- SOURCE: HOMEPAGE ({url}) ---\n{h.handle(home_html)}\n"
+    combined = f"--- SOURCE: HOMEPAGE ({url}) ---\n{html_to_markdown(url, home_html, fetch)}\n"
 
     subpages = find_team_pages(home_html, url)
-    for sub_url in subpages:
+
+    def _fetch_sub(sub_url):
         sys.stderr.write(f"[fallback] fetching subpage: {sub_url}\n")
         try:
-            sub = requests.get(sub_url, headers=headers, timeout=30, allow_redirects=True)
-            sub.raise_for_status()
-            combined += f"\n\n--- SOURCE: SUBPAGE ({sub_url}) ---\n{h.handle(sub.text)}\n"
-            time.sleep(0.5)
+            sub_html, sub_fetch = fetch_html(sub_url)
+            return html_to_markdown(sub_url, sub_html, sub_fetch)
         except Exception as e:
             sys.stderr.write(f"[fallback] skipping {sub_url}: {e}\n")
+            return None
+
+    for sub_url, sub_markdown in zip(subpages, fetch_concurrently(_fetch_sub, subpages)):
+        if sub_markdown is not None:
+            combined += f"\n\n--- SOURCE: SUBPAGE ({sub_url}) ---\n{sub_markdown}\n"
 
     sys.stderr.write(f"[fallback] scraped {url} + {len(subpages)} subpage(s) ({len(combined)} chars)\n")
     return {"markdown": combined, "url": url}
@@ -81,23 +189,45 @@ def scrape_url_fallback(url: str) -> dict:
     except ImportError:
         return {"error": "html2text not installed. Run: pip3 install html2text"}
     try:
-        headers = {"User-Agent": "Mozilla/5.0 (compatible; AthosBot/1.0)"}
-        resp = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-        resp.raise_for_status()
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = True
-        h.body_width = 0
-        markdown = h.handle(resp.text)
-        sys.stderr.write(f"[fallback] scraped {url} ({len(markdown)} chars)\n")
-        return {"markdown": markdown, "url": url}
+        html, fetch = fetch_html(url)
+        markdown = html_to_markdown(url, html, fetch)
+        sys.stderr.write(f"[fallback] scraped {url} ({len(markdown)} chars, {fetch})\n")
+        # Raw HTML rides along (in-process only) so link discovery still sees the stripped nav.
+        return {"markdown": markdown, "url": url, "fetch": fetch, "html": html}
     except Exception as e:
         return {"error": f"Fallback scrape failed: {str(e)}"}
 
 
 def scrape_url(url: str):
-    """Scrapes a single URL using Firecrawl, falling back to html2text on failure."""
+    """Scrapes a single URL using Firecrawl, falling back to html2text on failure.
+    Firecrawl results are page-cached too, so re-runs within the TTL spend no credits, and
+    stale ones are revalidated with a conditional HEAD against the site before paying again.
+    Otherwise the site's validators are read with a HEAD sent alongside the Firecrawl call."""
     if FIRECRAWL_API_KEY:
+        cache = page_cache.get_cache()
+        entry = cache.get(url, "firecrawl", allow_stale=True) if cache else None
+        serve, conditional = _cached_or_conditional(cache, entry)
+        if serve:
+            sys.stderr.write(f"[cache] firecrawl hit {url}\n")
+            return {"markdown": entry.content, "url": url, "fetch": FETCH_HIT}
+
+        # Firecrawl doesn't expose the site's validators, so ask the site directly: first when a
+        # 304 can save the credit, otherwise in parallel with the scrape.
+        validators, probe = {}, None
+        if conditional:
+            try:
+                head = _head(url, conditional)
+                if head.status_code == 304:
+                    sys.stderr.write(f"[cache] firecrawl not modified {url}\n")
+                    cache.touch(url, "firecrawl", **_validators(head))
+                    return {"markdown": entry.content, "url": url, "fetch": FETCH_NOT_MODIFIED}
+                if head.ok:
+                    validators = _validators(head)
+            except requests.RequestException:
+                pass
+        elif cache:
+            probe = _probe_pool.submit(_head, url)
+
         api_url = "https://api.firecrawl.dev/v0/scrape"
         headers = {
             "Authorization": f"Bearer {FIRECRAWL_API_KEY}",
@@ -108,11 +238,18 @@ def scrape_url(url: str):
             "pageOptions": {"onlyMainContent": True}
         }
         try:
-            response = requests.post(api_url, json=payload, headers=headers, timeout=60)
+            # Firecrawl fetches the target site for us, so politeness is keyed on the target host.
+            with throttle.host_slot(url):
+                response = http_session().post(api_url, json=payload, headers=headers, timeout=60)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('success'):
-                    return {"markdown": data.get('data', {}).get('markdown', ''), "url": url}
+                    markdown = data.get('data', {}).get('markdown', '')
+                    if cache and markdown:
+                        if probe is not None:
+                            validators = _probed_validators(probe)
+                        cache.put(url, "firecrawl", markdown, source="firecrawl", **validators)
+                    return {"markdown": markdown, "url": url, "fetch": FETCH_CHANGED if conditional else FETCH_NEW}
             sys.stderr.write(f"[firecrawl] failed ({response.status_code}), using fallback\n")
         except Exception as e:
             sys.stderr.write(f"[firecrawl] exception ({e}), using fallback\n")
@@ -121,18 +258,24 @@ def scrape_url(url: str):
 
     return scrape_url_fallback(url)
 
-def find_subpages(home_markdown, base_url, run_id: Optional[str] = None, model: Optional[str] = None):
-    """Uses LLM to find About/Team/Partners links in the homepage markdown."""
-    api_key = OPENROUTER_API_KEY
-    if not api_key:
-        return []
+def find_subpages(home_markdown, base_url, run_id: Optional[str] = None, model: Optional[str] = None,
+                  home_html: Optional[str] = None):
+    """Finds About/Team/Partners/Careers links in the homepage markdown.
+    The heuristic link classifier answers most sites; the LLM is only asked when it isn't confident.
+    Pass `home_html` when the markdown was boilerplate-stripped: the nav links only survive in the HTML."""
+    if home_html:
+        # Nav/footer links were stripped from the markdown; hand both to the LLM as a link list.
+        nav_links = "\n".join(f"[{text}]({url})" for url, text, _ in link_classifier.extract_links(home_html, base_url))
+        home_markdown = f"{nav_links}\n\n{home_markdown}"
+    links = link_classifier.classify_links(home_markdown, base_url)
+    if link_classifier.is_confident(links):
+        sys.stderr.write(json.dumps({"status": "links_classified", "method": "heuristic",
+                                     "links": {t: l.url for t, l in links.items()}}) + "\n")
+        return link_classifier.confident_urls(links)
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    if not OPENROUTER_API_KEY:
+        return link_classifier.confident_urls(links)
 
-    api_url = "https://openrouter.ai/api/v1/chat/completions"
     model_name = model or "google/gemini-flash-1.5"
     
     prompt = f"""
@@ -146,44 +289,25 @@ def find_subpages(home_markdown, base_url, run_id: Optional[str] = None, model:
     If not found, use null. Convert relative paths to absolute URLs using base: {base_url}.
     """
     
-    payload = {
-        "model": model_name, 
-        "messages": [
-            {"role": "system", "content": "You are a URL extractor. Return JSON only."},
-            {"role": "user", "content": prompt + "\n\nMarkdown Snippet (Start):\n" + home_markdown[:80000] + "\n\nMarkdown Snippet (End):\n" + home_markdown[-5000:]} 
-        ],
-        "response_format": { "type": "json_object" }
-    }
-    
+    messages = [
+        {"role": "system", "content": "You are a URL extractor. Return JSON only."},
+        {"role": "user", "content": prompt + "\n\nMarkdown Snippet (Start):\n" + home_markdown[:80000] + "\n\nMarkdown Snippet (End):\n" + home_markdown[-5000:]}
+    ]
+
     try:
-        resp = requests.post(api_url, json=payload, headers=headers, timeout=30)
-        if resp.status_code == 200:
-            content = resp.json()['choices'][0]['message']['content']
-            links = json.loads(content)
-            # Filter nulls and duplicates
-            urls = []
-            if links.get('about_url'): urls.append(links['about_url'])
-            if links.get('team_url'): urls.append(links['team_url'])
-            if links.get('partners_url'): urls.append(links['partners_url'])
-            if links.get('careers_url'): urls.append(links['careers_url'])
-            # Basic validation
-            valid_urls = [u for u in urls if u and u.startswith('http')]
-            
-            # Record Cost
-            if run_id:
-                usage_data = resp.json().get('usage')
-                if usage_data:
-                    cm = CostManager()
-                    cm.record_usage(
-                        run_id=run_id,
-                        model=model_name,
-                        prompt_tokens=usage_data.get("prompt_tokens", 0),
-                        completion_tokens=usage_data.get("completion_tokens", 0)
-                    )
-
-            return list(set(valid_urls))
-        else:
-            sys.stderr.write(f"Link Analysis Failed: {resp.text}\n")
+        response = llm_gateway.chat_completion(model_name, messages, response_format={"type": "json_object"},
+                                               run_id=run_id, task="link_extraction", timeout=30)
+        links = response.json()
+        # Filter nulls and duplicates
+        urls = []
+        if links.get('about_url'): urls.append(links['about_url'])
+        if links.get('team_url'): urls.append(links['team_url'])
+        if links.get('partners_url'): urls.append(links['partners_url'])
+        if links.get('careers_url'): urls.append(links['careers_url'])
+        # Basic validation
+        valid_urls = [u for u in urls if u and u.startswith('http')]
+        # dict.fromkeys rather than set(): keeps a stable order, so the crawl (and its cache keys) is reproducible
+        return list(dict.fromkeys(valid_urls))
     except Exception as e:
         sys.stderr.write(f"Link Analysis Exception: {str(e)}\n")
     return []
@@ -192,15 +316,9 @@ def extract_with_llm(content, run_id: Optional[str] = None, model: Optional[str]
     """
     Sends massive context to LLM to extract structured JSON matching Expanded Schema.
     """
-    api_key = OPENROUTER_API_KEY
-    if not api_key:
+    if not OPENROUTER_API_KEY:
         return {"error": "Missing OPENROUTER_API_KEY"}
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
     system_prompt = """
     You are an expert Data Extractor. Extract the following JSON schema from the Agency Website content provided (which may include Homepage, About Us, and Partners pages).
     
@@ -237,73 +355,75 @@ def extract_with_llm(content, run_id: Optional[str] = None, model: Optional[str]
     Return ONLY valid JSON.
     """
     
-    api_url = "https://openrouter.ai/api/v1/chat/completions"
     model_name = model or "openai/gpt-4o-mini"
+    packed = content_packer.pack(content, 10000, model_name)  # Large context
+    if run_id:
+        get_cost_manager().record_packing(run_id, "structured_extraction", model_name, packed.tokens_in,
+                                     packed.tokens_out, packed.duplicate_tokens)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Extract data from this consolidated website content:\n\n{packed.text}"}
+    ]
 
-    payload = {
-        "model": model_name, 
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Extract data from this consolidated website content:\n\n{content[:40000]}"} # Large context
-        ],
-        "response_format": { "type": "json_object" }
-    }
-    
     try:
-        resp = requests.post(api_url, json=payload, headers=headers, timeout=45)
-        if resp.status_code == 200:
-            # Record Cost
-            if run_id:
-                usage_data = resp.json().get('usage')
-                if usage_data:
-                    cm = CostManager()
-                    cm.record_usage(
-                        run_id=run_id,
-                        model=model_name,
-                        prompt_tokens=usage_data.get("prompt_tokens", 0),
-                        completion_tokens=usage_data.get("completion_tokens", 0)
-                    )
-            return json.loads(resp.json()['choices'][0]['message']['content'])
-        else:
-            return {"error": f"LLM Error {resp.status_code}: {resp.text}"}
+        response = llm_gateway.chat_completion(model_name, messages, response_format={"type": "json_object"},
+                                               run_id=run_id, task="structured_extraction", timeout=45)
+        return response.json()
     except Exception as e:
         return {"error": f"Extraction failed: {str(e)}"}
 
-def scrape_agency_crawler(start_url: str, run_id: Optional[str] = None, model: Optional[str] = None):
-    """Main Crawler Loop"""
+def scrape_agency_crawler(start_url: str, run_id: Optional[str] = None, model: Optional[str] = None) -> dict:
+    """Main Crawler Loop. Returns the crawl result dict (or an {"error": ...} dict)."""
     # 1. Scrape Homepage
     sys.stderr.write(json.dumps({"status": "starting", "url": start_url}) + "\n")
 
     home_data = scrape_url(start_url)
     if "error" in home_data:
-        print(json.dumps(home_data))
-        return
+        return home_data
 
     home_markdown = home_data['markdown']
     consolidated_content = f"--- SOURCE: HOMEPAGE ({start_url}) ---\n{home_markdown}\n"
+    fetches = [home_data.get("fetch", FETCH_NEW)]
 
-    # 2. Find Subpages
-    sys.stderr.write(json.dumps({"status": "analyzing_links"}) + "\n")
-    subpages = find_subpages(home_markdown, start_url, run_id=run_id, model=model)
-    
-    # 3. Scrape Subpages (Max 3 to save time/tokens)
-    for url in subpages[:3]:
-        sys.stderr.write(json.dumps({"status": "crawling_subpage", "url": url}) + "\n")
-        sub_data = scrape_url(url)
+    # 2. Find Subpages — an unchanged homepage has the same links, so reuse the last crawl's
+    # subpage list instead of asking the LLM again.
+    cache = page_cache.get_cache()
+    previous = cache.get(start_url, "crawl", allow_stale=True) if cache else None
+    if previous and fetches[0] in UNCHANGED:
+        subpages = json.loads(previous.content)
+    else:
+        sys.stderr.write(json.dumps({"status": "analyzing_links"}) + "\n")
+        subpages = find_subpages(home_markdown, start_url, run_id=run_id, model=model,
+                                 home_html=home_data.get("html"))[:3]
+        if cache:
+            cache.put(start_url, "crawl", json.dumps(subpages), source="find_subpages")
+
+    # 3. Scrape Subpages (Max 3 to save time/tokens) — concurrently, limited per host by throttle.host_slot
+    sys.stderr.write(json.dumps({"status": "crawling_subpages", "urls": subpages}) + "\n")
+    for url, sub_data in zip(subpages, fetch_concurrently(scrape_url, subpages)):
         if "markdown" in sub_data:
             consolidated_content += f"\n\n--- SOURCE: SUBPAGE ({url}) ---\n{sub_data['markdown']}\n"
-        time.sleep(1) # Be polite
-        
+        fetches.append(sub_data.get("fetch", FETCH_NEW))
+
     # Extraction and Enrichment are no longer the responsibility of this tool.
     # They are handled by extract_insights.py and store_data.py respectively.
-    
+
+    revalidation = {
+        "pages": len(fetches),
+        "cache_hits": fetches.count(FETCH_HIT),
+        "conditional": fetches.count(FETCH_NOT_MODIFIED) + fetches.count(FETCH_CHANGED),
+        "not_modified": fetches.count(FETCH_NOT_MODIFIED),
+    }
     result = {
         "success": True,
         "url": start_url,
-        "crawled_pages": [start_url] + subpages[:2],
-        "markdown": consolidated_content
+        "crawled_pages": [start_url] + subpages,
+        "markdown": consolidated_content,
+        # Every page is byte-for-byte what the previous crawl saw.
+        "not_modified": all(f in UNCHANGED for f in fetches),
+        "revalidation": revalidation,
     }
-    print(json.dumps(result))
+    return result
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Deep crawl agency website.")
@@ -312,7 +432,11 @@ if __name__ == "__main__":
     parser.add_argument("--model", help="Override LLM model for link extraction.")
     parser.add_argument("--markdown-only", action="store_true",
                         help="Output raw markdown text only (for caching to .md files).")
+    page_cache.add_cache_arguments(parser)
+    llm_gateway.add_cache_arguments(parser)
     args = parser.parse_args()
+    page_cache.apply_cache_arguments(args)
+    llm_gateway.apply_cache_arguments(args)
 
     if args.markdown_only:
         # Multi-page scrape (homepage + About/Team subpages), output plain markdown for caching
@@ -322,4 +446,4 @@ if __name__ == "__main__":
             sys.exit(1)
         print(result["markdown"])
     else:
-        scrape_agency_crawler(args.url, run_id=args.run_id, model=args.model)
+        print(json.dumps(scrape_agency_crawler(args.url, run_id=args.run_id, model=args.model)))
@@ -0,0 +1,116 @@
+"""
+search_cache.py — Persistent cache for DuckDuckGo searches made by GrowthMonitor and GroupEnricher.
+
+Results are keyed by (engine, normalised query, max_results) and kept for a TTL that depends
+on what the query is for (QUERY_TTLS): group ownership changes over months, news daily.
+Sibling agencies of one group all search "list of agencies owned by {parent}", so during a
+batch only the first of them hits DuckDuckGo — fewer calls and fewer rate-limit failures.
+
+Empty result lists are not cached (DDG returns them when throttling). Bypass the cache with
+ATHOS_SEARCH_CACHE=0; it lives in tools/.cache/search.db (kv_cache.cache_dir(), ATHOS_CACHE_DIR to move it).
+
+Usage:
+    python search_cache.py --stats
+    python search_cache.py --clear
+"""
+import os
+import re
+import json
+import hashlib
+import argparse
+import threading
+from typing import Callable, List, Optional
+
+from kv_cache import KVCache, cache_dir
+import throttle
+
+DAY = 24 * 3600
+QUERY_TTLS = {
+    "group": 21 * DAY,     # parent company / holding group lookups
+    "siblings": 21 * DAY,  # "agencies owned by {parent}"
+    "social": 3 * DAY,
+    "news": 1 * DAY,
+}
+DEFAULT_TTL = 1 * DAY
+CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+_cache: Optional[KVCache] = None
+_lock = threading.Lock()
+_stats = {}  # kind -> {"hits": n, "misses": n}
+
+
+def enabled() -> bool:
+    return os.getenv("ATHOS_SEARCH_CACHE", "1") != "0"
+
+
+def get_cache() -> KVCache:
+    global _cache
+    path = os.path.join(cache_dir(), "search.db")
+    with _lock:
+        if _cache is None or _cache.path != path:
+            # The cache-wide TTL is the longest; each lookup passes its own max_age.
+            _cache = KVCache(path, ttl=max(QUERY_TTLS.values()), max_bytes=CACHE_MAX_BYTES)
+        return _cache
+
+
+def cache_key(engine: str, query: str, max_results: int) -> str:
+    normalized = re.sub(r"\s+", " ", query).strip().lower()
+    return hashlib.sha256(json.dumps([engine, normalized, max_results]).encode("utf-8")).hexdigest()
+
+
+def _count(kind: str, hit: bool) -> None:
+    with _lock:
+        counts = _stats.setdefault(kind, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+
+def search(kind: str, engine: str, fn: Callable[..., Optional[list]], query: str, max_results: int) -> List[dict]:
+    """Cached fn(query, max_results=...) — e.g. DDGS().text or DDGS().news. `kind` picks the TTL
+    from QUERY_TTLS; `engine` ("ddg_text", "ddg_news") keeps different search types apart.
+    Network calls are throttled per host like every other DuckDuckGo request."""
+    cache = get_cache() if enabled() else None
+    key = cache_key(engine, query, max_results)
+    if cache is not None:
+        hit = cache.get(key, max_age=QUERY_TTLS.get(kind, DEFAULT_TTL))
+        if hit is not None:
+            _count(kind, True)
+            return json.loads(hit)
+    _count(kind, False)
+    with throttle.host_slot("duckduckgo.com"):
+        results = list(fn(query, max_results=max_results) or [])
+    if cache is not None and results:
+        cache.put(key, json.dumps(results, default=str))
+    return results
+
+
+def stats() -> dict:
+    """Hits/misses per query kind in this process."""
+    with _lock:
+        return {kind: dict(counts) for kind, counts in _stats.items()}
+
+
+def format_stats(counts: dict) -> str:
+    parts = []
+    for kind, c in sorted(counts.items()):
+        total = c["hits"] + c["misses"]
+        parts.append(f"{kind} {c['hits']}/{total} ({c['hits'] / total:.0%})" if total else f"{kind} 0/0")
+    return ", ".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the search-result cache.")
+    parser.add_argument("--stats", action="store_true", help="Show cache size")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached search")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.path}")
+    elif args.stats:
+        s = cache.summary()
+        print(f"Search cache: {s['path']}")
+        print(f"  Entries: {s['entries']}  ({s['bytes'] / 1024 / 1024:.1f} MB of {s['max_bytes'] / 1024 / 1024:.0f} MB)")
+        print("  TTLs: " + ", ".join(f"{k} {v // DAY}d" for k, v in QUERY_TTLS.items()))
+    else:
+        parser.print_help()
@@ -2,14 +2,15 @@ import os
 import sys
 import argparse
 import json
-import hashlib
 from datetime import datetime, timezone
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
 # Add tools directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from enrich_hunter import enrich_with_hunter
+from score_leads import calculate_score
 
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
@@ -17,6 +18,8 @@ load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file_
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 HUNTER_API_KEY = os.getenv("HUNTER_API_KEY")
+# Rows per multi-row upsert in store_many (PostgREST request bodies stay well under its limits).
+UPSERT_CHUNK_SIZE = 100
 
 def normalize_url(url: str) -> str:
     """Standardizes URL for duplicate checking: no protocol, no www, no trailing slash."""
@@ -53,107 +56,170 @@ def is_hr_contact(title: str, role: str) -> bool:
     # If "partner" is present AND "hr" is present (e.g. HR Business Partner), it's HR.
     return any(kw in title_lower or kw in role_lower for kw in hr_keywords)
 
-def store_data(data: dict):
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print(json.dumps({"error": "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY"}))
-        return
+def enrich_contacts(data: dict) -> tuple:
+    """Directors and partner managers from `data`, merged with Hunter.io contacts when HUNTER_API_KEY is set."""
+    directors = data.get("directors", [])
+    partner_managers = data.get("partner_managers", [])
+    if HUNTER_API_KEY and data.get("website"):
+        try:
+            sys.stderr.write(f"Enriching {data['website']} with Hunter.io...\n")
+            hunter_people = enrich_with_hunter(data["website"], HUNTER_API_KEY)
+            
+            # Merge Logic:
+            # 1. Create lookup of existing people by name (normalized)
+            existing_dirs = {d["name"].lower(): d for d in directors}
+            existing_pms = {p["name"].lower(): p for p in partner_managers}
+            
+            for hp in hunter_people:
+                h_name = hp["name"].lower()
+                h_title = hp.get("title", "")
+                h_role = hp.get("role", "")
+                
+                # Skip HR contacts entirely for both lists
+                if is_hr_contact(h_title, h_role):
+                    continue
+
+                if h_name in existing_dirs:
+                    target = existing_dirs[h_name]
+                    if not target.get("email"): target["email"] = hp.get("email")
+                    if not target.get("linkedin_url"): target["linkedin_url"] = hp.get("linkedin_url")
+                    if not target.get("role") or target["role"] == "Employee": target["role"] = hp.get("role")
+                elif h_name in existing_pms:
+                    target = existing_pms[h_name]
+                    if not target.get("email"): target["email"] = hp.get("email")
+                    if not target.get("linkedin_url"): target["linkedin_url"] = hp.get("linkedin_url")
+                    if not target.get("role") or target["role"] == "Employee": target["role"] = hp.get("role")
+                else:
+                    # Add new person found by Hunter
+                    role_lower = (hp.get("role") or "").lower()
+                    title_lower = (hp.get("title") or "").lower()
+                    pm_keywords = [
+                        "partnership", "partner", "alliance", "solutions architect", 
+                        "ecommerce director", "growth lead", "specialist"
+                    ]
+                    if any(kw in role_lower or kw in title_lower for kw in pm_keywords):
+                        partner_managers.append(hp)
+                    else:
+                        directors.append(hp)
+            
+            sys.stderr.write(f"Enrichment Complete. Directors: {len(directors)}, Partner Managers: {len(partner_managers)}\n")
+        except Exception as e:
+            sys.stderr.write(f"Hunter Enrichment Failed: {str(e)}\n")
+    return directors, partner_managers
 
+def build_payload(data: dict) -> dict:
+    """The `agencies` row for one extracted record: canonical website, Hunter-enriched contacts,
+    and lead_score/score_breakdown computed on the row itself (as score_leads would after the write)."""
     # Normalize URL for storage consistency — canonical form prevents duplicate upserts
     if data.get("website"):
         data["website"] = canonical_url(data["website"])
 
+    # --- ENRICHMENT LAYER (Hunter.io) ---
+    directors, partner_managers = enrich_contacts(data)
+
+    payload = {
+        "name": data.get("name"),
+        "website": data.get("website"),
+        "description": data.get("description"),
+        "specializations": data.get("services", []) or data.get("specializations", []),
+        "platforms": data.get("platforms", []),
+        "revenue_estimate": data.get("revenue_estimate"),
+        "partners": data.get("partners", []),
+        "clients": data.get("clients", []),
+        "case_studies": data.get("case_studies", []),
+        "directors": directors, # Enriched list
+        "partner_managers": partner_managers, # Enriched list
+        "awards": data.get("awards", []),
+        "partner_page_url": data.get("partner_page_url"),
+        "growth_signals": data.get("growth_signals", []),
+        "social_mentions": data.get("social_mentions", []),
+        "competitor_partnerships": data.get("competitor_partnerships", []),
+        "parent_company": data.get("parent_company"),
+        "is_group_member": data.get("is_part_of_group", False),
+        "tech_stack": data.get("tech_stack", []),
+        "headcount": data.get("headcount"),
+        "office_locations": data.get("office_locations", []),
+        "open_roles_count": data.get("open_roles_count", 0),
+        "hiring_roles": data.get("hiring_roles", []),
+        "sibling_agencies": data.get("sibling_agencies", []),
+        "last_analyzed": data.get("last_analyzed"),
+        "last_scraped_at": datetime.now(timezone.utc).isoformat(),
+    }
+    # Change-detection fingerprint of the crawled markdown (change_detection.fingerprint).
+    # Only written when the caller crawled the site; otherwise the stored one stays valid.
+    for column in ("content_hash", "normalized_content_hash", "section_hashes"):
+        if data.get(column):
+            payload[column] = data[column]
+
+    # Score in the same write, so no follow-up update is needed.
+    scoring = calculate_score(payload)
+    payload["lead_score"] = scoring["score"]
+    payload["score_breakdown"] = scoring["breakdown"]
+    return payload
+
+def _stored(row: dict) -> dict:
+    return {"success": True, "id": row.get("id"), "score": row.get("lead_score"), "data": row}
+
+def store_data(data: dict, supabase: Optional[Client] = None) -> dict:
+    """Upserts one agency on `website`, score included. Returns {"success": ..., "id": ..., "score": ...}
+    or an error dict. Pass `supabase` to reuse a shared client (pipeline.InProcessEngine does)."""
+    if supabase is None and (not SUPABASE_URL or not SUPABASE_KEY):
+        return {"error": "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY"}
+
     try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        
-        # --- ENRICHMENT LAYER (Hunter.io) ---
-        directors = data.get("directors", [])
-        partner_managers = data.get("partner_managers", [])
-        if HUNTER_API_KEY and data.get("website"):
-            try:
-                sys.stderr.write(f"Enriching {data['website']} with Hunter.io...\n")
-                hunter_people = enrich_with_hunter(data["website"], HUNTER_API_KEY)
-                
-                # Merge Logic:
-                # 1. Create lookup of existing people by name (normalized)
-                existing_dirs = {d["name"].lower(): d for d in directors}
-                existing_pms = {p["name"].lower(): p for p in partner_managers}
-                
-                for hp in hunter_people:
-                    h_name = hp["name"].lower()
-                    h_title = hp.get("title", "")
-                    h_role = hp.get("role", "")
-                    
-                    # Skip HR contacts entirely for both lists
-                    if is_hr_contact(h_title, h_role):
-                        continue
-
-                    if h_name in existing_dirs:
-                        target = existing_dirs[h_name]
-                        if not target.get("email"): target["email"] = hp.get("email")
-                        if not target.get("linkedin_url"): target["linkedin_url"] = hp.get("linkedin_url")
-                        if not target.get("role") or target["role"] == "Employee": target["role"] = hp.get("role")
-                    elif h_name in existing_pms:
-                        target = existing_pms[h_name]
-                        if not target.get("email"): target["email"] = hp.get("email")
-                        if not target.get("linkedin_url"): target["linkedin_url"] = hp.get("linkedin_url")
-                        if not target.get("role") or target["role"] == "Employee": target["role"] = hp.get("role")
-                    else:
-                        # Add new person found by Hunter
-                        role_lower = (hp.get("role") or "").lower()
-                        title_lower = (hp.get("title") or "").lower()
-                        pm_keywords = [
-                            "partnership", "partner", "alliance", "solutions architect", 
-                            "ecommerce director", "growth lead", "specialist"
-                        ]
-                        if any(kw in role_lower or kw in title_lower for kw in pm_keywords):
-                            partner_managers.append(hp)
-                        else:
-                            directors.append(hp)
-                
-                sys.stderr.write(f"Enrichment Complete. Directors: {len(directors)}, Partner Managers: {len(partner_managers)}\n")
-            except Exception as e:
-                sys.stderr.write(f"Hunter Enrichment Failed: {str(e)}\n")
-
-        # Prepare payload for upsert
-        payload = {
-            "name": data.get("name"),
-            "website": data.get("website"),
-            "description": data.get("description"),
-            "specializations": data.get("services", []) or data.get("specializations", []),
-            "platforms": data.get("platforms", []),
-            "revenue_estimate": data.get("revenue_estimate"),
-            "partners": data.get("partners", []),
-            "clients": data.get("clients", []),
-            "case_studies": data.get("case_studies", []),
-            "directors": directors, # Enriched list
-            "partner_managers": partner_managers, # Enriched list
-            "awards": data.get("awards", []),
-            "partner_page_url": data.get("partner_page_url"),
-            "growth_signals": data.get("growth_signals", []),
-            "social_mentions": data.get("social_mentions", []),
-            "competitor_partnerships": data.get("competitor_partnerships", []),
-            "parent_company": data.get("parent_company"),
-            "is_group_member": data.get("is_part_of_group", False),
-            "tech_stack": data.get("tech_stack", []),
-            "headcount": data.get("headcount"),
-            "office_locations": data.get("office_locations", []),
-            "sibling_agencies": data.get("sibling_agencies", []),
-            "last_analyzed": data.get("last_analyzed"),
-            "content_hash": hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest(),
-            "last_scraped_at": datetime.now(timezone.utc).isoformat(),
-        }
+        if supabase is None:
+            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        payload = build_payload(data)
 
         # Upsert
         response = supabase.table("agencies").upsert(payload, on_conflict="website").execute()
         
         if response.data and len(response.data) > 0:
-            agency_id = response.data[0].get("id")
-            print(json.dumps({"success": True, "id": agency_id, "data": response.data[0]}))
-        else:
-            print(json.dumps({"success": True, "data": str(response)}))
+            return _stored(response.data[0])
+        return {"success": True, "data": str(response)}
 
     except Exception as e:
-        print(json.dumps({"success": False, "error": f"Supabase Error: {str(e)}"}))
+        return {"success": False, "error": f"Supabase Error: {str(e)}"}
+
+def upsert_payloads(payloads: List[dict], supabase: Client, chunk_size: int = UPSERT_CHUNK_SIZE) -> List[dict]:
+    """Writes build_payload() rows in multi-row upserts on `website`, `chunk_size` rows per request.
+    Returns one result per payload, in input order; a failed chunk fails only its own rows."""
+    results: List[Optional[dict]] = [None] * len(payloads)
+    # PostgREST needs every row of a bulk upsert to have the same columns, and Postgres refuses
+    # to touch one row twice in a statement: group by column set, and the last payload per website wins.
+    groups: Dict[tuple, Dict[str, List[int]]] = {}
+    for i, payload in enumerate(payloads):
+        if not payload.get("website"):
+            results[i] = {"success": False, "error": "Missing website"}
+            continue
+        groups.setdefault(tuple(sorted(payload)), {}).setdefault(payload["website"], []).append(i)
+
+    for by_website in groups.values():
+        websites = list(by_website)
+        for start in range(0, len(websites), chunk_size):
+            chunk = websites[start:start + chunk_size]
+            try:
+                response = (supabase.table("agencies")
+                            .upsert([payloads[by_website[w][-1]] for w in chunk], on_conflict="website").execute())
+                rows = {row.get("website"): row for row in response.data or []}
+                for w in chunk:
+                    result = _stored(rows[w]) if w in rows else {"success": True, "data": None}
+                    for i in by_website[w]:
+                        results[i] = result
+            except Exception as e:
+                for w in chunk:
+                    for i in by_website[w]:
+                        results[i] = {"success": False, "error": f"Supabase Error: {str(e)}"}
+    return results
+
+def store_many(records: List[dict], supabase: Optional[Client] = None, chunk_size: int = UPSERT_CHUNK_SIZE) -> List[dict]:
+    """store_data() for many agencies: one upsert per `chunk_size` agencies instead of an upsert
+    and a score update per agency. Returns one result per record, in input order."""
+    if supabase is None and (not SUPABASE_URL or not SUPABASE_KEY):
+        return [{"error": "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY"} for _ in records]
+    if supabase is None:
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return upsert_payloads([build_payload(r) for r in records], supabase, chunk_size=chunk_size)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Store agency data in Supabase.")
@@ -161,12 +227,16 @@ if __name__ == "__main__":
     content = sys.stdin.read()
     try:
         raw_input = json.loads(content)
+        # A JSON array is a batch: bulk upsert, results in input order
+        if isinstance(raw_input, list):
+            print(json.dumps(store_many(raw_input)))
+            sys.exit(0)
         # Unwrap "data" if it exists
         if raw_input.get("success") and "data" in raw_input:
             data = raw_input["data"]
         else:
             data = raw_input
             
-        store_data(data)
+        print(json.dumps(store_data(data)))
     except json.JSONDecodeError:
         print(json.dumps({"error": "Invalid JSON input"}))
@@ -8,6 +8,9 @@ from dotenv import load_dotenv
 from supabase import create_client, Client
 import subprocess
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from batch_runner import add_batch_arguments, run_batch
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -92,6 +95,7 @@ def main():
     parser.add_argument("--limit", type=int, default=10, help="Maximum number of agencies to sync in one run.")
     parser.add_argument("--url", type=str, help="Sync a specific URL only.")
     parser.add_argument("--dry-run", action="store_true", help="List agencies to sync without actually running orchestration.")
+    add_batch_arguments(parser)
 
     args = parser.parse_args()
 
@@ -110,9 +114,9 @@ def main():
 
     logging.info(f"Found {len(stale_agencies)} stale agencies.")
     
-    count = 0
+    to_sync = []
     for agency in stale_agencies:
-        if count >= args.limit:
+        if len(to_sync) >= args.limit:
             logging.info(f"Reached limit of {args.limit} agencies. Stopping.")
             break
             
@@ -123,12 +127,13 @@ def main():
             
         if args.dry_run:
             logging.info(f"[Dry Run] Would sync: {agency.get('name')} ({url})")
-        else:
-            sync_agency(url)
-            
-        count += 1
+        to_sync.append(url)
+
+    if not args.dry_run:
+        run_batch(to_sync, concurrency=args.concurrency, llm_concurrency=args.llm_concurrency,
+                  per_domain=args.per_domain)
 
-    logging.info(f"Sync complete. Total processed: {count}")
+    logging.info(f"Sync complete. Total processed: {len(to_sync)}")
 
 if __name__ == "__main__":
     main()
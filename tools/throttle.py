@@ -0,0 +1,65 @@
+"""Process-wide concurrency limits shared by every pipeline running in this interpreter.
+
+Two independent budgets:
+- llm_slot(): global cap on in-flight LLM calls, whichever tool makes them.
+- host_slot(url_or_host): per-domain politeness — at most N concurrent requests to one
+  host, and a minimum gap between request starts to it.
+
+Defaults keep single-run behaviour unchanged; batch_runner.configure() tightens them.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+_LLM_CONCURRENCY = 8
+_HOST_CONCURRENCY = 3     # homepage subpages are fetched together, so allow a crawl's worth at once
+_HOST_MIN_INTERVAL = 0.1  # seconds between request starts to the same host
+
+_llm_semaphore = threading.BoundedSemaphore(_LLM_CONCURRENCY)
+_hosts_lock = threading.Lock()
+_hosts = {}  # host -> [semaphore, last_start_monotonic, gap_lock]
+
+
+def configure(llm_concurrency: int = None, host_concurrency: int = None, host_min_interval: float = None):
+    """Resize the limits. Call before starting workers — in-flight holders keep their old semaphore."""
+    global _llm_semaphore, _HOST_CONCURRENCY, _HOST_MIN_INTERVAL
+    if llm_concurrency is not None:
+        _llm_semaphore = threading.BoundedSemaphore(max(1, llm_concurrency))
+    with _hosts_lock:
+        if host_concurrency is not None:
+            _HOST_CONCURRENCY = max(1, host_concurrency)
+        if host_min_interval is not None:
+            _HOST_MIN_INTERVAL = max(0.0, host_min_interval)
+        _hosts.clear()
+
+
+def _host_key(url_or_host: str) -> str:
+    host = urlparse(url_or_host).netloc if "://" in url_or_host else url_or_host
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+@contextmanager
+def llm_slot():
+    semaphore = _llm_semaphore
+    with semaphore:
+        yield
+
+
+@contextmanager
+def host_slot(url_or_host: str):
+    key = _host_key(url_or_host)
+    with _hosts_lock:
+        entry = _hosts.get(key)
+        if entry is None:
+            entry = _hosts[key] = [threading.BoundedSemaphore(_HOST_CONCURRENCY), 0.0, threading.Lock()]
+        interval = _HOST_MIN_INTERVAL
+    semaphore, _, gap_lock = entry
+    with semaphore:
+        with gap_lock:
+            wait = entry[1] + interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            entry[1] = time.monotonic()
+        yield
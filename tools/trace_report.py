@@ -0,0 +1,232 @@
+"""
+trace_report.py — Latency report from locally exported spans (tracing.py sqlite/jsonl exporters).
+
+Record spans locally with --trace-export sqlite (or jsonl) on orchestrator.py / batch_runner.py,
+then:
+    phases      p50/p95/p99/max per phase span (scrape, extract, enrich, enrich.growth, enrich.group,
+                store, score, orchestration) and for LLM calls (llm.*)
+    critical    the chain of phases that set each run's wall time, walked back from the phase
+                that finished last; enrich is expanded into its slower branch
+    slowest     slowest runs (agencies) and domains by end-to-end orchestration time
+
+Usage:
+    python trace_report.py                          # last 24h from tools/.cache/traces.db
+    python trace_report.py --since 7d --top 20
+    python trace_report.py --jsonl tools/.cache/traces.jsonl
+    python trace_report.py --run <run_id>           # one run's critical path
+    python trace_report.py --json
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from collections import defaultdict
+from typing import Dict, List
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import tracing
+
+PHASES = ("scrape", "extract", "enrich", "enrich.growth", "enrich.group", "store", "score", "orchestration")
+ROOT = "orchestration"
+# Phases ending within this much of the next one's start still count as its predecessor.
+PATH_SLACK_NS = 5_000_000
+
+
+def parse_window(value: str) -> float:
+    """"30m", "24h", "7d" -> seconds."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhd])", value.strip().lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected e.g. 30m, 24h or 7d, got {value!r}")
+    return float(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+
+
+def load_sqlite(path: str, since_ns: int) -> List[dict]:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT trace_id, span_id, parent_span_id, name, start_ns, end_ns, status, attributes "
+                            "FROM spans WHERE start_ns >= ?", (since_ns,)).fetchall()
+    finally:
+        conn.close()
+    return [{"trace_id": r[0], "span_id": r[1], "parent": r[2], "name": r[3], "start": r[4], "end": r[5],
+             "status": r[6], "attributes": json.loads(r[7] or "{}")} for r in rows]
+
+
+def load_jsonl(path: str, since_ns: int) -> List[dict]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            s = json.loads(line)
+            if int(s["startTimeUnixNano"]) < since_ns:
+                continue
+            spans.append({"trace_id": s["traceId"], "span_id": s["spanId"], "parent": s.get("parentSpanId"),
+                          "name": s["name"], "start": int(s["startTimeUnixNano"]), "end": int(s["endTimeUnixNano"]),
+                          "status": (s.get("status") or {}).get("code"),
+                          "attributes": tracing.attributes_dict(s.get("attributes"))})
+    return spans
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * p // 100))  # ceil(n * p / 100)
+    return values[int(rank) - 1]
+
+
+def _seconds(span: dict) -> float:
+    return (span["end"] - span["start"]) / 1e9
+
+
+def phase_latency(spans: List[dict]) -> List[dict]:
+    groups = defaultdict(list)
+    errors = defaultdict(int)
+    for s in spans:
+        if s["name"] in PHASES:
+            key = s["name"]
+        elif s["name"].startswith("llm.") and s["name"] != "llm.attempt":
+            key = "llm.*"
+        else:
+            continue
+        groups[key].append(_seconds(s))
+        errors[key] += s["status"] == 2
+    order = {name: i for i, name in enumerate(PHASES + ("llm.*",))}
+    out = []
+    for name in sorted(groups, key=order.get):
+        values = sorted(groups[name])
+        out.append({"phase": name, "count": len(values), "errors": errors[name],
+                    "p50": percentile(values, 50), "p95": percentile(values, 95),
+                    "p99": percentile(values, 99), "max": values[-1]})
+    return out
+
+
+def critical_path(span: dict, children: Dict[str, List[dict]]) -> List[dict]:
+    """Phases under `span` that determined its duration, in order."""
+    phases = [c for c in children.get(span["span_id"], []) if not c["name"].startswith("llm.")]
+    if not phases:
+        return [span]
+    current = max(phases, key=lambda c: c["end"])
+    chain = [current]
+    while True:
+        before = [c for c in phases if c is not current and c["end"] <= current["start"] + PATH_SLACK_NS]
+        if not before:
+            break
+        current = max(before, key=lambda c: c["end"])
+        chain.append(current)
+    path = []
+    for phase in reversed(chain):
+        path += critical_path(phase, children)
+    return path
+
+
+def runs(spans: List[dict]) -> List[dict]:
+    """One entry per orchestration root span: url, duration and critical path."""
+    children = defaultdict(list)
+    for s in spans:
+        if s["parent"]:
+            children[s["parent"]].append(s)
+    out = []
+    for root in (s for s in spans if s["name"] == ROOT):
+        path = critical_path(root, children)
+        out.append({
+            "run_id": root["attributes"].get("run.id"),
+            "url": root["attributes"].get("target.url"),
+            "status": root["attributes"].get("pipeline.status"),
+            "seconds": _seconds(root),
+            "critical_path": [(p["name"], _seconds(p)) for p in path if p is not root],
+        })
+    return sorted(out, key=lambda r: -r["seconds"])
+
+
+def critical_share(run_list: List[dict]) -> List[dict]:
+    """How often each phase is on the critical path, and its share of critical-path time."""
+    on_path, seconds = defaultdict(int), defaultdict(float)
+    for run in run_list:
+        for name, s in run["critical_path"]:
+            on_path[name] += 1
+            seconds[name] += s
+    total = sum(seconds.values()) or 1.0
+    return [{"phase": name, "runs": on_path[name], "share": seconds[name] / total}
+            for name in sorted(seconds, key=lambda n: -seconds[n])]
+
+
+def slowest_domains(run_list: List[dict]) -> List[dict]:
+    by_domain = defaultdict(list)
+    for run in run_list:
+        if run["url"]:
+            host = urlparse(run["url"]).netloc or run["url"]
+            by_domain[host[4:] if host.startswith("www.") else host].append(run["seconds"])
+    out = [{"domain": d, "runs": len(v), "p50": percentile(sorted(v), 50), "max": max(v)} for d, v in by_domain.items()]
+    return sorted(out, key=lambda d: -d["p50"])
+
+
+def _path_text(path) -> str:
+    return " → ".join(f"{name} {s:.1f}s" for name, s in path) or "-"
+
+
+def report(spans: List[dict], top: int) -> dict:
+    run_list = runs(spans)
+    return {"spans": len(spans), "runs": len(run_list), "phases": phase_latency(spans),
+            "critical_path_share": critical_share(run_list), "slowest_runs": run_list[:top],
+            "slowest_domains": slowest_domains(run_list)[:top]}
+
+
+def print_report(r: dict, window: str) -> None:
+    print(f"{r['spans']} spans, {r['runs']} runs in the last {window}")
+    print(f"\n{'phase':<16}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for p in r["phases"]:
+        print(f"{p['phase']:<16}{p['count']:>7}{p['errors']:>5}{p['p50']:>8.2f}s{p['p95']:>8.2f}s"
+              f"{p['p99']:>8.2f}s{p['max']:>8.2f}s")
+    if r["critical_path_share"]:
+        print("\nCritical path:")
+        for c in r["critical_path_share"]:
+            print(f"  {c['phase']:<16} on {c['runs']:>5} run(s)  {c['share']:>6.1%} of critical-path time")
+    if r["slowest_runs"]:
+        print("\nSlowest agencies:")
+        for run in r["slowest_runs"]:
+            print(f"  {run['seconds']:>7.1f}s  {run['url'] or run['run_id']}  ({run['status'] or '?'})")
+            print(f"            {_path_text(run['critical_path'])}")
+    if r["slowest_domains"]:
+        print("\nSlowest domains (p50 of runs):")
+        for d in r["slowest_domains"]:
+            print(f"  {d['p50']:>7.1f}s  max {d['max']:>6.1f}s  {d['runs']:>3} run(s)  {d['domain']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency report from locally exported pipeline spans.")
+    parser.add_argument("--db", help="SQLite span store (default tools/.cache/traces.db)")
+    parser.add_argument("--jsonl", help="Read a JSONL span file instead")
+    parser.add_argument("--since", default="24h", help="Time window, e.g. 30m, 24h, 7d (default 24h)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest runs/domains to list")
+    parser.add_argument("--run", help="Show the critical path of one run id")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    since_ns = time.time_ns() - int(parse_window(args.since) * 1e9)
+    if args.jsonl:
+        spans = load_jsonl(args.jsonl, since_ns)
+    else:
+        path = args.db or tracing.local_path("sqlite")
+        if not os.path.exists(path):
+            sys.exit(f"No span store at {path} — run the pipeline with --trace-export sqlite first.")
+        spans = load_sqlite(path, since_ns)
+
+    if args.run:
+        trace_id = args.run.replace("-", "")
+        match = runs([s for s in spans if s["trace_id"] == trace_id])
+        if not match:
+            sys.exit(f"No orchestration span for run {args.run} in the last {args.since}")
+        run = match[0]
+        print(json.dumps(run, indent=2) if args.json else
+              f"{run['url']}  {run['seconds']:.1f}s  ({run['status']})\n  {_path_text(run['critical_path'])}")
+    else:
+        r = report(spans, args.top)
+        if args.json:
+            print(json.dumps(r, indent=2))
+        else:
+            print_report(r, args.since)
@@ -1,10 +1,68 @@
-"""Minimal OTLP/JSON span sender for TwoTail. No SDK dependency — raw HTTP POST."""
+"""Minimal OTLP/JSON span sender for TwoTail. No SDK dependency — raw HTTP POST.
+
+send_span() only queues the span. A background thread (BatchSpanProcessor) posts queued spans
+as one resourceSpans payload every SCHEDULE_DELAY seconds or MAX_EXPORT_BATCH spans, whichever
+comes first; the queue holds MAX_QUEUE_SIZE spans and drops the oldest when the backend can't
+keep up. Whatever is still queued is flushed at interpreter exit (bounded by EXPORT_TIMEOUT).
+
+Where spans go is set by ATHOS_TRACE_EXPORT (comma-separated; --trace-export on the CLIs):
+    twotail     OTLP/JSON POST to TwoTail (the default when TWOTAIL_API_KEY is set)
+    sqlite      tools/.cache/traces.db (spans table)
+    jsonl       tools/.cache/traces.jsonl (one OTLP span per line)
+ATHOS_TRACE_DIR (or ATHOS_CACHE_DIR) moves the local files. trace_report.py reads either local store.
+"""
 import os
+import sys
+import json
 import uuid
+import sqlite3
+import atexit
+import threading
+import contextvars
+from collections import deque
 import requests
 
+from kv_cache import cache_dir
+
 ENDPOINT = "https://www.twotail.ai/api/v1/traces"
 SERVICE_NAME = "athos-intelligence-pipeline"
+EXPORTERS = ("twotail", "sqlite", "jsonl")
+MAX_QUEUE_SIZE = 2048
+MAX_EXPORT_BATCH = 512
+SCHEDULE_DELAY = 2.0
+EXPORT_TIMEOUT = 5
+
+
+# Current trace/parent span for this thread of work. Concurrent pipelines (batch_runner) each set
+# their own; subprocess tools inherit them through TWOTAIL_TRACE_ID / TWOTAIL_PARENT_SPAN_ID.
+_trace_id = contextvars.ContextVar("twotail_trace_id", default=None)
+_parent_span_id = contextvars.ContextVar("twotail_parent_span_id", default=None)
+
+
+def set_trace(trace_id):
+    _trace_id.set(trace_id)
+
+
+def set_parent(span_id):
+    _parent_span_id.set(span_id)
+
+
+def current_trace_id():
+    return _trace_id.get() or os.environ.get("TWOTAIL_TRACE_ID")
+
+
+def current_parent_span_id():
+    return _parent_span_id.get() or os.environ.get("TWOTAIL_PARENT_SPAN_ID")
+
+
+def child_env():
+    """Environment for a tool subprocess, carrying the current trace context."""
+    env = dict(os.environ)
+    if current_trace_id():
+        env["TWOTAIL_TRACE_ID"] = current_trace_id()
+    if current_parent_span_id():
+        env["TWOTAIL_PARENT_SPAN_ID"] = current_parent_span_id()
+    return env
 
 
 def new_trace_id():
@@ -25,29 +83,268 @@ def _attr(key, value):
     return {"key": key, "value": {"stringValue": str(value)}}
 
 
-def send_span(trace_id, span_id, parent_span_id, name, start_ns, end_ns, attributes=None, status_code=1):
-    """Fire-and-forget. Never raises — a dead tracing backend must not break the pipeline."""
-    api_key = os.getenv("TWOTAIL_API_KEY")
-    if not api_key:
-        return
-    payload = {
+def make_span(trace_id, span_id, parent_span_id, name, start_ns, end_ns, attributes=None, status_code=1):
+    return {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "parentSpanId": parent_span_id,
+        "name": name,
+        "startTimeUnixNano": start_ns,
+        "endTimeUnixNano": end_ns,
+        "attributes": [_attr(k, v) for k, v in (attributes or {}).items()],
+        "status": {"code": status_code},
+    }
+
+
+def otlp_payload(spans):
+    return {
         "resourceSpans": [{
             "resource": {"attributes": [_attr("service.name", SERVICE_NAME)]},
-            "scopeSpans": [{
-                "spans": [{
-                    "traceId": trace_id,
-                    "spanId": span_id,
-                    "parentSpanId": parent_span_id,
-                    "name": name,
-                    "startTimeUnixNano": start_ns,
-                    "endTimeUnixNano": end_ns,
-                    "attributes": [_attr(k, v) for k, v in (attributes or {}).items()],
-                    "status": {"code": status_code},
-                }]
-            }]
+            "scopeSpans": [{"spans": list(spans)}],
         }]
     }
+
+
+class OTLPHttpExporter:
+    """POSTs a batch of spans to TwoTail in one request, over a kept-alive session."""
+
+    def __init__(self, api_key, endpoint=ENDPOINT, timeout=EXPORT_TIMEOUT):
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def export(self, spans):
+        self._session.post(self.endpoint, json=otlp_payload(spans), headers={"X-API-Key": self.api_key},
+                           timeout=self.timeout)
+
+
+class JSONLSpanExporter:
+    """Appends each span, as its OTLP JSON object, on its own line."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, spans):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(span, default=str) + "\n" for span in spans))
+
+
+class SQLiteSpanExporter:
+    """Writes spans to a local `spans` table, one transaction per batch."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS spans (
+                trace_id TEXT,
+                span_id TEXT PRIMARY KEY,
+                parent_span_id TEXT,
+                name TEXT,
+                start_ns INTEGER,
+                end_ns INTEGER,
+                status INTEGER,
+                attributes TEXT
+            );
+            CREATE INDEX IF NOT EXISTS spans_start_idx ON spans (start_ns);
+            CREATE INDEX IF NOT EXISTS spans_trace_idx ON spans (trace_id);
+        """)
+        self._conn.commit()
+
+    def export(self, spans):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(s["traceId"], s["spanId"], s.get("parentSpanId"), s["name"], s["startTimeUnixNano"],
+                  s["endTimeUnixNano"], s.get("status", {}).get("code"),
+                  json.dumps(attributes_dict(s.get("attributes")), default=str)) for s in spans])
+
+
+class _FanOut:
+    def __init__(self, exporters):
+        self.exporters = exporters
+
+    def export(self, spans):
+        errors = []
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                errors.append(f"{type(exporter).__name__}: {e}")
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+
+def attributes_dict(attributes):
+    """OTLP attribute list -> {key: value}."""
+    out = {}
+    for a in attributes or []:
+        value = a.get("value") or {}
+        out[a["key"]] = next(iter(value.values()), None)
+    return out
+
+
+def local_path(kind):
+    return os.path.join(os.getenv("ATHOS_TRACE_DIR") or cache_dir(),
+                        "traces.db" if kind == "sqlite" else "traces.jsonl")
+
+
+def export_targets():
+    configured = os.getenv("ATHOS_TRACE_EXPORT")
+    if configured is None:
+        return ["twotail"] if os.getenv("TWOTAIL_API_KEY") else []
+    return [t.strip() for t in configured.split(",") if t.strip() and t.strip() != "none"]
+
+
+def build_exporter():
+    """Exporter for export_targets(), or None if spans have nowhere to go."""
+    exporters = []
+    for target in export_targets():
+        if target == "twotail":
+            api_key = os.getenv("TWOTAIL_API_KEY")
+            if api_key:
+                exporters.append(OTLPHttpExporter(api_key))
+            else:
+                sys.stderr.write("[tracing] twotail export needs TWOTAIL_API_KEY; skipping it\n")
+        elif target == "sqlite":
+            exporters.append(SQLiteSpanExporter(local_path("sqlite")))
+        elif target == "jsonl":
+            exporters.append(JSONLSpanExporter(local_path("jsonl")))
+        else:
+            sys.stderr.write(f"[tracing] unknown trace exporter {target!r}\n")
+    if not exporters:
+        return None
+    return exporters[0] if len(exporters) == 1 else _FanOut(exporters)
+
+
+def add_trace_arguments(parser):
+    parser.add_argument("--trace-export", help=f"Where spans go, comma-separated: {', '.join(EXPORTERS)}, none "
+                                               "(default: twotail when TWOTAIL_API_KEY is set)")
+    parser.add_argument("--trace-dir", help="Directory for the sqlite/jsonl span files (default tools/.cache)")
+
+
+def apply_trace_arguments(args):
+    """Exported via the environment so subprocess tools inherit it."""
+    if args.trace_export:
+        os.environ["ATHOS_TRACE_EXPORT"] = args.trace_export
+    if args.trace_dir:
+        os.environ["ATHOS_TRACE_DIR"] = os.path.abspath(args.trace_dir)
+
+
+class BatchSpanProcessor:
+    """Bounded in-memory span queue drained by one background thread.
+
+    on_end() is an append under a lock. The worker exports when MAX_EXPORT_BATCH spans are
+    waiting or SCHEDULE_DELAY has passed; a full queue drops its oldest span (counted in stats)."""
+
+    def __init__(self, exporter, max_queue_size=MAX_QUEUE_SIZE, max_export_batch=MAX_EXPORT_BATCH,
+                 schedule_delay=SCHEDULE_DELAY):
+        self.exporter = exporter
+        self.max_export_batch = max_export_batch
+        self.schedule_delay = schedule_delay
+        self.stats = {"queued": 0, "exported": 0, "dropped": 0, "failed": 0}
+        self._queue = deque(maxlen=max_queue_size)
+        self._cond = threading.Condition()
+        self._flush_requests = 0
+        self._flushed = 0
+        self._shutdown = False
+        self._worker = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._worker.start()
+
+    def on_end(self, span):
+        with self._cond:
+            if self._shutdown:
+                return
+            if len(self._queue) == self._queue.maxlen:
+                self.stats["dropped"] += 1
+            self._queue.append(span)
+            self.stats["queued"] += 1
+            if len(self._queue) >= self.max_export_batch:
+                self._cond.notify()
+
+    def force_flush(self, timeout=EXPORT_TIMEOUT):
+        """Export everything queued so far. Returns False if that didn't finish within `timeout`."""
+        with self._cond:
+            self._flush_requests += 1
+            target = self._flush_requests
+            self._cond.notify()
+            return self._cond.wait_for(lambda: self._flushed >= target, timeout=timeout)
+
+    def shutdown(self, timeout=EXPORT_TIMEOUT):
+        self.force_flush(timeout)
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify()
+
+    def _take(self):
+        return [self._queue.popleft() for _ in range(min(len(self._queue), self.max_export_batch))]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._shutdown or self._flush_requests > self._flushed
+                                    or len(self._queue) >= self.max_export_batch, timeout=self.schedule_delay)
+                if self._shutdown:
+                    return
+                flushing = self._flush_requests
+                batches = []
+                while self._queue and (flushing > self._flushed or not batches):
+                    batches.append(self._take())
+            for batch in batches:
+                self._export(batch)
+            with self._cond:
+                self._flushed = max(self._flushed, flushing)
+                self._cond.notify_all()
+
+    def _export(self, batch):
+        try:
+            self.exporter.export(batch)
+            self.stats["exported"] += len(batch)
+        except Exception as e:
+            # Never raises — a dead tracing backend must not break the pipeline.
+            self.stats["failed"] += len(batch)
+            sys.stderr.write(f"[tracing] export of {len(batch)} spans failed: {e}\n")
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+_no_exporter = False
+
+
+def get_processor():
+    """The process-wide span processor, or None when no exporter is configured."""
+    global _processor, _no_exporter
+    if _processor is None and not _no_exporter:
+        with _processor_lock:
+            if _processor is None and not _no_exporter:
+                exporter = build_exporter()
+                if exporter is None:
+                    _no_exporter = True
+                    return None
+                _processor = BatchSpanProcessor(exporter)
+                atexit.register(_processor.shutdown)
+    return _processor
+
+
+def flush(timeout=EXPORT_TIMEOUT):
+    """Export queued spans now (e.g. before handing off to a long blocking step)."""
+    if _processor is not None:
+        return _processor.force_flush(timeout)
+    return True
+
+
+def send_span(trace_id, span_id, parent_span_id, name, start_ns, end_ns, attributes=None, status_code=1):
+    """Fire-and-forget: queues the span for the background exporter. Never raises."""
+    processor = get_processor()
+    if processor is None:
+        return
     try:
-        requests.post(ENDPOINT, json=payload, headers={"X-API-Key": api_key}, timeout=5)
+        processor.on_end(make_span(trace_id, span_id, parent_span_id, name, start_ns, end_ns, attributes, status_code))
     except Exception:
         pass